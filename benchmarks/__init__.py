@@ -0,0 +1,5 @@
+import os
+import sys
+
+# phydra is not an installable package, asv runs the benchmarks against the working tree of the repository:
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
@@ -0,0 +1,79 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+import xso
+
+from phydra.models import NPZDSlabOcean
+from phydra.solvers import forcing_breakpoints, initial_state
+
+from .common import slab_input_vars, slab_model, initialize_backend
+
+# five years of NPZDSlabOcean, as in notebook 2
+SLAB_TIME = np.arange(0, 365 * 5)
+
+
+def integration_statistics(core, method, rtol, atol, piecewise):
+    """Integrates the model function of core over SLAB_TIME, in a single pass or piecewise between
+    forcing breakpoints. Returns number of RHS evaluations, accepted steps and integrated segments."""
+    bounds = [SLAB_TIME[0], SLAB_TIME[-1]]
+    if piecewise:
+        bounds = np.concatenate([[bounds[0]], forcing_breakpoints(core.model.forcing_func.values(), *bounds),
+                                 [bounds[-1]]])
+    state = initial_state(core.solver)
+    nfev = steps = 0
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        solution = solve_ivp(core.model.model_function, [start, stop], state, method=method, rtol=rtol, atol=atol)
+        nfev += solution.nfev
+        steps += len(solution.t) - 1
+        state = solution.y[:, -1]
+    return nfev, steps, len(bounds) - 1
+
+
+class SlabBreakpointIntegration:
+    """Integration of NPZDSlabOcean over five years, in a single pass and piecewise between the knots
+    of the interpolated forcings, counting RHS evaluations and accepted steps."""
+    params = (['RK45', 'LSODA', 'BDF'], [1e-3, 1e-6], ['single', 'piecewise'])
+    param_names = ['method', 'rtol', 'integration']
+    timeout = 600
+
+    def setup(self, method, rtol, integration):
+        self.core = initialize_backend(slab_model(NPZDSlabOcean), slab_input_vars())
+        self.args = (method, rtol, rtol * 1e-3, integration == 'piecewise')
+
+    def time_integrate(self, method, rtol, integration):
+        integration_statistics(self.core, *self.args)
+
+    def track_rhs_evaluations(self, method, rtol, integration):
+        return integration_statistics(self.core, *self.args)[0]
+
+    def track_accepted_steps(self, method, rtol, integration):
+        return integration_statistics(self.core, *self.args)[1]
+
+
+class SlabBreakpointRejectedSteps:
+    """Rejected steps of RK45 integrating NPZDSlabOcean over five years. Each step attempt of RK45
+    takes 6 RHS evaluations, each integration 2 additional evaluations for the initial step size."""
+    params = ([1e-3, 1e-6], ['single', 'piecewise'])
+    param_names = ['rtol', 'integration']
+    timeout = 600
+
+    def setup(self, rtol, integration):
+        self.core = initialize_backend(slab_model(NPZDSlabOcean), slab_input_vars())
+        self.args = ('RK45', rtol, rtol * 1e-3, integration == 'piecewise')
+
+    def track_rejected_steps(self, rtol, integration):
+        nfev, steps, segments = integration_statistics(self.core, *self.args)
+        return (nfev - 2 * segments) // 6 - steps
+
+
+class SlabPiecewiseRun:
+    """Full run of NPZDSlabOcean over five years with the built-in solver and the piecewise solvers."""
+    params = ['solve_ivp', 'solve_ivp_piecewise', 'solve_ivp_LSODA', 'solve_ivp_LSODA_piecewise']
+    param_names = ['solver']
+    timeout = 600
+
+    def setup(self, solver):
+        self.model = slab_model(NPZDSlabOcean)
+        self.model_setup = xso.setup(solver=solver, model=self.model, time=SLAB_TIME, input_vars=slab_input_vars())
+
+    def time_run(self, solver):
+        self.model_setup.xsimlab.run(model=self.model)
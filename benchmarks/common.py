@@ -0,0 +1,117 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+
+import xso
+
+from phydra.models import NPxZxSizeBased
+from phydra.models.sizebased.sweep import size_class_input_vars
+from phydra.solvers import initial_state, run_backend
+
+# forcing file shipped with the notebooks, supplied via explicit path to be independent of working directory
+STATION_FORCING_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks', 'data', 'stations_forcing.csv')
+
+
+def chemostat_input_vars(sinusoidal=False):
+    """Returns input variables of the NPChemostat model setup used in notebook 1,
+    or of NPChemostat_sinu with sinusoidal nutrient forcing."""
+    input_vars = {
+        # State variables
+        'Nutrient': {'value_label': 'N', 'value_init': 1.},
+        'Phytoplankton': {'value_label': 'P', 'value_init': 0.1},
+
+        # Flows:
+        'Inflow': {'source': 'N0', 'rate': 0.1, 'sink': 'N'},
+        'Outflow': {'var_list': ['N', 'P'], 'rate': 0.1},
+
+        # Growth
+        'Growth': {'resource': 'N', 'consumer': 'P', 'halfsat': 0.7, 'mu_max': 1},
+
+        # Forcings
+        'N0': {'forcing_label': 'N0', 'value': 1.}
+    }
+    if sinusoidal:
+        input_vars['N0'] = {'forcing_label': 'N0', 'period': 24, 'mean': 1, 'amplitude': 0.5}
+    return input_vars
+
+
+def slab_input_vars(station='biotrans'):
+    """Returns input variables of the NPZDSlabOcean model setup used in notebook 2,
+    with forcing components that read from STATION_FORCING_PATH."""
+    return {
+        # State variables
+        'Nutrient': {'var_label': 'N', 'var_init': 10.},
+        'Phytoplankton': {'var_label': 'P', 'var_init': .5},
+        'Zooplankton': {'var_label': 'Z', 'var_init': .1},
+        'Detritus': {'var_label': 'D', 'var_init': .1},
+
+        # Mixing:
+        'K': {'mld': 'MLD', 'mld_deriv': 'MLDderiv', 'kappa': 0.13},
+        'Upwelling': {'n': 'N', 'n_0': 'N0'},
+        'Mixing': {'vars_sink': ['P', 'Z', 'D']},
+        'Sinking': {'var': 'D', 'mld': 'MLD', 'rate': 6.43},
+
+        # Growth
+        'Growth': {'consumer': 'P', 'resource': 'N', 'mu_max': 1.},
+        'Nut_lim': {'resource': 'N', 'halfsat': .85},
+        'Light_lim': {'pigment_biomass': 'P', 'i_0': 'I0', 'mld': 'MLD',
+                      'kw': 0.04, 'kc': 0.03, 'alpha': 0.15, 'CtoChl': 75.},
+        'Temp_lim': {'temp': 'SST', 'VpMax': 2.5},
+
+        # Grazing
+        'Grazing': {'resources': ['P', 'D'], 'consumer': 'Z',
+                    'feed_prefs': [.67, .33], 'Imax': 1., 'kZ': .6},
+        'GGE': {'assimilated_consumer': 'Z', 'egested_detritus': 'D', 'excreted_nutrient': 'N',
+                'epsilon': 0.75, 'beta': 0.69},
+
+        # Mortality & sinking
+        'PhytoLinMortality': {'source': 'P', 'sink': 'D', 'rate': 0.015},
+        'PhytoQuadMortality': {'source': 'P', 'sink': 'D', 'rate': 0.025},
+        'ZooLinMortality': {'source': 'Z', 'sink': 'D', 'rate': 0.02},
+        'HigherOrderPred': {'var': 'Z', 'rate': 0.34},
+        'DetRemineralisation': {'source': 'D', 'sink': 'N', 'rate': 0.06},
+
+        # Forcings
+        'Irradiance': {'station': station, 'I0_label': 'I0'},
+        'Forcings': {'station': station, 'file_path': STATION_FORCING_PATH,
+                     'MLD_label': 'MLD', 'SST_label': 'SST',
+                     'MLDderiv_label': 'MLDderiv', 'N0_label': 'N0'},
+    }
+
+
+def sizebased_input_vars(num, model=NPxZxSizeBased, phiP_tolerance=None):
+    """Returns input variables of the NPxZxSizeBased model setup used in notebook 3,
+    for num phytoplankton and zooplankton size classes, adapted to the grazing components of model."""
+    return size_class_input_vars(num, phiP_tolerance=phiP_tolerance, model=model)
+
+
+def slab_model(model):
+    """Returns slab ocean model with forcings read from explicit path."""
+    from phydra.models.slabocean.forcings import StationForcingFromPath
+    return model.update_processes({'Forcings': StationForcingFromPath})
+
+
+def initialize_backend(model, input_vars):
+    """Runs model setup over a single time step and returns the XSO core,
+    containing the assembled backend model with all flux and forcing functions."""
+    model_setup = xso.setup(solver='solve_ivp', model=model, time=np.arange(0, 2), input_vars=input_vars)
+    return run_backend(model, model_setup)[0]
+
+
+def flux_arguments(core, time=0.):
+    """Returns state, parameter and forcing dicts to call backend flux functions with at time."""
+    state = core.model.unpack_flat_state(initial_state(core.solver))
+    # flux values routed through groups are read from state:
+    for label, flux in core.model.fluxes.items():
+        state[label] = flux(state=state, parameters=core.model.parameters,
+                            forcings=forcings_at(core, time))
+    return state, core.model.parameters, forcings_at(core, time)
+
+
+def forcings_at(core, time):
+    """Returns dict of forcing values at time."""
+    forcings = defaultdict()
+    for key, func in core.model.forcing_func.items():
+        forcings[key] = func(time)
+    return forcings
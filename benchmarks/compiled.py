@@ -0,0 +1,53 @@
+import numpy as np
+import xso
+
+from phydra.models import NPZDSlabOcean, NPxZxSizeBased
+from phydra.solvers import initial_state
+
+from .common import slab_input_vars, slab_model, sizebased_input_vars, initialize_backend
+
+
+class ModelFunction:
+    """Single evaluation of the XSO model function and of the numba-compiled model function."""
+    params = (['slab', 'sizebased'], ['python', 'numba'])
+    param_names = ['model', 'backend']
+
+    def setup(self, model, backend):
+        if model == 'slab':
+            core = initialize_backend(slab_model(NPZDSlabOcean), slab_input_vars())
+        else:
+            core = initialize_backend(NPxZxSizeBased, sizebased_input_vars(20))
+        self.state = initial_state(core.solver)
+        if backend == 'numba':
+            from phydra.compiled import CompiledModelFunction
+            self.function = CompiledModelFunction(core.model)
+        else:
+            self.function = core.model.model_function
+        # compile outside of timing:
+        self.function(0., self.state)
+
+    def time_model_function(self, model, backend):
+        self.function(0., self.state)
+
+
+class CompiledRun:
+    """Full model runs with the built-in solver and the numba-compiled model function.
+    The compiled function is reused across runs of the same model structure within a process."""
+    params = (['slab', 'sizebased'], ['solve_ivp', 'solve_ivp_numba'])
+    param_names = ['model', 'solver']
+    timeout = 600
+
+    def setup(self, model, solver):
+        if model == 'slab':
+            self.model = slab_model(NPZDSlabOcean)
+            input_vars, time = slab_input_vars(), np.arange(0, 365 * 5)
+        else:
+            self.model = NPxZxSizeBased
+            input_vars, time = sizebased_input_vars(20), np.arange(0, 365 * 10)
+        self.model_setup = xso.setup(solver=solver, model=self.model, time=time, input_vars=input_vars)
+        # compile outside of timing:
+        xso.setup(solver=solver, model=self.model, time=np.arange(0, 2),
+                  input_vars=input_vars).xsimlab.run(model=self.model)
+
+    def time_run(self, model, solver):
+        self.model_setup.xsimlab.run(model=self.model)
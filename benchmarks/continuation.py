@@ -0,0 +1,43 @@
+"""Benchmarks of parameter continuation of NPChemostat along the dilution rate, across washout,
+compared to independent runs from the initial values of the model setup for every value.
+"""
+import numpy as np
+import xso
+
+from phydra.models import NPChemostat, NPChemostat_sinu
+from phydra.continuation import continuation, integration_sweep
+
+from .common import chemostat_input_vars
+
+DILUTION_RATES = np.linspace(0.05, 1., 40)
+DILUTION = ['Inflow__rate', 'Outflow__rate']
+
+
+class ChemostatDilutionSweep:
+    """Steady state of NPChemostat for 40 dilution rates, by continuation of the equilibrium,
+    and by independent runs over 100 days."""
+
+    def setup(self):
+        self.model_setup = xso.setup(solver='solve_ivp', model=NPChemostat, time=np.arange(0, 100),
+                                     input_vars=chemostat_input_vars())
+
+    def time_continuation(self):
+        continuation(NPChemostat, self.model_setup, DILUTION, DILUTION_RATES)
+
+    def time_independent_runs(self):
+        for rate in DILUTION_RATES:
+            with NPChemostat:
+                model_setup = self.model_setup.xsimlab.update_vars(input_vars={key: rate for key in DILUTION})
+            model_setup.xsimlab.run(model=NPChemostat)
+
+
+class ChemostatAmplitudeSweep:
+    """Forced cycles of NPChemostat_sinu for 10 amplitudes of the nutrient forcing, each run
+    over 100 days from the final state of the previous amplitude."""
+
+    def setup(self):
+        self.model_setup = xso.setup(solver='solve_ivp', model=NPChemostat_sinu, time=np.arange(0, 100, .5),
+                                     input_vars=chemostat_input_vars(sinusoidal=True))
+
+    def time_integration_sweep(self):
+        integration_sweep(NPChemostat_sinu, self.model_setup, 'N0__amplitude', np.linspace(0., .9, 10))
@@ -0,0 +1,36 @@
+import numpy as np
+import xso
+
+from phydra.models import NPZDSlabOcean
+from phydra.ensemble import run_ensemble, sample_parameters
+
+from .common import slab_input_vars, slab_model
+
+ENSEMBLE_DISTRIBUTIONS = {'Growth__mu_max': (0.8, 1.2), 'K__kappa': (0.05, 0.2)}
+
+
+class SlabEnsembleRun:
+    """One year of NPZDSlabOcean for Latin hypercube samples of two parameters, as a vectorized
+    ensemble with the numba-compiled model function and as an xarray-simlab batch run."""
+    params = ([10, 100], ['ensemble', 'batch'])
+    param_names = ['members', 'method']
+    timeout = 1200
+
+    def setup(self, members, method):
+        self.model = slab_model(NPZDSlabOcean)
+        self.model_setup = xso.setup(solver='solve_ivp', model=self.model, time=np.arange(0, 365),
+                                     input_vars=slab_input_vars())
+        self.samples = sample_parameters(ENSEMBLE_DISTRIBUTIONS, members, seed=0)
+        if method == 'ensemble':
+            # compile outside of timing:
+            run_ensemble(self.model, self.model_setup, sample_parameters(ENSEMBLE_DISTRIBUTIONS, 2, seed=0))
+        else:
+            with self.model:
+                self.model_setup = self.model_setup.xsimlab.update_vars(
+                    input_vars={key: ('batch', values) for key, values in self.samples.items()})
+
+    def time_run(self, members, method):
+        if method == 'ensemble':
+            run_ensemble(self.model, self.model_setup, self.samples)
+        else:
+            self.model_setup.xsimlab.run(model=self.model, batch_dim='batch')
@@ -0,0 +1,43 @@
+"""Benchmarks of the direct equilibrium solver, compared to integration over ten years.
+
+Root finding with the analytic Jacobian replaces the integration towards the steady state of
+models with constant forcing, after a warm-up integration of ten days.
+"""
+import numpy as np
+import xso
+
+from phydra.models import NPChemostat, NPxZxSizeBased
+from phydra.equilibrium import equilibrium
+
+from .common import chemostat_input_vars, sizebased_input_vars
+
+TEN_YEARS = np.arange(0, 3650)
+
+
+class ChemostatEquilibrium:
+    """Steady state of NPChemostat, by root finding and by integration over ten years."""
+
+    def setup(self):
+        self.model_setup = xso.setup(solver='solve_ivp', model=NPChemostat, time=TEN_YEARS,
+                                     input_vars=chemostat_input_vars())
+
+    def time_equilibrium(self):
+        equilibrium(NPChemostat, self.model_setup)
+
+    def time_integration(self):
+        self.model_setup.xsimlab.run(model=NPChemostat)
+
+
+class SizeSpectrumEquilibrium:
+    """Steady state of NPxZxSizeBased with two size classes, which has a stable equilibrium,
+    by root finding and by integration over ten years."""
+
+    def setup(self):
+        self.model_setup = xso.setup(solver='solve_ivp', model=NPxZxSizeBased, time=TEN_YEARS,
+                                     input_vars=sizebased_input_vars(2))
+
+    def time_equilibrium(self):
+        equilibrium(NPxZxSizeBased, self.model_setup)
+
+    def time_integration(self):
+        self.model_setup.xsimlab.run(model=NPxZxSizeBased)
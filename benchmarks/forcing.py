@@ -0,0 +1,35 @@
+import numpy as np
+
+from phydra.forcing import ConstantForcing, SinusoidalForcing
+from phydra.models.slabocean.forcings import station_forcing_function, station_irradiance_function
+
+from .common import STATION_FORCING_PATH
+
+
+def vectorized_constant(value):
+    """Constant forcing as np.vectorize closure, as the forcing components before phydra.forcing."""
+    @np.vectorize
+    def forcing(time):
+        return value
+    return forcing
+
+
+class ForcingEvaluation:
+    """Evaluation of forcings at a single time, as at each right-hand side evaluation, and over the
+    output time of ten years in daily steps, as for the forcing outputs of a run."""
+    params = ['constant_vectorize', 'constant', 'sinusoidal', 'spline', 'irradiance']
+    param_names = ['forcing']
+
+    def setup(self, forcing):
+        self.forcing = {'constant_vectorize': lambda: vectorized_constant(1.),
+                        'constant': lambda: ConstantForcing(1.),
+                        'sinusoidal': lambda: SinusoidalForcing(1., 0.5, 24.),
+                        'spline': lambda: station_forcing_function(STATION_FORCING_PATH, 'biotrans', 'MLD'),
+                        'irradiance': lambda: station_irradiance_function('biotrans')}[forcing]()
+        self.time = np.arange(0., 365 * 10)
+
+    def time_scalar(self, forcing):
+        self.forcing(100.5)
+
+    def time_array(self, forcing):
+        self.forcing(self.time)
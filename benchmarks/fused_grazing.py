@@ -0,0 +1,54 @@
+from phydra.models import (NPZDSlabOcean, NPZDSlabOcean_FusedGrazing,
+                           NPxZxSizeBased, NPxZxSizeBased_FusedGrazing)
+from phydra.solvers import initial_state
+
+from .common import slab_input_vars, slab_model, sizebased_input_vars, initialize_backend
+
+
+def fused_slab_input_vars(station='biotrans'):
+    """Returns slab ocean input variables, with grazing and GGE inputs merged for the fused component."""
+    input_vars = slab_input_vars(station)
+    grazing, gge = input_vars['Grazing'], input_vars.pop('GGE')
+    input_vars['Grazing'] = {
+        'grazing_routing': grazing['resources'] + [grazing['consumer'], gge['egested_detritus'],
+                                                   gge['excreted_nutrient']],
+        'feed_prefs': grazing['feed_prefs'], 'Imax': grazing['Imax'], 'kZ': grazing['kZ'],
+        'beta': gge['beta'], 'epsilon': gge['epsilon']}
+    return input_vars
+
+
+class SlabGrazingRHS:
+    """Single evaluation of the full model function of NPZDSlabOcean,
+    with separate grazing and GGE components and with the fused component."""
+
+    def setup(self):
+        self.pair = initialize_backend(slab_model(NPZDSlabOcean), slab_input_vars())
+        self.fused = initialize_backend(slab_model(NPZDSlabOcean_FusedGrazing), fused_slab_input_vars())
+        self.pair_state = initial_state(self.pair.solver)
+        self.fused_state = initial_state(self.fused.solver)
+
+    def time_pair(self):
+        self.pair.model.model_function(0., self.pair_state)
+
+    def time_fused(self):
+        self.fused.model.model_function(0., self.fused_state)
+
+
+class SizebasedGrazingFusedRHS:
+    """Single evaluation of the full model function of NPxZxSizeBased,
+    with separate grazing and GGE components and with the fused component."""
+    params = [10, 50, 100, 200]
+    param_names = ['size_classes']
+
+    def setup(self, num):
+        self.pair = initialize_backend(NPxZxSizeBased, sizebased_input_vars(num))
+        self.fused = initialize_backend(NPxZxSizeBased_FusedGrazing,
+                                        sizebased_input_vars(num, NPxZxSizeBased_FusedGrazing))
+        self.pair_state = initial_state(self.pair.solver)
+        self.fused_state = initial_state(self.fused.solver)
+
+    def time_pair(self, num):
+        self.pair.model.model_function(0., self.pair_state)
+
+    def time_fused(self, num):
+        self.fused.model.model_function(0., self.fused_state)
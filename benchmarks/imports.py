@@ -0,0 +1,26 @@
+"""Import time of phydra, its submodules and single models, each measured in a fresh interpreter."""
+
+
+def timeraw_import_phydra():
+    return "import phydra"
+
+
+def timeraw_import_models():
+    return "import phydra.models"
+
+
+def timeraw_import_chemostat():
+    return "from phydra.models import NPChemostat"
+
+
+def timeraw_import_slabocean():
+    return "from phydra.models import NPZDSlabOcean"
+
+
+def timeraw_import_sizebased():
+    return "from phydra.models import NPxZxSizeBased"
+
+
+def timeraw_import_xso():
+    """Baseline of the model imports, the import of xso and xarray-simlab."""
+    return "import xso"
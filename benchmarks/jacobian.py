@@ -0,0 +1,41 @@
+from functools import partial
+
+import numpy as np
+import xso
+
+from phydra.models import NPxZxSizeBased_FusedGrazing
+from phydra.jacobian import ModelJacobian
+from phydra.solvers import ImplicitIVPSolver, initial_state, register_solver
+
+from .common import sizebased_input_vars, initialize_backend
+
+
+class SizebasedJacobian:
+    """Single evaluation of the analytic Jacobian of NPxZxSizeBased_FusedGrazing."""
+    params = [10, 50, 100]
+    param_names = ['size_classes']
+
+    def setup(self, num):
+        core = initialize_backend(NPxZxSizeBased_FusedGrazing, sizebased_input_vars(num, NPxZxSizeBased_FusedGrazing))
+        self.jacobian = ModelJacobian(core.model)
+        self.state = initial_state(core.solver)
+
+    def time_jacobian(self, num):
+        self.jacobian(0., self.state)
+
+
+class SizebasedImplicitRun:
+    """Run of NPxZxSizeBased_FusedGrazing over one year with BDF,
+    with analytic and finite difference Jacobians."""
+    params = ([20, 50], ['solve_ivp_BDF', 'solve_ivp_BDF_fd', 'solve_ivp_LSODA', 'solve_ivp'])
+    param_names = ['size_classes', 'solver']
+    timeout = 600
+
+    def setup(self, num, solver):
+        # implicit solver estimating the Jacobian by finite differences, for comparison:
+        register_solver('solve_ivp_BDF_fd', partial(ImplicitIVPSolver, method='BDF', jacobian=False))
+        self.model_setup = xso.setup(solver=solver, model=NPxZxSizeBased_FusedGrazing, time=np.arange(0, 365),
+                                     input_vars=sizebased_input_vars(num, NPxZxSizeBased_FusedGrazing))
+
+    def time_run(self, num, solver):
+        self.model_setup.xsimlab.run(model=NPxZxSizeBased_FusedGrazing)
@@ -0,0 +1,118 @@
+import numpy as np
+
+import xso
+
+from phydra.models import NPZDSlabOcean_3layer
+
+from .common import slab_input_vars, slab_model, initialize_backend, flux_arguments
+
+
+@xso.component
+class EMPOWER_Smith_Anderson3Layer_ML_Loop:
+    """Reference copy of the previous, branching implementation of
+    EMPOWER_Smith_Anderson3Layer_ML, looping over layers in Python."""
+    pigment_biomass = xso.variable(foreign=True)
+
+    i_0 = xso.forcing(foreign=True, description='Light forcing')
+    mld = xso.forcing(foreign=True, description='Mixed Layer Depth forcing')
+
+    alpha = xso.parameter(description='initial slop of PI curve')
+    CtoChl = xso.parameter(description='chlorophyll to carbon ratio')
+    kw = xso.parameter(description='light attenuation coef for water')
+    kc = xso.parameter(description='light attenuation coef for pigment biomass')
+
+    @xso.flux(group_to_arg='VpT', group='growth_lims')
+    def light_limitation(self, i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+        i_0 = i_0 / 24
+        chl = pigment_biomass * 6.625 * 12.0 / CtoChl
+
+        ss = self.m.sqrt(chl)
+
+        kPAR_1 = 0.13096 + 0.030969 * ss + 0.042644 * ss ** 2 - 0.013738 * ss ** 3 + 0.0024617 * ss ** 4 - 0.00018059 * ss ** 5
+        kPAR_2 = 0.041025 + 0.036211 * ss + 0.062297 * ss ** 2 - 0.030098 * ss ** 3 + 0.0062597 * ss ** 4 - 0.00051944 * ss ** 5
+        kPAR_3 = 0.021517 + 0.050150 * ss + 0.058900 * ss ** 2 - 0.040539 * ss ** 3 + 0.0087586 * ss ** 4 - 0.00049476 * ss ** 5
+
+        kPAR = [kPAR_1, kPAR_2, kPAR_3]
+
+        if mld <= 5.0:
+            jnlay = 1
+            zdep = [0., mld]
+            I_1 = i_0 * np.exp(-kPAR_1 * mld)
+            Ibase = [i_0, I_1]
+        elif mld > 5.0 and mld <= 23.0:
+            jnlay = 2
+            zdep = [0., 5.0, mld - 5.0]
+            I_1 = i_0 * np.exp(-kPAR_1 * 5.0)
+            I_2 = I_1 * np.exp(-kPAR_2 * mld - 5.0)
+            Ibase = [i_0, I_1, I_2]
+        elif mld > 23.0:
+            jnlay = 3
+            zdep = [0., 5.0, 23.0 - 5.0, mld - 23.0]
+            I_1 = i_0 * np.exp(-kPAR_1 * 5.0)
+            I_2 = I_1 * np.exp(-kPAR_2 * 23.0 - 5.0)
+            I_3 = I_2 * np.exp(-kPAR_3 * mld - 23.0)
+            Ibase = [i_0, I_1, I_2, I_3]
+
+        L_Isum = 0
+
+        for ilay in range(1, jnlay + 1):
+            L_I = self.SmithFunc(zdep[ilay], Ibase[ilay - 1], Ibase[ilay], kPAR[ilay - 1], alpha, VpT)
+            L_I = L_I * 24 / CtoChl
+            L_Isum = L_Isum + L_I * zdep[ilay]
+
+        L_I = L_Isum / mld
+
+        return L_I
+
+    def SmithFunc(self, zdepth, Iin, Iout, kPARlay, alpha, Vp):
+        x0 = alpha * Iin
+        xH = alpha * Iout
+        VpH = Vp / kPARlay / zdepth * (
+                np.log(x0 + (Vp ** 2 + x0 ** 2) ** 0.5) - np.log(xH + (Vp ** 2 + xH ** 2) ** 0.5))
+        return VpH
+
+
+class Anderson3LayerLightLimitation:
+    """Single evaluation of the three layer light limitation flux, over a number
+    of mixed layer depths and phytoplankton biomasses.
+
+    The loop implementation can only evaluate scalars, so arrays are evaluated element by element."""
+    params = [1, 100, 10000]
+    param_names = ['size']
+
+    def setup(self, size):
+        model = slab_model(NPZDSlabOcean_3layer)
+        loop_model = model.update_processes({'Light_lim': EMPOWER_Smith_Anderson3Layer_ML_Loop})
+
+        self.flux = initialize_backend(model, slab_input_vars()).model.fluxes['Light_lim_light_limitation']
+        core = initialize_backend(loop_model, slab_input_vars())
+        self.loop_flux = core.model.fluxes['Light_lim_light_limitation']
+
+        self.state, self.parameters, self.forcings = flux_arguments(core)
+
+        rng = np.random.default_rng(0)
+        self.mld = rng.uniform(1., 300., size)
+        self.biomass = rng.uniform(0.01, 3., size)
+
+    def evaluate(self, mld, biomass):
+        state = dict(self.state, P=biomass)
+        forcings = dict(self.forcings, MLD=mld)
+        return self.flux(state=state, parameters=self.parameters, forcings=forcings)
+
+    def evaluate_loop(self, mld, biomass):
+        out = np.empty(np.size(mld))
+        for i, (_mld, _biomass) in enumerate(zip(mld, biomass)):
+            state = dict(self.state, P=_biomass)
+            forcings = dict(self.forcings, MLD=_mld)
+            out[i] = self.loop_flux(state=state, parameters=self.parameters, forcings=forcings)
+        return out
+
+    def time_vectorized(self, size):
+        self.evaluate(self.mld, self.biomass)
+
+    def time_vectorized_elementwise(self, size):
+        for _mld, _biomass in zip(self.mld, self.biomass):
+            self.evaluate(_mld, _biomass)
+
+    def time_loop(self, size):
+        self.evaluate_loop(self.mld, self.biomass)
@@ -0,0 +1,199 @@
+"""Benchmarks of all shipped models, covering setup, forcing construction,
+a single evaluation of the model function and full runs, with peak memory of full runs.
+
+Slab ocean runs are parameterized over run length (years) and batch size, the number of
+parameter sets run along an xarray-simlab batch dimension. Size-based benchmarks are
+parameterized over the number of phytoplankton and zooplankton size classes.
+"""
+import os
+
+import numpy as np
+import xso
+
+from phydra.models import (NPChemostat, NPChemostat_sinu, NPZDSlabOcean, NPZDSlabOcean_3layer, NPxZxSizeBased,
+                           NPZDSlabOcean_MultiStation)
+from phydra.models.slabocean.calibration import STATION_PARAMETERS, multistation_input_vars
+from phydra.models.slabocean.forcings import (clear_forcing_cache, station_forcing_function,
+                                              station_irradiance_function, station_N0_function)
+from phydra.solvers import initial_state
+
+from .common import (chemostat_input_vars, slab_input_vars, slab_model, sizebased_input_vars,
+                     initialize_backend, STATION_FORCING_PATH)
+
+CHEMOSTAT_MODELS = {'NPChemostat': (NPChemostat, chemostat_input_vars()),
+                    'NPChemostat_sinu': (NPChemostat_sinu, chemostat_input_vars(sinusoidal=True))}
+
+SLAB_MODELS = {'NPZDSlabOcean': NPZDSlabOcean, 'NPZDSlabOcean_3layer': NPZDSlabOcean_3layer}
+
+SIZE_CLASSES = [2, 10, 50, 100, 200]
+
+# stations in the order of the batch dimension of notebook 2
+NOTEBOOK_STATIONS = ['biotrans', 'india', 'papa', 'kerfix']
+
+
+def batch_setup(model, model_setup, batch_size):
+    """Returns model setup with the maximum growth rate of phytoplankton varied along dimension 'batch'."""
+    with model:
+        return model_setup.xsimlab.update_vars(
+            input_vars={'Growth__mu_max': ('batch', np.linspace(0.8, 1.2, batch_size))})
+
+
+class ChemostatModels:
+    """Setup, initialization, model function and a run over 100 days in steps of 0.1 days,
+    as in notebook 1, of NPChemostat and NPChemostat_sinu."""
+    params = list(CHEMOSTAT_MODELS)
+    param_names = ['model']
+
+    def setup(self, name):
+        self.model, self.input_vars = CHEMOSTAT_MODELS[name]
+        self.model_setup = xso.setup(solver='solve_ivp', model=self.model, time=np.arange(0, 100, 0.1),
+                                     input_vars=self.input_vars)
+        self.core = initialize_backend(self.model, self.input_vars)
+        self.state = initial_state(self.core.solver)
+
+    def time_setup(self, name):
+        xso.setup(solver='solve_ivp', model=self.model, time=np.arange(0, 100, 0.1), input_vars=self.input_vars)
+
+    def time_initialize(self, name):
+        initialize_backend(self.model, self.input_vars)
+
+    def time_model_function(self, name):
+        self.core.model.model_function(0., self.state)
+
+    def time_run(self, name):
+        self.model_setup.xsimlab.run(model=self.model)
+
+    def peakmem_run(self, name):
+        self.model_setup.xsimlab.run(model=self.model)
+
+
+class SlabForcing:
+    """Construction of the station forcings of NPZDSlabOcean from the forcing file,
+    with empty cache of fitted splines and with all splines cached."""
+    params = [True, False]
+    param_names = ['cached']
+
+    def setup(self, cached):
+        self.cached = cached
+        self.construct()
+
+    def construct(self):
+        if not self.cached:
+            clear_forcing_cache()
+        MLD = station_forcing_function(STATION_FORCING_PATH, 'biotrans', 'MLD', k=1, smooth=1, deriv=0)
+        station_forcing_function(STATION_FORCING_PATH, 'biotrans', 'MLD', k=1, smooth=1, deriv=1)
+        station_forcing_function(STATION_FORCING_PATH, 'biotrans', 'SST', k=1, smooth=1, deriv=0)
+        station_N0_function(MLD, 'biotrans')
+        station_irradiance_function('biotrans')
+
+    def time_forcing_construction(self, cached):
+        self.construct()
+
+
+class SlabModels:
+    """Setup, initialization and model function of NPZDSlabOcean and NPZDSlabOcean_3layer."""
+    params = list(SLAB_MODELS)
+    param_names = ['model']
+
+    def setup(self, name):
+        self.model = slab_model(SLAB_MODELS[name])
+        self.core = initialize_backend(self.model, slab_input_vars())
+        self.state = initial_state(self.core.solver)
+
+    def time_setup(self, name):
+        xso.setup(solver='solve_ivp', model=self.model, time=np.arange(0, 365 * 5), input_vars=slab_input_vars())
+
+    def time_initialize(self, name):
+        initialize_backend(self.model, slab_input_vars())
+
+    def time_model_function(self, name):
+        self.core.model.model_function(0., self.state)
+
+
+class SlabRun:
+    """Full runs of NPZDSlabOcean and NPZDSlabOcean_3layer in daily steps,
+    over 1, 5 and 10 years and batches of 1 and 4 parameter sets."""
+    params = (list(SLAB_MODELS), [1, 5, 10], [1, 4])
+    param_names = ['model', 'years', 'batch_size']
+    timeout = 1200
+
+    def setup(self, name, years, batch_size):
+        self.model = slab_model(SLAB_MODELS[name])
+        self.model_setup = xso.setup(solver='solve_ivp', model=self.model, time=np.arange(0, 365 * years),
+                                     input_vars=slab_input_vars())
+        self.batch_dim = None
+        if batch_size > 1:
+            self.model_setup = batch_setup(self.model, self.model_setup, batch_size)
+            self.batch_dim = 'batch'
+
+    def time_run(self, name, years, batch_size):
+        self.model_setup.xsimlab.run(model=self.model, batch_dim=self.batch_dim)
+
+    def peakmem_run(self, name, years, batch_size):
+        self.model_setup.xsimlab.run(model=self.model, batch_dim=self.batch_dim)
+
+
+class SlabMultiStation:
+    """Batch setup of notebook 2 over five years, the four stations with station specific parameters,
+    as a single run of NPZDSlabOcean_MultiStation and as batch of NPZDSlabOcean runs."""
+    timeout = 1200
+
+    def setup(self):
+        # forcings of the multi-station model are read relative to the working directory, as in notebook 2:
+        os.chdir(os.path.join(os.path.dirname(STATION_FORCING_PATH), os.pardir))
+        self.multistation_setup = xso.setup(solver='solve_ivp', model=NPZDSlabOcean_MultiStation,
+                                            time=np.arange(0, 365 * 5),
+                                            input_vars=multistation_input_vars(NOTEBOOK_STATIONS))
+
+        self.model = slab_model(NPZDSlabOcean)
+        input_vars = slab_input_vars()
+        input_vars['Irradiance']['station'] = ('batch', NOTEBOOK_STATIONS)
+        input_vars['Forcings']['station'] = ('batch', NOTEBOOK_STATIONS)
+        for key in STATION_PARAMETERS['biotrans']:
+            process, var = key.split('__')
+            input_vars[process][var] = ('batch', [STATION_PARAMETERS[station][key] for station in NOTEBOOK_STATIONS])
+        self.batch_setup = xso.setup(solver='solve_ivp', model=self.model, time=np.arange(0, 365 * 5),
+                                     input_vars=input_vars)
+
+    def time_multistation_run(self):
+        self.multistation_setup.xsimlab.run(model=NPZDSlabOcean_MultiStation)
+
+    def time_batch_run(self):
+        self.batch_setup.xsimlab.run(model=self.model, batch_dim='batch')
+
+
+class SizebasedModel:
+    """Setup, initialization and model function of NPxZxSizeBased, for 2 to 200 size classes."""
+    params = SIZE_CLASSES
+    param_names = ['size_classes']
+
+    def setup(self, num):
+        self.core = initialize_backend(NPxZxSizeBased, sizebased_input_vars(num))
+        self.state = initial_state(self.core.solver)
+
+    def time_setup(self, num):
+        xso.setup(solver='solve_ivp', model=NPxZxSizeBased, time=np.arange(0, 365),
+                  input_vars=sizebased_input_vars(num))
+
+    def time_initialize(self, num):
+        initialize_backend(NPxZxSizeBased, sizebased_input_vars(num))
+
+    def time_model_function(self, num):
+        self.core.model.model_function(0., self.state)
+
+
+class SizebasedRun:
+    """Full run of NPxZxSizeBased over one year in daily steps, for 2 to 200 size classes."""
+    params = SIZE_CLASSES
+    param_names = ['size_classes']
+    timeout = 1800
+
+    def setup(self, num):
+        self.model_setup = xso.setup(solver='solve_ivp', model=NPxZxSizeBased, time=np.arange(0, 365),
+                                     input_vars=sizebased_input_vars(num))
+
+    def time_run(self, num):
+        self.model_setup.xsimlab.run(model=NPxZxSizeBased)
+
+    def peakmem_run(self, num):
+        self.model_setup.xsimlab.run(model=NPxZxSizeBased)
@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+
+import numpy as np
+import xso
+
+from phydra.models import NPxZxSizeBased
+from phydra.output import write_run
+from phydra.reductions import TimeReduction, reduce_run
+
+from .common import sizebased_input_vars
+
+
+class SizebasedOutput:
+    """Run of NPxZxSizeBased with 20 size classes over 3 years in daily steps, keeping the full
+    output in memory, written in yearly windows to a Zarr store, in double and single precision,
+    and reduced to the mean and standard deviation of total phytoplankton biomass in the last year."""
+    params = ['memory', 'zarr', 'zarr_float32', 'reduced']
+    param_names = ['output']
+    timeout = 1200
+
+    def setup(self, output):
+        self.model_setup = xso.setup(solver='solve_ivp', model=NPxZxSizeBased, time=np.arange(0, 365 * 3),
+                                     input_vars=sizebased_input_vars(20))
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self, output):
+        shutil.rmtree(self.directory)
+
+    def run(self, output):
+        if output == 'memory':
+            self.model_setup.xsimlab.run(model=NPxZxSizeBased)
+        elif output == 'reduced':
+            reduce_run(NPxZxSizeBased, self.model_setup,
+                       {'P': TimeReduction('Phytoplankton__biomass', ('mean', 'std'), sum_dims='phyto', last=365)})
+        else:
+            write_run(NPxZxSizeBased, self.model_setup, f'{self.directory}/out.zarr', window=365,
+                      dtype='float32' if output == 'zarr_float32' else None)
+
+    def time_run(self, output):
+        self.run(output)
+
+    def peakmem_run(self, output):
+        self.run(output)
@@ -0,0 +1,48 @@
+"""Benchmarks of the positivity-preserving MPRK22 solver 'solve_ivp_MPRK22' on size spectra.
+
+Small size classes of NPxZxSizeBased approach zero, where explicit solvers reduce their step
+to avoid negative biomass. MPRK22 keeps biomass positive at any step, runs are compared with
+adaptive steps, and with fixed daily steps over output time steps of one and five days.
+"""
+from functools import partial
+
+import numpy as np
+import xso
+
+from phydra.models import NPxZxSizeBased
+from phydra.patankar import PatankarIVPSolver, ProductionDestruction
+from phydra.solvers import initial_state, register_solver
+
+from .common import sizebased_input_vars, initialize_backend
+
+
+class ProductionDestructionSystem:
+    """Single assembly of the production-destruction system of NPxZxSizeBased."""
+    params = [10, 40]
+    param_names = ['num_classes']
+
+    def setup(self, num_classes):
+        core = initialize_backend(NPxZxSizeBased, sizebased_input_vars(num_classes))
+        self.pds = ProductionDestruction(core.model)
+        state = initial_state(core.solver)
+        self.values = self.pds.flux_values(0., state)
+        self.sigma = state[:self.pds.num_vars]
+
+    def time_system(self, num_classes):
+        self.pds(self.values, self.sigma)
+
+
+class SizeSpectrumPatankarRun:
+    """Run of NPxZxSizeBased with 20 size classes over three years."""
+    params = (['solve_ivp', 'solve_ivp_MPRK22', 'solve_ivp_MPRK22_daily'], [1., 5.])
+    param_names = ['solver', 'output_step']
+    timeout = 600
+
+    def setup(self, solver, output_step):
+        # fixed daily steps, registered for the benchmarks only:
+        register_solver('solve_ivp_MPRK22_daily', partial(PatankarIVPSolver, step=1.))
+        self.model_setup = xso.setup(solver=solver, model=NPxZxSizeBased, time=np.arange(0, 3 * 365, output_step),
+                                     input_vars=sizebased_input_vars(20))
+
+    def time_run(self, solver, output_step):
+        self.model_setup.xsimlab.run(model=NPxZxSizeBased)
@@ -0,0 +1,14 @@
+import numpy as np
+
+from phydra.models.sizebased import run_size_sweep
+
+
+class SizeClassSweep:
+    """Sweep over 2 to 10 size classes of NPxZxSizeBased over one year,
+    for a varying number of worker processes."""
+    params = [1, 2, 4]
+    param_names = ['max_workers']
+    timeout = 1200
+
+    def time_sweep(self, max_workers):
+        run_size_sweep(range(2, 11), time=np.arange(0, 365), max_workers=max_workers)
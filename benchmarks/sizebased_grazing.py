@@ -0,0 +1,49 @@
+import numpy as np
+import xso
+
+from phydra.models import NPxZxSizeBased, NPxZxSizeBased_SparseGrazing
+from phydra.solvers import initial_state
+
+from .common import sizebased_input_vars, initialize_backend
+
+
+class SizebasedGrazingRHS:
+    """Single evaluation of the full model function of NPxZxSizeBased,
+    with dense grazing matrix and with sparse grazing over retained pairs."""
+    params = [10, 50, 100, 200]
+    param_names = ['size_classes']
+
+    def setup(self, num):
+        self.dense = initialize_backend(NPxZxSizeBased, sizebased_input_vars(num))
+        self.sparse = initialize_backend(NPxZxSizeBased_SparseGrazing,
+                                         sizebased_input_vars(num, NPxZxSizeBased_SparseGrazing,
+                                                              phiP_tolerance=1e-6))
+        self.dense_state = initial_state(self.dense.solver)
+        self.sparse_state = initial_state(self.sparse.solver)
+
+    def time_dense(self, num):
+        self.dense.model.model_function(0., self.dense_state)
+
+    def time_sparse(self, num):
+        self.sparse.model.model_function(0., self.sparse_state)
+
+
+class SizebasedGrazingRun:
+    """Full model run over one year, comparing dense and sparse grazing."""
+    params = [10, 50]
+    param_names = ['size_classes']
+    timeout = 600
+
+    def setup(self, num):
+        self.time = np.arange(0, 365)
+
+    def run(self, model, input_vars):
+        model_setup = xso.setup(solver='solve_ivp', model=model, time=self.time, input_vars=input_vars)
+        return model_setup.xsimlab.run(model=model)
+
+    def time_dense(self, num):
+        self.run(NPxZxSizeBased, sizebased_input_vars(num))
+
+    def time_sparse(self, num):
+        self.run(NPxZxSizeBased_SparseGrazing,
+                 sizebased_input_vars(num, NPxZxSizeBased_SparseGrazing, phiP_tolerance=1e-6))
@@ -0,0 +1,62 @@
+"""Benchmarks of Strang splitting of physics and biology, with the solver 'solve_ivp_split'.
+
+The physics are advanced by the matrix exponential of their Jacobian, so that the step of the
+explicit biology is not limited by mixing of the slab ocean, or by diffusion across thin layers
+of the water column.
+"""
+import numpy as np
+import xso
+
+from phydra.models import NPZDSlabOcean, NPZDWaterColumn
+from phydra.splitting import SplitModelFunction, physics_fluxes
+from phydra.solvers import initial_state
+
+from .common import slab_input_vars, slab_model, initialize_backend
+from .watercolumn import water_column_input_vars
+
+
+class SplitModelFunctionParts:
+    """Single evaluation of the physics and biology parts of the model function of NPZDWaterColumn."""
+    params = [50, 100]
+    param_names = ['layers']
+
+    def setup(self, layers):
+        core = initialize_backend(slab_model(NPZDWaterColumn), water_column_input_vars(layers))
+        self.function = SplitModelFunction(core.model, physics_fluxes(core.model))
+        self.state = initial_state(core.solver)
+
+    def time_physics(self, layers):
+        self.function.physics(0., self.state)
+
+    def time_biology(self, layers):
+        self.function.biology(0., self.state)
+
+
+class SlabOceanSplitRun:
+    """Run of NPZDSlabOcean over one year, with splitting and the explicit built-in solver."""
+    params = ['solve_ivp_split', 'solve_ivp']
+    param_names = ['solver']
+
+    def setup(self, solver):
+        self.model = slab_model(NPZDSlabOcean)
+        self.model_setup = xso.setup(solver=solver, model=self.model, time=np.arange(0, 365),
+                                     input_vars=slab_input_vars())
+
+    def time_run(self, solver):
+        self.model_setup.xsimlab.run(model=self.model)
+
+
+class WaterColumnSplitRun:
+    """Run of NPZDWaterColumn with 100 layers over one year, with splitting and the explicit
+    built-in solver."""
+    params = ['solve_ivp_split', 'solve_ivp']
+    param_names = ['solver']
+    timeout = 900
+
+    def setup(self, solver):
+        self.model = slab_model(NPZDWaterColumn)
+        self.model_setup = xso.setup(solver=solver, model=self.model, time=np.arange(0, 365),
+                                     input_vars=water_column_input_vars(100))
+
+    def time_run(self, solver):
+        self.model_setup.xsimlab.run(model=self.model)
@@ -0,0 +1,59 @@
+"""Benchmarks of the vertically resolved NPZDWaterColumn, over the number of layers.
+
+Vertical diffusion and sinking couple adjacent layers only, their Jacobian blocks are banded.
+Light limitation couples each layer to the phytoplankton of all layers above, a dense lower
+triangular block, so that the Jacobian is sparse, but not banded. Implicit runs with the sparse
+analytic Jacobian are compared to the explicit built-in solver, whose step is limited by
+diffusion across the thinnest layers.
+"""
+import numpy as np
+import xso
+
+from phydra.models import NPZDWaterColumn
+from phydra.models.watercolumn import column_input_vars
+from phydra.jacobian import ModelJacobian
+from phydra.solvers import initial_state
+
+from .common import slab_model, initialize_backend, STATION_FORCING_PATH
+
+LAYERS = [50, 100, 200]
+
+
+def water_column_input_vars(layers):
+    """Returns input variables of NPZDWaterColumn, with forcing read from STATION_FORCING_PATH."""
+    input_vars = column_input_vars(layers=layers)
+    input_vars['Forcings']['file_path'] = STATION_FORCING_PATH
+    return input_vars
+
+
+class WaterColumnJacobian:
+    """Single evaluation of the model function and of the sparse analytic Jacobian."""
+    params = LAYERS
+    param_names = ['layers']
+
+    def setup(self, layers):
+        core = initialize_backend(slab_model(NPZDWaterColumn), water_column_input_vars(layers))
+        self.model = core.model
+        self.jacobian = ModelJacobian(core.model, sparse=True)
+        self.state = initial_state(core.solver)
+
+    def time_model_function(self, layers):
+        self.model.model_function(0., self.state)
+
+    def time_jacobian(self, layers):
+        self.jacobian(0., self.state)
+
+
+class WaterColumnRun:
+    """Run of NPZDWaterColumn over one year, with sparse BDF and the explicit built-in solver."""
+    params = (LAYERS, ['solve_ivp_BDF_sparse', 'solve_ivp'])
+    param_names = ['layers', 'solver']
+    timeout = 900
+
+    def setup(self, layers, solver):
+        self.model = slab_model(NPZDWaterColumn)
+        self.model_setup = xso.setup(solver=solver, model=self.model, time=np.arange(0, 365),
+                                     input_vars=water_column_input_vars(layers))
+
+    def time_run(self, layers, solver):
+        self.model_setup.xsimlab.run(model=self.model)
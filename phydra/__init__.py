@@ -1,2 +1,10 @@
-from . import models
+from ._lazy import lazy_loader
 
+# submodules are imported on first access, e.g. phydra.solvers, so that import phydra is fast:
+__getattr__, __dir__ = lazy_loader(__name__, submodules=('models', 'solvers', 'spinup', 'profiling', 'ensemble',
+                                                         'windows', 'output', 'reductions', 'checkpoint',
+                                                         'compiled', 'jacobian', 'splitting', 'patankar',
+                                                         'equilibrium', 'continuation'))[:2]
+
+# from phydra import * imports no submodules with optional dependencies, e.g. phydra.compiled requires numba:
+__all__ = ['models']
@@ -0,0 +1,37 @@
+"""Lazy loading of submodules and their attributes on first access, used by the packages of phydra."""
+import importlib
+import sys
+
+
+def lazy_loader(package, attributes=None, submodules=()):
+    """Returns module-level __getattr__ and __dir__ functions of package, importing submodules
+    and attributes of submodules on first access, and the names of __all__, the attributes followed
+    by the submodules, which are imported by from package import *.
+
+    Parameters
+    ----------
+    package : str
+        Name of the package, i.e. __name__ of its __init__ module.
+    attributes : dict, optional
+        Names of attributes mapped to the submodule defining them, relative to package,
+        e.g. {'NPChemostat': '._models'}.
+    submodules : tuple of str
+        Names of submodules loaded on access as attributes of package.
+    """
+    attributes = attributes or {}
+
+    def __getattr__(name):
+        if name in attributes:
+            value = getattr(importlib.import_module(attributes[name], package), name)
+        elif name in submodules:
+            value = importlib.import_module(f'.{name}', package)
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        # later accesses are regular attribute lookups:
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(attributes) | set(submodules))
+
+    return __getattr__, __dir__, [*attributes, *submodules]
@@ -0,0 +1,101 @@
+"""Checkpoints and restarts of XSO model runs.
+
+Long runs in windows, see phydra.windows.run_windows, e.g. write_run or reduce_run, can write a
+checkpoint after every few windows. A checkpoint contains the model setup of the next window,
+i.e. all model and forcing parameters with the state at the end of the last completed window
+as initial values, the index of the next time step, and the accumulated state of the consumer
+of the windows, e.g. the reductions of reduce_run. A run that is interrupted is resumed
+by calling it again with the same checkpoint::
+
+    checkpoint = Checkpoint('sizebased_run.ckpt', every=2)
+    write_run(NPxZxSizeBased, model_setup, 'sizebased_out.zarr', checkpoint=checkpoint)
+
+Each window is an independent run of the model from the initial values stored in its setup, so a
+resumed run is bitwise identical to an uninterrupted run with the same windows. Runs are
+continued beyond the end of a previous output with restart_setup.
+"""
+import os
+import pickle
+
+import numpy as np
+
+from .spinup import state_init_vars, setup_with_time
+
+
+class Checkpoint:
+    """Checkpoint file of a run in windows.
+
+    Parameters
+    ----------
+    path : str
+        Path of the checkpoint file. If it exists, runs with the checkpoint resume from it.
+    every : int
+        Number of windows between checkpoints.
+    remove : bool
+        If True, the checkpoint file is removed after the run has finished.
+    """
+
+    def __init__(self, path, every=1, remove=False):
+        if every < 1:
+            raise ValueError("every needs to be at least 1 window")
+        self.path = path
+        self.every = every
+        self.remove = remove
+
+    def load(self):
+        """Returns dict of the checkpoint with keys 'model_setup', 'first' and 'state',
+        or None if there is no checkpoint file."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as file:
+            return pickle.load(file)
+
+    def save(self, model_setup, first, state=None):
+        """Writes checkpoint of a run continuing at time step first with model_setup.
+        The file is replaced atomically, so that a run killed while writing keeps the previous checkpoint."""
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump({'model_setup': model_setup, 'first': first, 'state': state}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path)
+
+    def finish(self):
+        """Removes the checkpoint file after the run has finished, if remove is True."""
+        if self.remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def restart_setup(model, model_setup, model_out, duration=None):
+    """Returns model setup continuing a run from the final state of its output.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model of the run.
+    model_setup : xarray.Dataset
+        Model setup of the run, defining all other inputs and the solver.
+    model_out : xarray.Dataset
+        Output of the run, e.g. of xsimlab.run or spin_up.
+    duration : float, optional
+        Length of the continued run, in model time units, defaults to the length of the run
+        of model_setup.
+
+    Returns
+    -------
+    xarray.Dataset
+        Model setup with the final state of model_out as initial values, and time starting at the
+        last time of model_out, on the time step of model_setup. The first time step of its output
+        is the final state of model_out.
+    """
+    setup_time = model_setup['Time__time_input'].values
+    time_step = setup_time[1] - setup_time[0]
+    if duration is None:
+        duration = setup_time[-1] - setup_time[0]
+    start = model_out['time'].values[-1]
+    time = start + np.arange(int(round(duration / time_step)) + 1) * time_step
+
+    new_setup = setup_with_time(model, model_setup, time)
+    with model:
+        return new_setup.xsimlab.update_vars(
+            input_vars={init: model_out[var].isel(time=-1).values
+                        for var, init in state_init_vars(model).items()})
@@ -0,0 +1,846 @@
+"""Compiled model functions of XSO models, using numba.
+
+The model function of XSO evaluates each flux by calling the component method in Python,
+unpacking arguments from dictionaries of state, parameters and forcings. For the small state
+vectors of phydra models this overhead dominates the cost of the right-hand side.
+
+CompiledModelFunction generates a single fused function from an assembled XSO model, that
+evaluates all forcings and fluxes and routes them to the variables in the same order as the
+XSO model function, and compiles it with numba. It calls flux kernels, numba-compiled
+equivalents of the flux functions of components, registered in FLUX_KERNELS with
+the :func:`flux_kernel` decorator.
+
+Kernels take the same arguments as the flux function, with these differences:
+
+- scalar variables are passed as arrays of size 1, variables with dimensions as 1D arrays,
+- group arguments are passed as tuple of flux values, also for groups containing a single flux.
+
+Forcing functions are compiled if their type is registered in FORCING_COMPILERS, constant forcings
+are passed as data without evaluation, other forcing functions are evaluated in Python before
+each call of the compiled function.
+
+Flux kernels are cached to disk by numba, the fused function is compiled on first use in
+each process, taking several seconds for the larger models, and reused for later runs of
+models with the same structure, e.g. during spin-up.
+
+The compiled model function is used by the 'solve_ivp_numba' solver, e.g.::
+
+    xso.setup(solver='solve_ivp_numba', model=NPZDSlabOcean, ...)
+"""
+import inspect
+
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.interpolate import PPoly
+
+try:
+    import numba
+    from numba.core import types
+    from numba.extending import overload
+except ImportError as error:
+    raise ImportError("Compiled model functions require numba, install it with 'pip install numba'") from error
+
+from xso.solvers import IVPSolver
+
+from .jacobian import flux_component
+from .profiling import unwrap_profiled
+from .solvers import initial_state, store_solution
+
+from .models.chemostat import fluxes as chemostat_fluxes
+from .forcing import SinusoidalForcing, AffineForcing
+from .models.slabocean.forcings import PeriodicForcingTable, PeriodicSplineForcing, IrradianceForcing
+from .models.slabocean.fluxes import (basic as slab_basic, mixing as slab_mixing,
+                                      growth as slab_growth, grazing as slab_grazing)
+from .models.sizebased.fluxes import (basic as sizebased_basic, growth as sizebased_growth,
+                                      grazing as sizebased_grazing)
+
+
+FLUX_KERNELS = {}
+FORCING_COMPILERS = {}
+
+# compiled model functions are reused for models of identical structure, keyed by generated source and kernels:
+_COMPILED_FUNCTIONS = {}
+
+
+def as_array(value):
+    """Returns value as array of at least 1 dimension, also for floats within compiled functions."""
+    return np.atleast_1d(value)
+
+
+@overload(as_array)
+def _as_array_overload(value):
+    if isinstance(value, types.Array):
+        return lambda value: value
+    return lambda value: np.full(1, value, dtype=np.float64)
+
+
+def flux_kernel(component, flux_name):
+    """Decorator registering a function as numba kernel of the flux flux_name of component.
+    The function is compiled with numba.njit."""
+    def register(func):
+        kernel = numba.njit(cache=True)(func)
+        FLUX_KERNELS[(component, flux_name)] = kernel
+        return kernel
+    return register
+
+
+def forcing_compiler(*classes):
+    """Decorator registering a function returning a compiled forcing evaluator and its data,
+    for forcings of the given classes of phydra.forcing, and their subclasses."""
+    def register(func):
+        for cls in classes:
+            FORCING_COMPILERS[cls] = func
+        return func
+    return register
+
+
+def find_kernel(component, func):
+    """Returns registered kernel of flux function func of component, or None."""
+    for cls in type(component).__mro__:
+        kernel = FLUX_KERNELS.get((cls, func.__name__))
+        if kernel is not None:
+            return kernel
+    return None
+
+
+def compile_forcing(func):
+    """Returns tuple of compiled evaluator, called as evaluator(time, data), and data of forcing function func.
+    Returns None, if the forcing function can not be compiled."""
+    func = unwrap_profiled(func)
+    for cls in type(func).__mro__:
+        compiler = FORCING_COMPILERS.get(cls)
+        if compiler is not None:
+            return compiler(func)
+    return None
+
+
+def constant_value(func):
+    """Returns value of constant forcing func as float or contiguous float array, or None
+    if func is not constant, see phydra.forcing.ConstantForcing."""
+    func = unwrap_profiled(func)
+    if getattr(func, 'kind', None) != 'constant':
+        return None
+    value = func.value
+    return float(value) if np.ndim(value) == 0 else np.ascontiguousarray(value, dtype=float)
+
+
+# Forcings:
+
+@numba.njit(cache=True)
+def sinusoidal_forcing(time, data):
+    mean, amplitude, period = data
+    return mean + amplitude * np.sin(time / period * 2 * np.pi)
+
+
+@numba.njit(cache=True)
+def irradiance_forcing(time, data):
+    """Compiled equivalent of phydra.models.slabocean.forcings.irradiance_function."""
+    latradians, clouds, e0 = data
+    declin = 23.45 * np.sin(2 * np.pi * (284 + time) * 0.00274) * np.pi / 180
+    day_length = 2 * np.arccos(-1 * np.tan(latradians) * np.tan(declin)) * 12 / np.pi
+    albedo = 0.04
+    solarconst = 1368.0
+    parrac = 0.43
+    coszen = np.sin(latradians) * np.sin(declin) + np.cos(latradians) * np.cos(declin)
+    zen = np.arccos(coszen) * 180 / np.pi
+    Rvector = 1 / np.sqrt(1 + 0.033 * np.cos(2 * np.pi * time * 0.00274))
+    Iclear = solarconst * coszen ** 2 / (Rvector ** 2) / (1.2 * coszen + e0 * (1.0 + coszen) * 0.001 + 0.0455)
+    cfac = (1 - 0.62 * clouds * 0.125 + 0.0019 * (90 - zen))
+    Inoon = Iclear * cfac * (1 - albedo)
+    noonpar = parrac * Inoon
+    return noonpar * day_length * np.sin(2 / np.pi)
+
+
+@numba.njit(cache=True)
+def periodic_spline_forcing(time, data):
+    """Evaluates piecewise polynomial with breakpoints and coefficients of shape (order + 1, intervals)."""
+    breaks, coefficients, period = data
+    x = time % period
+    index = min(max(np.searchsorted(breaks, x, side='right') - 1, 0), len(breaks) - 2)
+    dx = x - breaks[index]
+    value = 0.
+    for order in range(coefficients.shape[0]):
+        value = value * dx + coefficients[order, index]
+    return value
+
+
+@numba.njit(cache=True)
+def forcing_table(time, data):
+    """Compiled equivalent of PeriodicForcingTable.__call__, for forcings of scalar value."""
+    coefficients, period, step, size, order = data
+    position = (time % period) / step
+    index = min(int(position), size - 1)
+    if order == 0:
+        return coefficients[0, index]
+    fraction = position - index
+    if order == 1:
+        return coefficients[0, index] + fraction * coefficients[1, index]
+    return coefficients[0, index] + fraction * (coefficients[1, index] + fraction * (
+            coefficients[2, index] + fraction * coefficients[3, index]))
+
+
+@numba.njit(cache=True)
+def stacked_forcing_table(time, data):
+    """Compiled equivalent of PeriodicForcingTable.__call__, for forcings stacked along the first axis."""
+    coefficients, period, step, size, order = data
+    position = (time % period) / step
+    index = min(int(position), size - 1)
+    if order == 0:
+        return coefficients[0, :, index].copy()
+    fraction = position - index
+    if order == 1:
+        return coefficients[0, :, index] + fraction * coefficients[1, :, index]
+    return coefficients[0, :, index] + fraction * (coefficients[1, :, index] + fraction * (
+            coefficients[2, :, index] + fraction * coefficients[3, :, index]))
+
+
+@forcing_compiler(PeriodicForcingTable)
+def compile_forcing_table(table):
+    """Returns compiled evaluator and data of PeriodicForcingTable."""
+    data = (table.coefficients, table.period, table.step, table.size, table.order)
+    if table.coefficients.ndim == 2:
+        return forcing_table, data
+    if table.coefficients.ndim == 3:
+        return stacked_forcing_table, data
+    return None
+
+
+@forcing_compiler(SinusoidalForcing)
+def compile_sinusoidal_forcing(forcing):
+    return sinusoidal_forcing, tuple(float(forcing.parameters[key]) for key in ('mean', 'amplitude', 'period'))
+
+
+@forcing_compiler(IrradianceForcing)
+def compile_irradiance_forcing(forcing):
+    return irradiance_forcing, tuple(np.asarray(forcing.parameters[key], dtype=float)
+                                     if np.ndim(forcing.parameters[key]) else float(forcing.parameters[key])
+                                     for key in ('latradians', 'clouds', 'e0'))
+
+
+@forcing_compiler(PeriodicSplineForcing)
+def compile_spline_forcing(forcing):
+    polynomial = PPoly.from_spline(forcing.spl)
+    if forcing.deriv:
+        polynomial = polynomial.derivative(forcing.deriv)
+    return periodic_spline_forcing, (np.ascontiguousarray(polynomial.x), np.ascontiguousarray(polynomial.c),
+                                     float(forcing.period))
+
+
+@forcing_compiler(AffineForcing)
+def compile_affine_forcing(forcing):
+    """Affine functions of a spline forcing, e.g. N0 as a linear function of the MLD spline,
+    are compiled as scaled piecewise polynomial."""
+    compiled = compile_forcing(forcing.parameters['func'])
+    if compiled is None or compiled[0] is not periodic_spline_forcing:
+        return None
+    breaks, coefficients, period = compiled[1]
+    coefficients = coefficients * float(forcing.parameters['scale'])
+    coefficients[-1] += float(forcing.parameters['offset'])
+    return periodic_spline_forcing, (breaks, coefficients, period)
+
+
+# Chemostat fluxes:
+
+@flux_kernel(chemostat_fluxes.LinearInflow, 'input')
+def chemostat_inflow(sink, source, rate):
+    return source * rate
+
+
+@flux_kernel(chemostat_fluxes.MonodGrowth, 'uptake')
+def chemostat_uptake(mu_max, resource, consumer, halfsat):
+    return mu_max * resource / (resource + halfsat) * consumer
+
+
+@flux_kernel(chemostat_fluxes.LinearOutflow_ListInput, 'decay')
+def chemostat_outflow(var_list, rate):
+    return var_list * rate
+
+
+# Slab ocean fluxes:
+
+@flux_kernel(slab_basic.LinearExchange, 'decay')
+def linear_exchange(source, sink, rate):
+    return source * rate
+
+
+@flux_kernel(slab_basic.QuadraticDecay, 'decay')
+def quadratic_decay(var, rate):
+    return var ** 2 * rate
+
+
+@flux_kernel(slab_basic.QuadraticExchange, 'decay')
+def quadratic_exchange(source, sink, rate):
+    return source ** 2 * rate
+
+
+@flux_kernel(slab_mixing.SlabSinking, 'sinking')
+def slab_sinking(var, rate, mld):
+    return var * rate / mld
+
+
+@flux_kernel(slab_mixing.Mixing_K, 'mixing')
+def mixing_K(mld, mld_deriv, kappa):
+    return (np.maximum(mld_deriv, 0) + kappa) / mld
+
+
+@flux_kernel(slab_mixing.SlabUpwelling_KfromGroup, 'mixing')
+def slab_upwelling(n, n_0, mixing_K):
+    return (n_0 - n) * mixing_K[0]
+
+
+@flux_kernel(slab_mixing.SlabMixing_KfromGroup, 'mixing')
+def slab_mixing(vars_sink, mixing_K):
+    K = as_array(mixing_K[0])
+    return (np.reshape(vars_sink, (-1, K.size)) * K).ravel()
+
+
+@flux_kernel(slab_growth.EMPOWER_Growth_ML, 'growth')
+def empower_growth(resource, consumer, mu_max, growth_lims):
+    if len(growth_lims) == 1:
+        # a single group argument is the array itself, reduced by math.prod in the component
+        return mu_max * np.prod(growth_lims[0]) * consumer
+    product = growth_lims[0]
+    for i in range(1, len(growth_lims)):
+        product = product * growth_lims[i]
+    return mu_max * product * consumer
+
+
+@flux_kernel(slab_growth.EMPOWER_Monod_ML, 'monod_lim')
+def empower_monod(resource, halfsat):
+    return resource / (resource + halfsat)
+
+
+@flux_kernel(slab_growth.EMPOWER_Eppley_ML, 'temp_dependence')
+def empower_eppley(temp, VpMax):
+    return VpMax * 1.066 ** temp
+
+
+@flux_kernel(slab_growth.EMPOWER_Smith_LambertBeer_ML, 'light_limitation')
+def empower_lambert_beer(i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+    VpT = VpT[0]
+    kPAR = kw + kc * pigment_biomass
+    i_0 = i_0 / 24
+    x_0 = alpha * i_0
+    x_H = alpha * i_0 * np.exp(- kPAR * mld)
+    VpH = VpT / kPAR / mld * (
+            np.log(x_0 + (VpT ** 2 + x_0 ** 2) ** 0.5) - np.log(x_H + (VpT ** 2 + x_H ** 2) ** 0.5))
+    return VpH * 24 / CtoChl
+
+
+@numba.njit(cache=True)
+def smith_integral(Iin, Iout, kPARlay, alpha, Vp):
+    x0 = alpha * Iin
+    xH = alpha * Iout
+    return Vp / kPARlay * (np.log(x0 + (Vp ** 2 + x0 ** 2) ** 0.5) - np.log(xH + (Vp ** 2 + xH ** 2) ** 0.5))
+
+
+@flux_kernel(slab_growth.EMPOWER_Smith_Anderson3Layer_ML, 'light_limitation')
+def empower_anderson_3layer(i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+    i_0 = as_array(i_0)
+    mld = as_array(mld)
+    pigment_biomass = as_array(pigment_biomass)
+    VpT = as_array(VpT[0])
+    CtoChl = CtoChl[0]
+    size = max(i_0.size, mld.size, pigment_biomass.size, VpT.size, alpha.size)
+    c = slab_growth.ANDERSON_KPAR_COEFFS
+    layer_top = slab_growth.ANDERSON_LAYER_TOP
+    layer_depth = slab_growth.ANDERSON_LAYER_DEPTH
+
+    out = np.empty(size)
+    for i in range(size):
+        I = i_0[i % i_0.size] / 24
+        depth = mld[i % mld.size]
+        Vp = VpT[i % VpT.size]
+        ss = np.sqrt(pigment_biomass[i % pigment_biomass.size] * 6.625 * 12.0 / CtoChl)
+
+        L_I = 0.
+        Ibase = I
+        for layer in range(3):
+            kPAR = c[0, layer] + c[1, layer] * ss + c[2, layer] * ss ** 2 + c[3, layer] * ss ** 3 + \
+                   c[4, layer] * ss ** 4 + c[5, layer] * ss ** 5
+            zdep = min(max(depth - layer_top[layer], 0.), layer_depth[layer])
+            # as in EMPOWER_Smith_Anderson3Layer_ML, including the operator precedence bug of its previous version:
+            attenuation = np.exp(-kPAR * (layer_top[layer] + zdep) - layer_top[layer])
+            Ibase = Ibase * attenuation
+            if zdep > 0.:
+                L_I += smith_integral(Ibase / attenuation, Ibase, kPAR, alpha[i % alpha.size], Vp)
+        out[i] = L_I * 24 / CtoChl / depth
+    return out
+
+
+@flux_kernel(slab_grazing.HollingTypeIII_ResourcesListInput_Consumption2Group, 'grazing')
+def holling_type_III(resources, consumer, feed_prefs, Imax, kZ):
+    scaled_resources = resources ** 2 * feed_prefs
+    return scaled_resources * Imax / (kZ ** 2 + np.sum(scaled_resources)) * consumer
+
+
+@flux_kernel(slab_grazing.HollingTypeIII_ResourcesListInput_Consumption2Group_MultiStation, 'grazing')
+def holling_type_III_multistation(resources, consumer, feed_prefs, Imax, kZ):
+    scaled_resources = np.reshape(resources, (feed_prefs.size, -1)) ** 2 * np.reshape(feed_prefs, (-1, 1))
+    return (scaled_resources * Imax / (kZ ** 2 + np.sum(scaled_resources, axis=0)) * consumer).ravel()
+
+
+@flux_kernel(slab_grazing.HollingTypeIII_GrossGrowthEfficiency, 'grazing')
+def holling_type_III_gge(grazing_routing, feed_prefs, Imax, kZ, beta, epsilon):
+    routed = np.reshape(grazing_routing, (feed_prefs.size + 3, -1))
+    resources, consumer = routed[:-3], routed[-3]
+    scaled_resources = resources ** 2 * np.reshape(feed_prefs, (-1, 1))
+    graze_out = scaled_resources * Imax / (kZ ** 2 + np.sum(scaled_resources, axis=0)) * consumer
+    total_grazing = np.sum(graze_out, axis=0)
+    return np.concatenate(((-graze_out).ravel(),
+                           total_grazing * beta * epsilon,
+                           total_grazing * (1 - beta),
+                           total_grazing * beta * (1 - epsilon)))
+
+
+@numba.njit(cache=True)
+def total_grazing(graze_out, consumer):
+    return np.sum(np.reshape(graze_out[0], (-1, consumer.size)), axis=0)
+
+
+@flux_kernel(slab_grazing.GrossGrowthEfficiency, 'assimilation')
+def gge_assimilation(assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta, epsilon):
+    return total_grazing(graze_out, assimilated_consumer) * beta * epsilon
+
+
+@flux_kernel(slab_grazing.GrossGrowthEfficiency, 'egestion')
+def gge_egestion(assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta, epsilon):
+    return total_grazing(graze_out, assimilated_consumer) * (1 - beta)
+
+
+@flux_kernel(slab_grazing.GrossGrowthEfficiency, 'excretion')
+def gge_excretion(assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta, epsilon):
+    return total_grazing(graze_out, assimilated_consumer) * beta * (1 - epsilon)
+
+
+# Size-based fluxes:
+
+@flux_kernel(sizebased_basic.LinearForcingInput, 'input')
+def linear_forcing_input(var, forcing, rate):
+    return forcing * rate
+
+
+@flux_kernel(sizebased_basic.LinearPhytoMortality, 'mortality')
+def linear_phyto_mortality(var, rate):
+    return var * rate
+
+
+@flux_kernel(sizebased_basic.QuadraticZooMortality, 'mortality')
+def quadratic_zoo_mortality(var, rate):
+    return rate * var * np.sum(var)
+
+
+@flux_kernel(sizebased_growth.MonodGrowth_SizeBased, 'uptake')
+def sizebased_uptake(resource, consumer, halfsat, mu_max):
+    return mu_max * resource / (resource + halfsat) * consumer
+
+
+@numba.njit(cache=True)
+def sizebased_grazing_totals(resource, consumer, phiP, threshold, Imax, KsZ):
+    """Returns grazing totals per resource and ingestion totals per consumer, over all pairs
+    with feeding preference above threshold."""
+    num_resource, num_consumer = phiP.shape
+    grazed = np.zeros(num_resource)
+    ingested = np.zeros(num_consumer)
+    for j in range(num_consumer):
+        food = 0.
+        for i in range(num_resource):
+            if phiP[i, j] > threshold:
+                food += phiP[i, j] / KsZ * resource[i]
+        ingestion = Imax[j % Imax.size] * consumer[j] / (1 + food)
+        for i in range(num_resource):
+            if phiP[i, j] > threshold:
+                grazing = ingestion * phiP[i, j] / KsZ * resource[i]
+                grazed[i] += grazing
+                ingested[j] += grazing
+    return grazed, ingested
+
+
+@flux_kernel(sizebased_grazing.SizebasedGrazingMatrix, 'grazing')
+def sizebased_grazing_matrix(resource, consumer, phiP, Imax, KsZ):
+    PscaledAsFood = phiP / KsZ[0] * np.reshape(resource, (-1, 1))
+    return Imax * consumer * PscaledAsFood / (1 + np.sum(PscaledAsFood, axis=0))
+
+
+@flux_kernel(sizebased_grazing.GrossGrowthEfficiency_MatrixGrazing, 'grazing')
+def sizebased_gge_grazing(assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg, epsilon):
+    return np.sum(graze_matrix[0], axis=1)
+
+
+@flux_kernel(sizebased_grazing.GrossGrowthEfficiency_MatrixGrazing, 'assimilation')
+def sizebased_gge_assimilation(assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg,
+                               epsilon):
+    return np.sum(graze_matrix[0], axis=0) * epsilon
+
+
+@flux_kernel(sizebased_grazing.GrossGrowthEfficiency_MatrixGrazing, 'egestion')
+def sizebased_gge_egestion(assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg, epsilon):
+    return np.sum(graze_matrix[0]) * (1 - f_eg - epsilon)
+
+
+@flux_kernel(sizebased_grazing.SizebasedGrazingMatrix_GrossGrowthEfficiency, 'grazing')
+def sizebased_grazing_gge(grazing_routing, phiP, Imax, KsZ, f_eg, epsilon):
+    num_resource, num_consumer = phiP.shape
+    grazed, ingested = sizebased_grazing_totals(grazing_routing[:num_resource],
+                                                grazing_routing[num_resource:num_resource + num_consumer],
+                                                phiP, -np.inf, Imax, KsZ[0])
+    return np.concatenate((-grazed, ingested * epsilon, np.full(1, np.sum(grazed)) * (1 - f_eg - epsilon)))
+
+
+@flux_kernel(sizebased_grazing.SizebasedGrazingSparse, 'grazing')
+def sizebased_grazing_sparse(resource, consumer, phiP, phiP_tolerance, Imax, KsZ):
+    phiP_max = np.max(phiP) if phiP.size else 0.
+    grazed, ingested = sizebased_grazing_totals(resource, consumer, phiP, np.max(phiP_tolerance) * phiP_max,
+                                                Imax, KsZ[0])
+    return np.concatenate((grazed, ingested))
+
+
+@flux_kernel(sizebased_grazing.GrossGrowthEfficiency_SparseGrazing, 'grazing')
+def sizebased_sparse_gge_grazing(assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg,
+                                 epsilon):
+    return graze_totals[0][:grazed_resource.size].copy()
+
+
+@flux_kernel(sizebased_grazing.GrossGrowthEfficiency_SparseGrazing, 'assimilation')
+def sizebased_sparse_gge_assimilation(assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg,
+                                      epsilon):
+    return graze_totals[0][grazed_resource.size:] * epsilon
+
+
+@flux_kernel(sizebased_grazing.GrossGrowthEfficiency_SparseGrazing, 'egestion')
+def sizebased_sparse_gge_egestion(assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg,
+                                  epsilon):
+    return np.sum(graze_totals[0][:grazed_resource.size]) * (1 - f_eg - epsilon)
+
+
+def load_model_function(source):
+    """Returns model function compiled from module source.
+
+    Flux kernels are cached to disk by numba, the fused model function is compiled once
+    per process and model structure, since it refers to kernels and data of the model.
+    """
+    namespace = {}
+    exec(compile(source, '<phydra.compiled model_function>', 'exec'), namespace)
+    return namespace['model_function']
+
+
+class CompiledModelFunction:
+    """Callable returning the time derivative of the flat state vector of an assembled XSO model,
+    equivalent to model.model_function, evaluated by a single numba-compiled function.
+
+    Parameters
+    ----------
+    model : xso.model.Model
+        Model backend after assembly, as stored with the XSO core.
+
+    Raises
+    ------
+    ValueError
+        If fluxes of the model have no registered kernel, these are listed in the message.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+        self.slices = {}
+        index = 0
+        for key, dims in model.full_model_dims.items():
+            size = int(np.prod(dims)) if dims is not None else 1
+            self.slices[key] = slice(index, index + size)
+            index += size
+        self.size = index
+
+        self.data = []
+        self.kernels = {}
+        self.python_forcings = []
+        self.source = self.module_source(self.generate_source())
+
+        function = _COMPILED_FUNCTIONS.get(self.source)
+        if function is None:
+            function = load_model_function(self.source)
+            _COMPILED_FUNCTIONS[self.source] = function
+        self.function = function
+        self.data = tuple(self.data)
+
+    def __repr__(self):
+        return (f"CompiledModelFunction of size {self.size}, "
+                f"forcings evaluated in Python: {[label for label, _ in self.python_forcings]}")
+
+    def add_data(self, value):
+        """Adds value to the data passed to the compiled function, returns expression to access it."""
+        self.data.append(value)
+        return f'data[{len(self.data) - 1}]'
+
+    def add_kernel(self, kernel):
+        """Adds compiled function to the imports of the generated source, returns its name.
+        Kernels and forcing evaluators need to be defined at module level."""
+        for name, value in self.kernels.items():
+            if value is kernel:
+                return name
+        name = f'kernel_{len(self.kernels)}'
+        self.kernels[name] = kernel
+        return name
+
+    def module_source(self, function_source):
+        """Returns source of module defining the generated model function, importing all kernels."""
+        lines = ['import numpy as np', 'import numba', '', 'from phydra.compiled import as_array']
+        for name, kernel in self.kernels.items():
+            module, qualname = kernel.py_func.__module__, kernel.py_func.__qualname__
+            lines.append(f'from {module} import {qualname} as {name}')
+        return '\n'.join(lines) + '\n\n\n@numba.njit\n' + function_source
+
+    def state_expression(self, label):
+        """Returns expression of variable or flux integral in the flat state vector, always as array."""
+        state_slice = self.slices[label]
+        dims = self.model.full_model_dims[label]
+        if dims is not None and not isinstance(dims, int):
+            return f'y[{state_slice.start}:{state_slice.stop}].reshape({tuple(dims)})'
+        return f'y[{state_slice.start}:{state_slice.stop}]'
+
+    def parameter_expression(self, label):
+        """Returns expression of parameter with label, supplied as float array."""
+        value = self.model.parameters[label]
+        try:
+            value = np.ascontiguousarray(value, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parameter {label} is not numeric and can not be passed to a compiled flux")
+        return self.add_data(value)
+
+    def generate_source(self):
+        """Returns source of the fused model function, with the signature
+        model_function(t, y, data, forcings)."""
+        model = self.model
+        lines = ['def model_function(t, y, data, forcings):',
+                 f'    out = np.zeros({self.size})']
+
+        # forcings:
+        forcing_expressions = {}
+        for i, (label, func) in enumerate(model.forcing_func.items()):
+            value = constant_value(func)
+            if value is not None:
+                # constant forcings are passed as data, without evaluation:
+                forcing_expressions[label] = self.add_data(value)
+                continue
+            compiled = compile_forcing(func)
+            if compiled is None:
+                forcing_expressions[label] = f'forcings[{len(self.python_forcings)}]'
+                self.python_forcings.append((label, func))
+            else:
+                evaluator, data = compiled
+                lines.append(f'    f_{i} = {self.add_kernel(evaluator)}(t, {self.add_data(data)})')
+                forcing_expressions[label] = f'f_{i}'
+
+        # fluxes, in the order of the XSO model function:
+        state_expressions = {label: self.state_expression(label) for label in model.full_model_dims}
+        missing_kernels = []
+        for i, (label, flux) in enumerate(model.fluxes.items()):
+            component, func = flux_component(flux)
+            if component is None:
+                # fluxes defined outside of components, e.g. time, do not depend on the model state
+                value = np.ravel(np.asarray(flux(), dtype=float))
+                lines.append(f'    v_{i} = {self.add_data(value)}')
+            else:
+                kernel = find_kernel(component, func)
+                if kernel is None:
+                    missing_kernels.append(f'{type(component).__name__}.{func.__name__}')
+                    continue
+                arguments = self.flux_arguments(component, func, state_expressions, forcing_expressions)
+                lines.append(f'    v_{i} = as_array({self.add_kernel(kernel)}({", ".join(arguments)}))')
+            state_expressions[label] = f'v_{i}'
+
+        if missing_kernels:
+            raise ValueError(f"No compiled kernels registered for fluxes: {missing_kernels}")
+
+        flux_names = {label: f'v_{i}' for i, label in enumerate(model.fluxes)}
+        lines.extend(self.routing_lines(flux_names))
+
+        for label, name in flux_names.items():
+            flux_slice = self.slices[label]
+            lines.append(f'    out[{flux_slice.start}:{flux_slice.stop}] = {name}.ravel()')
+
+        lines.append('    return out')
+        return '\n'.join(lines) + '\n'
+
+    def flux_arguments(self, component, func, state_expressions, forcing_expressions):
+        """Returns expressions of flux arguments, in the order of the flux function signature."""
+        arguments = {}
+        input_args_dict = component.flux_input_args
+
+        for v_dict in input_args_dict['vars']:
+            if isinstance(v_dict['label'], (list, np.ndarray)):
+                arguments[v_dict['var']] = '(' + ''.join(state_expressions[label] + ', '
+                                                         for label in v_dict['label']) + ')'
+            else:
+                arguments[v_dict['var']] = state_expressions[v_dict['label']]
+
+        for v_dict in input_args_dict['list_input_vars']:
+            arguments[v_dict['var']] = ('np.concatenate((' + ''.join(state_expressions[label] + '.ravel(), '
+                                                                     for label in v_dict['label']) + '))')
+
+        for v_dict in input_args_dict['group_args']:
+            arguments[v_dict['var']] = '(' + ''.join(state_expressions[label] + ', '
+                                                     for label in v_dict['label']) + ')'
+
+        for p_dict in input_args_dict['pars']:
+            arguments[p_dict['var']] = self.parameter_expression(p_dict['label'])
+
+        for f_dict in input_args_dict['forcs']:
+            arguments[f_dict['var']] = forcing_expressions[f_dict['label']]
+
+        return [arguments[arg] for arg in inspect.signature(func).parameters if arg != 'self']
+
+    def routing_lines(self, flux_names):
+        """Returns lines of source routing flux values to the time derivatives of variables,
+        in the same way as the XSO model function."""
+        model = self.model
+        lines = []
+
+        def add(var_label, value, negative, scalar=False):
+            var_slice = self.slices[var_label]
+            sign = '-' if negative else '+'
+            if model.full_model_dims[var_label] or scalar:
+                lines.append(f'    out[{var_slice.start}:{var_slice.stop}] {sign}= {value}')
+            else:
+                lines.append(f'    out[{var_slice.start}] {sign}= np.sum({value})')
+
+        for var_label in model.variables:
+            for flux_var_dict in model.fluxes_per_var.get(var_label, []):
+                flux_label, negative, list_input = flux_var_dict.values()
+                add(var_label, f'{flux_names[flux_label]}.ravel()', negative)
+
+        for flux_var_dict in model.fluxes_per_var.get('list_input', []):
+            flux_label, negative, list_input = flux_var_dict.values()
+            flux_size = self.slices[flux_label].stop - self.slices[flux_label].start
+            list_var_dims = [model.full_model_dims[var] or 1 for var in list_input]
+            name = flux_names[flux_label]
+            if len(list_input) == flux_size:
+                for i, var_label in enumerate(list_input):
+                    add(var_label, f'{name}.ravel()[{i}]', negative, scalar=True)
+            elif sum(list_var_dims) == flux_size:
+                index = 0
+                for var_label, dims in zip(list_input, list_var_dims):
+                    add(var_label, f'{name}.ravel()[{index}:{index + dims}]', negative)
+                    index += dims
+            else:
+                raise ValueError("List input vars dims and flux output dims do not match")
+
+        return lines
+
+    def evaluate_python_forcings(self, time):
+        """Returns tuple of values of forcings that are not compiled."""
+        values = []
+        for label, func in self.python_forcings:
+            value = np.asarray(func(time), dtype=float)
+            values.append(float(value) if value.ndim == 0 else value)
+        return tuple(values)
+
+    def __call__(self, time, current_state):
+        """Returns time derivative of current_state at time."""
+        return self.function(float(time), np.asarray(current_state, dtype=float), self.data,
+                             self.evaluate_python_forcings(time))
+
+
+def max_deviation(model, compiled, time, state):
+    """Returns maximum deviation of the compiled model function from the XSO model function
+    at time and state, relative to the maximum absolute value of the time derivative."""
+    reference = model.model_function(time=time, current_state=state)
+    deviation = np.max(np.abs(compiled(time, state) - reference))
+    return deviation / max(np.max(np.abs(reference)), np.finfo(float).tiny)
+
+
+class EnsembleModelFunction(CompiledModelFunction):
+    """Callable returning the time derivative of the stacked state vectors of an ensemble of members
+    of an assembled XSO model, that differ in the values of some parameters.
+
+    A single call of the compiled function evaluates forcings once and loops over all members,
+    the state vector contains the flat state vectors of all members one after the other.
+
+    Parameters
+    ----------
+    model : xso.model.Model
+        Model backend after assembly, as stored with the XSO core.
+    member_parameters : dict
+        Values of parameters per member, keyed by backend parameter label, e.g. 'Growth_mu_max',
+        as arrays of shape (members, parameter size).
+    """
+
+    def __init__(self, model, member_parameters):
+        self.member_labels = list(member_parameters)
+        self.member_data = tuple(np.ascontiguousarray(value, dtype=float) for value in member_parameters.values())
+        self.members = len(self.member_data[0])
+        super().__init__(model)
+
+    def parameter_expression(self, label):
+        """Returns expression of parameter with label, indexed by member if it varies between members."""
+        if label not in self.member_labels:
+            return super().parameter_expression(label)
+        shape = np.shape(self.model.parameters[label])
+        expression = f'member_data[{self.member_labels.index(label)}][m]'
+        return expression if len(shape) <= 1 else f'{expression}.reshape({shape})'
+
+    def generate_source(self):
+        """Returns source of the fused member function and the ensemble model function looping over members,
+        with the signature model_function(t, y, data, forcings, member_data)."""
+        source = super().generate_source().replace('def model_function(t, y, data, forcings):',
+                                                   'def member_function(t, y, data, forcings, member_data, m):')
+        return source + '\n\n' + '\n'.join([
+            '@numba.njit',
+            'def model_function(t, y, data, forcings, member_data):',
+            '    out = np.empty_like(y)',
+            f'    for m in range(y.size // {self.size}):',
+            f'        out[m * {self.size}:(m + 1) * {self.size}] = member_function(',
+            f'            t, y[m * {self.size}:(m + 1) * {self.size}], data, forcings, member_data, m)',
+            '    return out']) + '\n'
+
+    def __call__(self, time, current_state):
+        """Returns time derivative of the stacked state vectors of all members at time."""
+        return self.function(float(time), np.asarray(current_state, dtype=float), self.data,
+                             self.evaluate_python_forcings(time), self.member_data)
+
+
+class CompiledIVPSolver(IVPSolver):
+    """Solver backend using scipy.integrate.solve_ivp with the compiled model function.
+
+    Parameters
+    ----------
+    method : str
+        Integration method of solve_ivp, defaults to 'RK45' as the built-in 'solve_ivp' solver.
+    check : bool
+        If True, the compiled model function is compared to the XSO model function
+        at the initial state before solving, and a ValueError is raised if they deviate.
+    rtol_check : float
+        Tolerance of the check, relative to the maximum absolute value of the time derivative.
+    **options
+        Additional keyword arguments passed to solve_ivp, e.g. rtol and atol.
+    """
+
+    def __init__(self, method='RK45', check=True, rtol_check=1e-10, **options):
+        super().__init__()
+        self.method = method
+        self.check = check
+        self.rtol_check = rtol_check
+        self.options = options
+        self.compiled = None
+        self.solution = None
+
+    def solve(self, model, time_step):
+        """Solve model using scipy.integrate.solve_ivp, passing the compiled model function,
+        initial values and model.time."""
+        full_init = initial_state(self)
+
+        self.compiled = CompiledModelFunction(model)
+
+        if self.check:
+            deviation = max_deviation(model, self.compiled, model.time[0], full_init)
+            if deviation > self.rtol_check:
+                raise ValueError(f"Compiled model function deviates from the XSO model function "
+                                 f"by {deviation:.3g} at the initial state")
+
+        self.solution = solve_ivp(self.compiled,
+                                  t_span=[model.time[0], model.time[-1]],
+                                  y0=full_init,
+                                  t_eval=model.time,
+                                  method=self.method,
+                                  **self.options)
+
+        store_solution(model, self.solution, time_step)
@@ -0,0 +1,212 @@
+"""Parameter continuation of XSO models.
+
+The response of a model to a parameter, e.g. the dilution rate of NPChemostat, is mapped by
+stepping the parameter along a range of values, starting each solve from the result of the
+previous value, instead of from the initial values of the model setup::
+
+    continuation_out = continuation(NPChemostat, model_setup, ['Inflow__rate', 'Outflow__rate'],
+                                    np.linspace(0.05, 1.2, 50))
+
+continuation follows the equilibrium of models with constant forcing by root finding, see
+phydra.equilibrium, with parameters of fluxes set in the assembled model backend, so that
+the model is set up only once. integration_sweep runs the model setup for each value,
+starting from the final state of the previous run, e.g. for parameters of forcings as the
+period of SinusoidalExternalNutrient, which is evaluated at model setup.
+
+Transitions between consecutive values of the parameter are reported along the parameter
+dimension, e.g. the washout of phytoplankton from the chemostat as
+'extinction: Phytoplankton__value'.
+"""
+import numpy as np
+import xarray as xr
+from scipy.integrate import solve_ivp
+
+from .ensemble import member_parameter_values, changed_parameter_callbacks
+from .equilibrium import SteadyStateFunction, warm_start, solve_equilibrium, equilibrium_output
+from .spinup import state_init_vars
+
+
+def transition(previous, current, names, atol):
+    """Returns description of the change of state between consecutive parameter values, listing
+    names of variables that vanish (extinction) or appear (invasion), or an empty string."""
+    if previous is None:
+        return ''
+    changes = []
+    for kind, vanished in (('extinction', True), ('invasion', False)):
+        changed = [name for name, before, after in zip(names, previous, current)
+                   if np.any((before > atol) & (after <= atol) if vanished else (before <= atol) & (after > atol))]
+        if changed:
+            changes.append(f"{kind}: {', '.join(changed)}")
+    return '; '.join(changes)
+
+
+def parameter_coords(parameters, values):
+    """Returns coordinates of the swept parameters, the first parameter is the dimension."""
+    return {key: (parameters[0], np.asarray(values)) for key in parameters}
+
+
+def continuation(model, model_setup, parameters, values, warmup=10., method='hybr', tol=1e-10,
+                 stability_tol=1e-9, atol=1e-8, fallback=100., seed=1e-6):
+    """Follows the equilibrium of a model with constant forcing along values of parameters of fluxes.
+
+    The model setup is integrated over warmup with the first value, see phydra.equilibrium.equilibrium.
+    For each value, root finding starts from the equilibrium of the previous value. If this is no
+    stable and non-negative fixed point, e.g. beyond the washout of the chemostat, where the previous
+    equilibrium continues to negative biomass, the model is integrated over fallback from the previous
+    equilibrium with the new value, and root finding restarts from the end of the integration.
+    Vanished variables start this integration from seed, so that they can invade again, e.g. when
+    the dilution rate of the chemostat is decreased below washout. Close to bifurcations, the model
+    approaches the new attractor slowly, and values are reported as no fixed point, until the
+    integration over fallback reaches it.
+
+    Changes in stability indicate bifurcations, between stable equilibria of different variables,
+    or from a stable equilibrium to oscillations if the leading eigenvalues are complex.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model with constant forcing, e.g. NPChemostat.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining all other inputs, the initial values, solver
+        and time step of the first integration.
+    parameters : str or list of str
+        Input variables of parameters of fluxes, e.g. 'Growth__mu_max', or a list of parameters
+        set to the same values, e.g. ['Inflow__rate', 'Outflow__rate'] for the dilution rate.
+    values : array
+        Values of the parameters, in the order of continuation.
+    warmup : float
+        Duration of the first integration, in model time units.
+    method, tol, stability_tol, atol
+        Root finding and classification of equilibria, see phydra.equilibrium.equilibrium.
+    fallback : float
+        Duration of integration, if the continued equilibrium is no stable fixed point.
+    seed : float
+        Initial value of variables below atol in the integration.
+
+    Returns
+    -------
+    xarray.Dataset
+        Model output at the equilibria, along the dimension of the first parameter, with the
+        parameters as coordinates. Diagnostics along the parameter dimension are
+        'continuation_converged', 'continuation_stable', 'continuation_fixed_point',
+        'continuation_integrated' (1 if the fallback integration was needed), the leading eigenvalue
+        as 'continuation_eigenvalue_real' and 'continuation_eigenvalue_imag', and
+        'continuation_transition', describing variables vanishing or appearing at each value.
+        Attribute 'continuation_evaluations' is the total number of evaluations of the model function.
+    """
+    parameters = [parameters] if isinstance(parameters, str) else list(parameters)
+    values = np.asarray(values, dtype=float)
+    with model:
+        first_setup = model_setup.xsimlab.update_vars(input_vars={key: values[0] for key in parameters})
+    core, names, model_out, time = warm_start(model, first_setup, warmup)
+    backend = core.model
+    parameter_values = member_parameter_values(backend, {key: values for key in parameters}, len(values))
+    callbacks = changed_parameter_callbacks(backend, parameter_values)
+
+    function = SteadyStateFunction(backend, time[-1])
+    state = np.concatenate([model_out[names[label]].isel(time=-1).values.ravel() for label in function.labels])
+    sizes = [np.size(function.jacobian.var_columns(label)) for label in function.labels]
+    var_names = [names.get(label, label) for label in function.labels]
+
+    points, diagnostics = [], {key: [] for key in ('converged', 'stable', 'fixed_point', 'integrated',
+                                                   'eigenvalue_real', 'eigenvalue_imag', 'transition')}
+    evaluations = 0
+    previous = None
+    for i in range(len(values)):
+        for label, member_values in parameter_values.items():
+            backend.parameters[label] = member_values[i].reshape(np.shape(backend.parameters[label]))
+        for callback, names in callbacks:
+            callback(names)
+
+        solution = solve_equilibrium(function, state, method, tol, stability_tol, atol)
+        evaluations += solution.nfev
+        integrated = not solution.fixed_point
+        if integrated:
+            trajectory = solve_ivp(lambda t, y: backend.model_function(time=time[-1], current_state=y),
+                                   (0., fallback), function.full_state(np.where(state > atol, state, seed)),
+                                   method='LSODA')
+            evaluations += trajectory.nfev
+            solution = solve_equilibrium(function, trajectory.y[function.entries, -1], method, tol,
+                                         stability_tol, atol)
+            evaluations += solution.nfev
+            # continue from the end of the integration, if the model approaches no fixed point:
+            state = solution.x if solution.fixed_point else trajectory.y[function.entries, -1]
+        else:
+            state = solution.x
+
+        current = np.split(solution.x, np.cumsum(sizes)[:-1])
+        points.append(equilibrium_output(model_out, names, function, solution.x).drop_vars(parameters))
+        for key, value in (('converged', solution.converged), ('stable', solution.stable),
+                           ('fixed_point', solution.fixed_point), ('integrated', integrated),
+                           ('eigenvalue_real', solution.eigenvalues[0].real),
+                           ('eigenvalue_imag', abs(solution.eigenvalues[0].imag)),
+                           ('transition', transition(previous, current, var_names, atol))):
+            diagnostics[key].append(value)
+        previous = current
+
+    continuation_out = xr.concat(points, dim=parameters[0], data_vars='different').assign_coords(
+        parameter_coords(parameters, values))
+    for key, value in diagnostics.items():
+        dtype = str if key == 'transition' else (float if key.startswith('eigenvalue') else int)
+        continuation_out[f'continuation_{key}'] = (parameters[0], np.asarray(value, dtype=dtype))
+    continuation_out.attrs['continuation_evaluations'] = int(evaluations)
+    return continuation_out
+
+
+def integration_sweep(model, model_setup, parameters, values, atol=1e-8):
+    """Runs model setup for each value of parameters, starting from the final state of the run
+    with the previous value.
+
+    Unlike continuation, parameters can be inputs of any component, e.g. of forcings as
+    'N0__period' of NPChemostat_sinu, and the model approaches any attractor, e.g. the forced
+    cycle of the chemostat. The time of the model setup is only needed to approach the attractor
+    from the state of the previous value, typically much shorter than from the initial values.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining all other inputs, the solver, the initial
+        values of the first run and the time of each run.
+    parameters : str or list of str
+        Input variables, set to the same values, e.g. 'N0__amplitude'.
+    values : array
+        Values of the parameters, in the order of the sweep.
+    atol : float
+        Variables at the end of a run below atol are considered vanished, see continuation.
+
+    Returns
+    -------
+    xarray.Dataset
+        Model output of all runs, along the dimension of the first parameter, with the parameters
+        as coordinates, and 'sweep_transition', describing variables vanishing or appearing at the
+        end of each run compared to the previous run.
+    """
+    parameters = [parameters] if isinstance(parameters, str) else list(parameters)
+    values = np.asarray(values)
+    init_vars = state_init_vars(model)
+
+    current_setup = model_setup
+    runs, transitions = [], []
+    previous = None
+    for value in values:
+        with model:
+            current_setup = current_setup.xsimlab.update_vars(input_vars={key: value for key in parameters})
+        model_out = current_setup.xsimlab.run(model=model)
+
+        final = {var: model_out[var].isel(time=-1).values for var in init_vars}
+        current = [final[var] for var in init_vars]
+        transitions.append(transition(previous, current, list(init_vars), atol))
+        previous = current
+        runs.append(model_out.drop_vars(parameters))
+
+        with model:
+            current_setup = current_setup.xsimlab.update_vars(
+                input_vars={init: final[var] for var, init in init_vars.items()})
+
+    # output time of runs differs by round-off, runs share the time of the first run:
+    sweep_out = xr.concat(runs, dim=parameters[0], data_vars='different', join='override').assign_coords(
+        parameter_coords(parameters, values))
+    sweep_out['sweep_transition'] = (parameters[0], np.asarray(transitions, dtype=str))
+    return sweep_out
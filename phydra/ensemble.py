@@ -0,0 +1,277 @@
+"""Vectorized ensemble runs of XSO models.
+
+An ensemble consists of members of the same model setup that differ in the values of parameters,
+e.g. sampled from distributions by Latin hypercube sampling. The flat state vectors of all members
+are stacked into a single state vector, so that every evaluation of the right-hand side advances
+all members together. With the numba-compiled model function (see phydra.compiled) a single call
+loops over all members in compiled code, without Python overhead per member::
+
+    samples = sample_parameters({'Growth__mu_max': (0.5, 1.5), 'K__kappa': stats.lognorm(0.5, scale=0.13)}, 1000)
+    ensemble_out = run_ensemble(NPZDSlabOcean, model_setup, samples)
+
+The time step of the adaptive solver is shared by all members, it is controlled by the error of the
+member with the largest error, so that every member is integrated within the tolerances.
+Alternatively members can be integrated with the classic Runge-Kutta method with a fixed step.
+"""
+import numpy as np
+import xarray as xr
+from scipy.integrate import solve_ivp, RK45
+from scipy.stats import qmc
+
+from .jacobian import flux_component
+from .solvers import initial_state, run_backend
+from .spinup import setup_with_time
+
+
+def sample_parameters(distributions, size, method='latin_hypercube', seed=None):
+    """Returns dict of parameter samples for ensemble runs.
+
+    Parameters
+    ----------
+    distributions : dict
+        Distributions of parameters, keyed by input variable, e.g. 'Growth__mu_max'. Values are
+        frozen scipy.stats distributions, or (low, high) tuples for uniform distributions.
+    size : int
+        Number of samples.
+    method : {'latin_hypercube', 'monte_carlo'}
+        Latin hypercube sampling stratifies each parameter into size intervals of equal probability,
+        Monte Carlo sampling draws independent random samples.
+    seed : int, optional
+        Seed of the random number generator.
+
+    Returns
+    -------
+    dict
+        Arrays of samples of shape (size,), keyed by input variable.
+    """
+    rng = np.random.default_rng(seed)
+    if method == 'latin_hypercube':
+        uniform = qmc.LatinHypercube(d=len(distributions), seed=rng).random(size)
+    elif method == 'monte_carlo':
+        uniform = rng.random((size, len(distributions)))
+    else:
+        raise ValueError("method needs to be 'latin_hypercube' or 'monte_carlo'")
+
+    samples = {}
+    for i, (key, distribution) in enumerate(distributions.items()):
+        if isinstance(distribution, tuple):
+            low, high = distribution
+            samples[key] = low + uniform[:, i] * (high - low)
+        else:
+            samples[key] = distribution.ppf(uniform[:, i])
+    return samples
+
+
+def memberwise_method(members, base=RK45):
+    """Returns subclass of a Runge-Kutta method of solve_ivp for stacked state vectors of members,
+    estimating the error norm per member and controlling the step by the largest one."""
+
+    class MemberwiseMethod(base):
+        def _estimate_error_norm(self, K, h, scale):
+            error = (self._estimate_error(K, h) / scale).reshape(members, -1)
+            return np.max(np.sqrt(np.mean(error ** 2, axis=1)))
+
+    MemberwiseMethod.__name__ = MemberwiseMethod.__qualname__ = 'Memberwise' + base.__name__
+    return MemberwiseMethod
+
+
+def fixed_step_rk4(fun, time, y0, step):
+    """Integrates fun with the classic 4th order Runge-Kutta method and returns states at time.
+    Each output interval is divided into equal steps no longer than step."""
+    y = np.asarray(y0, dtype=float)
+    states = [y]
+    for start, stop in zip(time[:-1], time[1:]):
+        substeps = max(int(np.ceil((stop - start) / step - 1e-9)), 1)
+        h = (stop - start) / substeps
+        t = start
+        for _ in range(substeps):
+            k1 = fun(t, y)
+            k2 = fun(t + h / 2, y + h / 2 * k1)
+            k3 = fun(t + h / 2, y + h / 2 * k2)
+            k4 = fun(t + h, y + h * k3)
+            y = y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+            t += h
+        states.append(y)
+    return np.stack(states, axis=-1)
+
+
+def changed_parameter_callbacks(backend, labels):
+    """Returns list of (callback, names) of components of the model backend, that cache values derived
+    from parameters at model setup, e.g. the retained pairs of SizebasedGrazingSparse. Each callback
+    is the parameters_changed method of the component, to be called with the names of its parameters
+    among labels, after these are set in the parameters of the backend."""
+    callbacks = {}
+    for flux in backend.fluxes.values():
+        component, func = flux_component(flux)
+        if component is None or not hasattr(component, 'parameters_changed'):
+            continue
+        names = [p_dict['var'] for p_dict in component.flux_input_args['pars'] if p_dict['label'] in labels]
+        if names:
+            callbacks[id(component)] = (component.parameters_changed, names)
+    return list(callbacks.values())
+
+
+class PythonEnsembleFunction:
+    """Callable returning the time derivative of the stacked state vectors of ensemble members,
+    evaluating the XSO model function for each member in turn. Used for models with fluxes
+    that have no compiled kernel, see phydra.compiled.EnsembleModelFunction."""
+
+    def __init__(self, model, member_parameters):
+        self.model = model
+        self.member_parameters = member_parameters
+        self.members = len(next(iter(member_parameters.values())))
+        self.callbacks = changed_parameter_callbacks(model, member_parameters)
+
+    def __call__(self, time, current_state):
+        states = np.reshape(current_state, (self.members, -1))
+        parameters = self.model.parameters
+        defaults = {label: parameters[label] for label in self.member_parameters}
+        out = np.empty_like(states)
+        try:
+            for m in range(self.members):
+                for label, values in self.member_parameters.items():
+                    parameters[label] = values[m].reshape(np.shape(defaults[label]))
+                for callback, names in self.callbacks:
+                    callback(names)
+                out[m] = self.model.model_function(time=time, current_state=states[m])
+        finally:
+            parameters.update(defaults)
+            for callback, names in self.callbacks:
+                callback(names)
+        return out.ravel()
+
+
+def initialize_ensemble_backend(model, model_setup):
+    """Runs model setup over its first two time steps and returns the XSO core, containing the
+    assembled model backend, and a dict mapping backend labels of variables and fluxes
+    to the names of their output variables, see phydra.solvers.run_backend."""
+    time = model_setup['Time__time_input'].values
+    return run_backend(model, setup_with_time(model, model_setup, time[:2]))
+
+
+def flux_parameter_labels(backend):
+    """Returns set of backend labels of parameters, that are arguments of flux functions."""
+    labels = set()
+    for flux in backend.fluxes.values():
+        component, func = flux_component(flux)
+        if component is not None:
+            labels.update(p_dict['label'] for p_dict in component.flux_input_args['pars'])
+    return labels
+
+
+def member_parameter_values(backend, samples, members):
+    """Returns dict of per-member parameter values keyed by backend label, as arrays of shape
+    (members, parameter size). Samples of one value per member are broadcast to the parameter shape.
+
+    Only parameters of fluxes can vary between members, parameters of forcings are evaluated
+    once at model setup."""
+    values = {}
+    flux_parameters = flux_parameter_labels(backend)
+    for key, sample in samples.items():
+        process, name = key.split('__')
+        label = f'{process}_{name}'
+        if label not in backend.parameters:
+            raise ValueError(f"{key} is not a parameter of the model")
+        if label not in flux_parameters:
+            raise ValueError(f"{key} is not a parameter of a flux and can not vary between ensemble members")
+        size = np.size(backend.parameters[label])
+        sample = np.asarray(sample, dtype=float)
+        if len(sample) != members:
+            raise ValueError(f"Samples of {key} have length {len(sample)}, expected {members}")
+        values[label] = np.broadcast_to(sample.reshape(members, -1), (members, size)).copy()
+    return values
+
+
+def run_ensemble(model, model_setup, samples, integrator='adaptive', backend='numba', step=None,
+                 rtol=1e-3, atol=1e-6):
+    """Runs ensemble of model setup with parameter samples in a single stacked state vector.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining all other inputs and the output time.
+    samples : dict
+        Values of parameters per member, keyed by input variable, e.g. 'Growth__mu_max',
+        as returned by sample_parameters. Arrays have the number of members as first dimension,
+        followed by the dimensions of the parameter, or no further dimension to set all elements
+        of the parameter to the same value.
+    integrator : {'adaptive', 'fixed'}
+        'adaptive' integrates with RK45, with the step controlled by the member with the largest error,
+        'fixed' with the classic Runge-Kutta method at fixed steps.
+    backend : {'numba', 'python'}
+        'numba' evaluates all members in a single compiled function, 'python' loops over
+        members calling the XSO model function, for models with fluxes without compiled kernel.
+    step : float, optional
+        Step of the fixed step integrator, defaults to the output time step.
+    rtol, atol : float
+        Tolerances of the adaptive integrator, applied to each member.
+
+    Returns
+    -------
+    xarray.Dataset
+        Outputs of state variables and flux values of all members along dimension 'ensemble',
+        with the sampled parameter values as variables along 'ensemble'.
+    """
+    members = len(next(iter(samples.values())))
+    core, names, reference = initialize_ensemble_backend(model, model_setup)
+    backend_model = core.model
+    member_parameters = member_parameter_values(backend_model, samples, members)
+
+    if backend == 'numba':
+        from .compiled import EnsembleModelFunction
+        function = EnsembleModelFunction(backend_model, member_parameters)
+    elif backend == 'python':
+        function = PythonEnsembleFunction(backend_model, member_parameters)
+    else:
+        raise ValueError("backend needs to be 'numba' or 'python'")
+
+    y0 = np.tile(initial_state(core.solver), members)
+    time = np.asarray(model_setup['Time__time_input'].values, dtype=float)
+
+    if integrator == 'adaptive':
+        solution = solve_ivp(function, t_span=[time[0], time[-1]], y0=y0, t_eval=time,
+                             method=memberwise_method(members), rtol=rtol, atol=atol)
+        if not solution.success:
+            raise RuntimeError(f"Integration of ensemble failed: {solution.message}")
+        states = solution.y
+    elif integrator == 'fixed':
+        states = fixed_step_rk4(function, time, y0, step or time[1] - time[0])
+    else:
+        raise ValueError("integrator needs to be 'adaptive' or 'fixed'")
+
+    return ensemble_dataset(backend_model, names, reference, states.reshape(members, -1, len(time)),
+                            time, samples)
+
+
+def ensemble_dataset(backend, names, reference, states, time, samples):
+    """Returns dataset of stacked states of shape (members, state size, time), unpacked to output
+    variables in the same way as the XSO solvers, see phydra.solvers.store_solution."""
+    members = states.shape[0]
+    time_step = time[1] - time[0] if len(time) > 1 else 1.
+    data_vars = {}
+    index = 0
+    for label, dims in backend.full_model_dims.items():
+        size = int(np.prod(dims)) if dims is not None else 1
+        values = states[:, index:index + size]
+        index += size
+        if names.get(label) not in reference:
+            continue
+        output_dims = reference[names[label]].dims
+        values = values.reshape((members, *reference[names[label]].shape[:-1], len(time)))
+        if label in backend.flux_values:
+            # flux values are stored as time integrals, the output is the difference per time step:
+            difference = np.diff(values, axis=-1) / time_step
+            values = np.concatenate((difference[..., :1], difference), axis=-1)
+        data_vars[names[label]] = (('ensemble', *output_dims), values, reference[names[label]].attrs)
+
+    for key, sample in samples.items():
+        sample = np.asarray(sample)
+        data_vars[key] = (('ensemble', *reference[key].dims[:sample.ndim - 1]), sample)
+
+    output_dims = {dim for dims, *_ in data_vars.values() for dim in dims}
+    coords = {name: coord for name, coord in reference.coords.items()
+              if name != 'time' and set(coord.dims) <= output_dims}
+    coords.update({'time': time, 'ensemble': np.arange(members)})
+    return xr.Dataset(data_vars, coords=coords)
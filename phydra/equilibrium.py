@@ -0,0 +1,180 @@
+"""Equilibria of XSO models with constant forcing.
+
+Models with constant forcing, e.g. NPChemostat or NPxZxSizeBased with ConstantExternalNutrient,
+are often integrated for years only to read off their steady state. Here the steady state is
+solved for directly, as root of the model function of the variables, by the hybrid Newton method
+of scipy.optimize.root with the analytic Jacobian of phydra.jacobian::
+
+    equilibrium_out = equilibrium(NPChemostat, model_setup)
+
+The root finding starts from the end of a short integration of the model setup, which places
+it close to the equilibrium the model approaches from its initial values. Stability of the
+equilibrium is determined from the eigenvalues of the Jacobian. An unstable equilibrium is not
+the attractor of the model, e.g. for oscillating size classes of NPxZxSizeBased, whose state
+has to be found by integration, see phydra.spinup.
+"""
+import numpy as np
+import xarray as xr
+from scipy.optimize import root
+
+from .jacobian import ModelJacobian
+from .profiling import unwrap_profiled
+from .solvers import run_backend
+from .spinup import setup_with_time
+
+# root finding methods of scipy.optimize.root using the Jacobian:
+JACOBIAN_METHODS = ('hybr', 'lm')
+
+
+def constant_forcing(backend):
+    """Returns True if all forcings of the model backend are constant, see phydra.forcing."""
+    return all(getattr(unwrap_profiled(func), 'kind', None) == 'constant'
+               for func in backend.forcing_func.values())
+
+
+class SteadyStateFunction:
+    """Model function and Jacobian of the variables of an assembled XSO model at constant time.
+
+    Model time is a variable of XSO models, advanced by the time flux of the Time component,
+    it is excluded, together with other variables changed only by fluxes not defined in
+    components. The time integrals of fluxes in the state vector are set to zero."""
+
+    def __init__(self, model, time):
+        self.model = model
+        self.time = time
+        self.jacobian = ModelJacobian(model)
+        self.num_vars = self.jacobian.num_vars
+
+        self.labels = [label for label in model.variables
+                       if any(self.jacobian.components[flux_var_dict['label']][0] is not None
+                              for flux_var_dict in model.fluxes_per_var.get(label, []))
+                       or any(label in flux_var_dict['list_input']
+                              for flux_var_dict in model.fluxes_per_var.get('list_input', []))]
+        self.entries = np.concatenate([self.jacobian.var_columns(label) for label in self.labels])
+        self.state = np.zeros(self.jacobian.size)
+        for label in model.variables:
+            if label not in self.labels:
+                self.state[self.jacobian.slices[label]] = time
+
+    def full_state(self, variables):
+        state = self.state.copy()
+        state[self.entries] = variables
+        return state
+
+    def __call__(self, variables):
+        return self.model.model_function(time=self.time, current_state=self.full_state(variables))[self.entries]
+
+    def flux_values(self, variables):
+        return self.model.model_function(time=self.time, current_state=self.full_state(variables))[self.num_vars:]
+
+    def jac(self, variables):
+        return self.jacobian(self.time, self.full_state(variables))[np.ix_(self.entries, self.entries)]
+
+
+def warm_start(model, model_setup, warmup):
+    """Integrates model setup over warmup, on its time step and with its solver, and returns
+    the XSO core, the output names of backend labels (see phydra.solvers.run_backend),
+    the model output and its time."""
+    setup_time = model_setup['Time__time_input'].values
+    if np.size(setup_time) < 2:
+        raise ValueError("Time array of model setup needs to contain at least 2 time steps")
+    time_step = setup_time[1] - setup_time[0]
+    steps = max(int(round(warmup / time_step)), 1)
+    time = setup_time[0] + np.arange(steps + 1) * time_step
+
+    core, names, model_out = run_backend(model, setup_with_time(model, model_setup, time))
+    if not constant_forcing(core.model):
+        raise ValueError("Equilibria can only be found for models with constant forcing, "
+                         "see phydra.forcing.ConstantForcing")
+    return core, names, model_out, time
+
+
+def solve_equilibrium(function, initial, method='hybr', tol=1e-10, stability_tol=1e-9, atol=1e-8):
+    """Returns root of the steady state function from initial, as scipy.optimize.OptimizeResult,
+    with the eigenvalues of the Jacobian by decreasing real part, the maximum absolute residual,
+    and flags converged, stable, nonnegative, fixed_point and oscillatory, see equilibrium."""
+    options = {'jac': function.jac} if method in JACOBIAN_METHODS else {}
+    solution = root(function, initial, method=method, tol=tol, **options)
+
+    eigenvalues = np.linalg.eigvals(function.jac(solution.x))
+    solution.eigenvalues = eigenvalues[np.argsort(-eigenvalues.real, kind='stable')]
+    solution.residual = float(np.max(np.abs(function(solution.x))))
+    solution.converged = bool(solution.success)
+    solution.stable = solution.converged and bool(np.all(solution.eigenvalues.real < -stability_tol))
+    solution.nonnegative = bool(np.all(solution.x >= -atol))
+    solution.fixed_point = solution.stable and solution.nonnegative
+    solution.oscillatory = bool(np.abs(solution.eigenvalues[0].imag) > 0)
+    return solution
+
+
+def equilibrium_output(model_out, names, function, variables):
+    """Returns last time step of model output, with state variables and flux values at variables."""
+    equilibrium_out = model_out.isel(time=-1, drop=True)
+    # state vector with flux values in place of their time integrals:
+    values = function.full_state(variables)
+    values[function.num_vars:] = function.flux_values(variables)
+    for label in [*function.labels, *function.model.fluxes]:
+        if names.get(label) not in equilibrium_out:
+            continue
+        output = equilibrium_out[names[label]]
+        equilibrium_out[names[label]] = output.copy(data=values[function.jacobian.slices[label]].reshape(output.shape))
+    return equilibrium_out
+
+
+def equilibrium(model, model_setup, warmup=10., method='hybr', tol=1e-10, stability_tol=1e-9, atol=1e-8):
+    """Solves for the equilibrium of a model with constant forcing, starting from a short integration.
+
+    The model setup is integrated over warmup, on its time step and with its solver, and the
+    root of the model function is found from the final state, with the Jacobian of the model.
+    The equilibrium is stable if the real parts of all eigenvalues of the Jacobian are negative,
+    then it is the attractor of the model, if also no variable is negative. Otherwise, or if root
+    finding fails, the attractor is not a fixed point, e.g. a limit cycle, if the leading eigenvalues
+    are complex, and the model has to be integrated instead. NPxZxSizeBased with many size classes
+    has unstable equilibria, at which some size classes are extinct, or even negative.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model with constant forcing, e.g. NPChemostat or NPxZxSizeBased.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining initial values, solver and the start time
+        and time step of the integration before root finding. The length of its time array is ignored.
+    warmup : float
+        Duration of the integration before root finding, in model time units, at least one time step.
+    method : str
+        Method of scipy.optimize.root, the Jacobian is used by 'hybr' and 'lm'.
+    tol : float
+        Tolerance of root finding.
+    stability_tol : float
+        Eigenvalues with real part above -stability_tol are considered not negative.
+    atol : float
+        Variables below -atol at the equilibrium are considered negative.
+
+    Returns
+    -------
+    xarray.Dataset
+        Model output at the equilibrium, state variables and flux values without time dimension,
+        other outputs at the end of the integration before root finding.
+        The eigenvalues of the Jacobian are stored as variables 'equilibrium_eigenvalue_real' and
+        'equilibrium_eigenvalue_imag' along dimension 'eigenvalue', by decreasing real part.
+        Attributes 'equilibrium_converged', 'equilibrium_stable', 'equilibrium_nonnegative' and
+        'equilibrium_fixed_point' are 1 or 0, 'equilibrium_oscillatory' is 1 if the leading eigenvalue is complex,
+        'equilibrium_residual' is the maximum absolute model function at the equilibrium
+        and 'equilibrium_evaluations' the number of evaluations of the model function.
+    """
+    core, names, model_out, time = warm_start(model, model_setup, warmup)
+    function = SteadyStateFunction(core.model, time[-1])
+    initial = np.concatenate([model_out[names[label]].isel(time=-1).values.ravel() for label in function.labels])
+    solution = solve_equilibrium(function, initial, method, tol, stability_tol, atol)
+
+    equilibrium_out = equilibrium_output(model_out, names, function, solution.x).assign(
+        equilibrium_eigenvalue_real=xr.DataArray(solution.eigenvalues.real, dims='eigenvalue'),
+        equilibrium_eigenvalue_imag=xr.DataArray(solution.eigenvalues.imag, dims='eigenvalue'))
+    equilibrium_out.attrs.update({
+        'equilibrium_converged': int(solution.converged), 'equilibrium_stable': int(solution.stable),
+        'equilibrium_nonnegative': int(solution.nonnegative), 'equilibrium_fixed_point': int(solution.fixed_point),
+        'equilibrium_oscillatory': int(solution.oscillatory),
+        'equilibrium_residual': solution.residual, 'equilibrium_evaluations': int(solution.nfev),
+        'equilibrium_message': solution.message, 'equilibrium_warmup': float(time[-1] - time[0]),
+    })
+    return equilibrium_out
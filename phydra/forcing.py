@@ -0,0 +1,118 @@
+"""Forcing functions of XSO models.
+
+Forcing components return a function of time from their setup function, which XSO evaluates at every
+right-hand side evaluation of the model for scalar time, and once over the full output time array.
+The classes here declare how a forcing is evaluated, by their attribute kind:
+
+- 'constant': the value does not depend on time, compiled model functions use it as a constant,
+  see phydra.compiled. The model function of XSO still calls constant forcings at every right-hand side
+  evaluation, so only the 'solve_ivp_numba' solver and the compiled ensemble function skip them.
+- 'analytic': a closed expression of time, evaluated with NumPy for scalar time and time arrays.
+- 'tabulated': lookup in a table of values sampled on a regular grid, see
+  phydra.models.slabocean.forcings.PeriodicForcingTable.
+- 'interpolated': interpolation of data, e.g. by splines, see
+  phydra.models.slabocean.forcings.PeriodicSplineForcing.
+
+All forcings are evaluated in a single vectorized call over time arrays, with time as last axis
+of vector-valued forcings. Unlike closures, forcings are picklable, e.g. for process pools.
+"""
+from abc import ABC, abstractmethod
+
+import numpy as np
+import xso
+
+
+class Forcing(ABC):
+    """Abstract base class of forcing functions of time, subclasses define __call__.
+
+    Attributes
+    ----------
+    kind : {'constant', 'analytic', 'tabulated', 'interpolated'}
+        How the forcing is evaluated.
+    breakpoints : array or None
+        Discontinuity times of the forcing, see phydra.solvers.forcing_breakpoints.
+    period : float or None
+        Period of the breakpoints.
+    """
+    kind = None
+    breakpoints = None
+    period = None
+
+    @abstractmethod
+    def __call__(self, time):
+        """Returns forcing value at time, a scalar or an array of times."""
+
+
+class ConstantForcing(Forcing):
+    """Forcing of constant value."""
+    kind = 'constant'
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, time):
+        if np.ndim(time) == 0:
+            return self.value
+        return np.multiply.outer(np.asarray(self.value, dtype=float), np.ones(np.shape(time)))
+
+
+class AnalyticForcing(Forcing):
+    """Forcing given by a NumPy expression of time, called as expression(time, **parameters).
+    The expression has to accept scalar time and time arrays."""
+    kind = 'analytic'
+
+    def __init__(self, expression, **parameters):
+        self.expression = expression
+        self.parameters = parameters
+
+    def __call__(self, time):
+        return self.expression(time, **self.parameters)
+
+
+def sinusoid(time, mean, amplitude, period):
+    return mean + amplitude * np.sin(time / period * 2 * np.pi)
+
+
+class SinusoidalForcing(AnalyticForcing):
+    """Forcing oscillating around mean with amplitude and period."""
+
+    def __init__(self, mean, amplitude, period):
+        super().__init__(sinusoid, mean=mean, amplitude=amplitude, period=period)
+
+
+def affine(time, func, scale, offset):
+    return scale * func(time) + offset
+
+
+class AffineForcing(AnalyticForcing):
+    """Forcing given by scale * func(time) + offset of another forcing function, with its breakpoints."""
+
+    def __init__(self, func, scale, offset):
+        super().__init__(affine, func=func, scale=scale, offset=offset)
+        self.breakpoints = getattr(func, 'breakpoints', None)
+        self.period = getattr(func, 'period', None)
+
+
+class TabulatedForcing(Forcing):
+    """Base class of forcings evaluated by lookup in a table of sampled values."""
+    kind = 'tabulated'
+
+
+class InterpolatedForcing(Forcing):
+    """Base class of forcings evaluated by interpolation of data."""
+    kind = 'interpolated'
+
+
+@xso.component
+class ConstantExternalNutrient:
+    """Component that provides a constant external nutrient
+     as a forcing value.
+    """
+
+    forcing = xso.forcing(foreign=False, setup_func='forcing_setup', description='external nutrient')
+    value = xso.parameter(description='constant value')
+
+    def forcing_setup(self, value):
+        """Method that returns forcing function providing the
+        forcing value as a function of time."""
+        return ConstantForcing(value)
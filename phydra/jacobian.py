@@ -0,0 +1,347 @@
+"""Assembly of analytic Jacobians of XSO models.
+
+Components can provide the partial derivatives of a flux with respect to its inputs
+by defining a method named after the flux function with the suffix ``_jacobian``.
+It receives the same arguments as the flux function and returns a dict mapping
+argument names to partial derivatives of the flux value. Arguments missing from the
+returned dict are treated as having zero partial derivative.
+
+A partial derivative is either supplied as 2D array of shape (flux size, argument size),
+which can be a scipy.sparse matrix, e.g. for fluxes coupling neighbouring layers only,
+or as 1D array (or scalar) for the common cases of:
+
+- element-wise dependency, if flux and argument are of the same size (diagonal),
+- a scalar flux depending on an array argument (row),
+- an array flux depending on a scalar argument (column).
+
+For group arguments containing more than one flux, a list of partial derivatives
+is returned, in the order of the group. Dependencies on other fluxes via group arguments
+are resolved by the chain rule.
+
+For fluxes without ``_jacobian`` method, partial derivatives are approximated by
+finite differences of the flux function with respect to its state-dependent arguments.
+"""
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse as sp
+
+from xso.model import return_dim_ndarray
+
+from .profiling import unwrap_profiled
+
+
+def flux_component(flux):
+    """Returns component instance and undecorated flux function of a flux registered with the XSO model.
+
+    Fluxes that are not defined in XSO components, e.g. the time flux of the Time component,
+    do not depend on the model state, for these (None, flux) is returned."""
+    flux = unwrap_profiled(flux)
+    if flux.__closure__ is None:
+        return None, flux
+    closure = dict(zip(flux.__code__.co_freevars, (cell.cell_contents for cell in flux.__closure__)))
+    return closure['self'], closure['func']
+
+
+def flux_arguments(component, state, parameters, forcings):
+    """Returns the input arguments of a flux function of component,
+    unpacked in the same way as by the XSO flux decorator."""
+    input_args = {}
+    input_args_dict = component.flux_input_args
+
+    for v_dict in input_args_dict['vars']:
+        if isinstance(v_dict['label'], (list, np.ndarray)):
+            input_args[v_dict['var']] = [state[label] for label in v_dict['label']]
+        else:
+            input_args[v_dict['var']] = state[v_dict['label']]
+
+    for v_dict in input_args_dict['list_input_vars']:
+        input_args[v_dict['var']] = np.concatenate([state[label] for label in v_dict['label']], axis=None)
+
+    for v_dict in input_args_dict['group_args']:
+        states = [state[label] for label in v_dict['label']]
+        input_args[v_dict['var']] = states[0] if len(states) == 1 else states
+
+    for p_dict in input_args_dict['pars']:
+        input_args[p_dict['var']] = parameters[p_dict['label']]
+
+    for f_dict in input_args_dict['forcs']:
+        input_args[f_dict['var']] = forcings[f_dict['label']]
+
+    return input_args
+
+
+def partial_block(partial, flux_size, arg_size, sparse=False):
+    """Returns partial derivative as 2D array of shape (flux_size, arg_size),
+    expanding the 1D shorthands described in the module docstring.
+    If sparse, the block is returned as scipy.sparse.csr_matrix, with diagonal and sparse blocks kept sparse."""
+    if sp.issparse(partial):
+        block = partial.reshape(flux_size, arg_size)
+        return sp.csr_matrix(block) if sparse else block.toarray()
+    partial = np.asarray(partial, dtype=float)
+    if partial.ndim == 2:
+        block = partial.reshape(flux_size, arg_size)
+        return sp.csr_matrix(block) if sparse else block
+    partial = partial.ravel()
+    if flux_size == arg_size:
+        diagonal = np.broadcast_to(partial, (flux_size,))
+        return sp.diags(diagonal, format='csr') if sparse else np.diag(diagonal)
+    elif flux_size == 1:
+        block = np.broadcast_to(partial, (arg_size,)).reshape(1, arg_size)
+    elif arg_size == 1:
+        block = np.broadcast_to(partial, (flux_size,)).reshape(flux_size, 1)
+    else:
+        raise ValueError(f"Partial derivative of shape {partial.shape} can not be expanded to "
+                         f"({flux_size}, {arg_size}), supply it as 2D array")
+    return sp.csr_matrix(block) if sparse else block
+
+
+class ModelJacobian:
+    """Callable returning the Jacobian of the model function of an assembled XSO model.
+
+    The state vector of XSO models contains all variables, followed by the time integrals
+    of all flux values. The time derivatives of variables are the sums of routed fluxes,
+    those of flux integrals are the flux values, so the Jacobian is non-zero only in
+    the columns of variables.
+
+    Parameters
+    ----------
+    model : xso.model.Model
+        Model backend after assembly, as stored with the XSO core.
+    sparse : bool
+        If True, the Jacobian is assembled from sparse blocks and returned as scipy.sparse.csc_matrix,
+        for models with many variables that are coupled locally, e.g. layers of NPZDWaterColumn.
+    fd_step : float
+        Relative step of finite differences, used for fluxes without analytic partial derivatives.
+    fluxes : collection of str, optional
+        Labels of the fluxes included, for the Jacobian of a part of the model function,
+        see phydra.splitting. Defaults to all fluxes.
+    """
+
+    def __init__(self, model, sparse=False, fd_step=1e-8, fluxes=None):
+        self.model = model
+        self.sparse = sparse
+        self.fd_step = fd_step
+        self.included = set(model.fluxes) if fluxes is None else set(fluxes)
+
+        # position of variables and flux integrals in the flat state vector:
+        self.slices = {}
+        index = 0
+        for key, dims in model.full_model_dims.items():
+            size = int(np.prod(dims)) if dims is not None else 1
+            self.slices[key] = slice(index, index + size)
+            index += size
+        self.size = index
+        # variables are stored first in the state vector:
+        self.num_vars = sum(self.slices[var].stop - self.slices[var].start for var in model.variables)
+
+        self.components = {}
+        self.jacobian_funcs = {}
+        self.finite_difference_fluxes = []
+        for label, flux in model.fluxes.items():
+            component, func = flux_component(flux)
+            self.components[label] = (component, func)
+            if component is None:
+                continue
+            jacobian_func = getattr(component, func.__name__ + '_jacobian', None)
+            if jacobian_func is None:
+                self.finite_difference_fluxes.append(label)
+            self.jacobian_funcs[label] = jacobian_func
+
+        # included fluxes and the group fluxes they depend on are evaluated:
+        self.evaluated = set()
+        pending = list(self.included)
+        while pending:
+            label = pending.pop()
+            component, func = self.components[label]
+            if label in self.evaluated or component is None:
+                continue
+            self.evaluated.add(label)
+            pending.extend(group_label for v_dict in component.flux_input_args['group_args']
+                           for group_label in v_dict['label'])
+
+    def __repr__(self):
+        return (f"ModelJacobian of size {self.size} with {self.num_vars} variables, "
+                f"finite differences for fluxes: {self.finite_difference_fluxes}")
+
+    def var_columns(self, label):
+        """Returns column indices of a variable in the Jacobian, or rows of a flux integral."""
+        return np.arange(self.slices[label].start, self.slices[label].stop)
+
+    def zeros(self, rows):
+        """Returns zero derivative of rows values with respect to the variables."""
+        return sp.csr_matrix((rows, self.num_vars)) if self.sparse else np.zeros((rows, self.num_vars))
+
+    def add_columns(self, derivative, block, columns):
+        """Returns derivative with block added to columns, summing over repeated columns,
+        e.g. of variables listed twice in a list input."""
+        if self.sparse:
+            placement = sp.csr_matrix((np.ones(np.size(columns)), (np.arange(np.size(columns)), columns)),
+                                      shape=(np.size(columns), self.num_vars))
+            return derivative + block @ placement
+        if np.size(np.unique(columns)) == np.size(columns):
+            derivative[:, columns] += block
+        else:
+            np.add.at(derivative, (slice(None), columns), block)
+        return derivative
+
+    def sum_rows(self, derivative):
+        """Returns derivative summed over rows, e.g. of an array flux routed to a scalar variable."""
+        if self.sparse:
+            return sp.csr_matrix(derivative.sum(axis=0))
+        return np.sum(derivative, axis=0, keepdims=True)
+
+    def forcings_at(self, time):
+        """Returns dict of forcing values at time."""
+        forcings = defaultdict()
+        for key, func in self.model.forcing_func.items():
+            forcings[key] = func(time)
+        return forcings
+
+    def flux_partials(self, label, input_args):
+        """Returns dict of partial derivatives of flux with label, with respect to its arguments."""
+        component, func = self.components[label]
+        jacobian_func = self.jacobian_funcs[label]
+        if jacobian_func is not None:
+            return jacobian_func(**input_args)
+        return self.finite_difference_partials(component, func, input_args)
+
+    def finite_difference_partials(self, component, func, input_args):
+        """Approximates partial derivatives of flux function by forward differences,
+        with respect to all arguments that depend on the model state."""
+        base = return_dim_ndarray(func(component, **input_args)).ravel()
+        partials = {}
+        input_args_dict = component.flux_input_args
+        state_args = [v_dict['var'] for key in ('vars', 'list_input_vars', 'group_args')
+                      for v_dict in input_args_dict[key]]
+        for arg in state_args:
+            value = input_args[arg]
+            values = value if isinstance(value, list) else [value]
+            arg_partials = []
+            for i, val in enumerate(values):
+                val = np.asarray(val, dtype=float)
+                block = np.zeros((np.size(base), np.size(val)))
+                for j in range(np.size(val)):
+                    perturbed = val.copy().ravel()
+                    step = self.fd_step * max(abs(perturbed[j]), 1.)
+                    perturbed[j] += step
+                    perturbed = perturbed.reshape(np.shape(val))
+                    if isinstance(value, list):
+                        args = {**input_args, arg: values[:i] + [perturbed] + values[i + 1:]}
+                    else:
+                        args = {**input_args, arg: perturbed}
+                    block[:, j] = (return_dim_ndarray(func(component, **args)).ravel() - base) / step
+                arg_partials.append(block)
+            partials[arg] = arg_partials if isinstance(value, list) else arg_partials[0]
+        return partials
+
+    def flux_derivatives(self, state, forcings):
+        """Evaluates the included fluxes, and the group fluxes they depend on, in model order and returns
+        dict of derivatives of each flux value with respect to the variables, as arrays of shape
+        (flux size, number of variables)."""
+        derivatives = {}
+        for label, flux in self.model.fluxes.items():
+            component, func = self.components[label]
+            if label not in self.evaluated:
+                if component is None and label in self.included:
+                    derivatives[label] = self.zeros(np.size(self.var_columns(label)))
+                continue
+            input_args = flux_arguments(component, state, self.model.parameters, forcings)
+            value = return_dim_ndarray(func(component, **input_args))
+            flux_size = np.size(value)
+            partials = self.flux_partials(label, input_args)
+
+            derivative = self.zeros(flux_size)
+            input_args_dict = component.flux_input_args
+
+            for v_dict in input_args_dict['vars']:
+                if v_dict['var'] not in partials:
+                    continue
+                if isinstance(v_dict['label'], (list, np.ndarray)):
+                    for var_label, partial in zip(v_dict['label'], partials[v_dict['var']]):
+                        columns = self.var_columns(var_label)
+                        block = partial_block(partial, flux_size, np.size(columns), self.sparse)
+                        derivative = self.add_columns(derivative, block, columns)
+                else:
+                    columns = self.var_columns(v_dict['label'])
+                    block = partial_block(partials[v_dict['var']], flux_size, np.size(columns), self.sparse)
+                    derivative = self.add_columns(derivative, block, columns)
+
+            for v_dict in input_args_dict['list_input_vars']:
+                if v_dict['var'] not in partials:
+                    continue
+                columns = np.concatenate([self.var_columns(var_label) for var_label in v_dict['label']])
+                block = partial_block(partials[v_dict['var']], flux_size, np.size(columns), self.sparse)
+                derivative = self.add_columns(derivative, block, columns)
+
+            for v_dict in input_args_dict['group_args']:
+                if v_dict['var'] not in partials:
+                    continue
+                group_partials = partials[v_dict['var']]
+                if len(v_dict['label']) == 1:
+                    group_partials = [group_partials]
+                for group_label, partial in zip(v_dict['label'], group_partials):
+                    group_derivative = derivatives[group_label]
+                    block = partial_block(partial, flux_size, np.shape(group_derivative)[0], self.sparse)
+                    derivative = derivative + block @ group_derivative
+
+            derivatives[label] = derivative
+            if label in state:
+                state[label] = value
+        return derivatives
+
+    def variable_rows(self, derivatives):
+        """Returns derivatives of time derivatives of variables, by routing flux derivatives
+        to variables in the same way as the XSO model function."""
+        rows = {var_label: self.zeros(np.size(self.var_columns(var_label))) for var_label in self.model.variables}
+
+        for var_label in self.model.variables:
+            for flux_var_dict in self.model.fluxes_per_var.get(var_label, []):
+                flux_label, negative, list_input = flux_var_dict.values()
+                if flux_label not in self.included:
+                    continue
+                derivative = derivatives[flux_label]
+                if not self.model.full_model_dims[var_label]:
+                    derivative = self.sum_rows(derivative)
+                rows[var_label] = rows[var_label] + (-derivative if negative else derivative)
+
+        for flux_var_dict in self.model.fluxes_per_var.get("list_input", []):
+            flux_label, negative, list_input = flux_var_dict.values()
+            if flux_label not in self.included:
+                continue
+            derivative = derivatives[flux_label]
+            sign = -1. if negative else 1.
+            list_var_dims = [self.model.full_model_dims[var] or 1 for var in list_input]
+            if len(list_input) == np.shape(derivative)[0]:
+                for i, var_label in enumerate(list_input):
+                    rows[var_label] = rows[var_label] + sign * self.sum_rows(derivative[i:i + 1])
+            else:
+                index = 0
+                for var_label, dims in zip(list_input, list_var_dims):
+                    block = derivative[index:index + dims]
+                    index += dims
+                    if not self.model.full_model_dims[var_label]:
+                        block = self.sum_rows(block)
+                    rows[var_label] = rows[var_label] + sign * block
+
+        if self.sparse:
+            return sp.vstack([rows[var_label] for var_label in self.model.variables], format='csr')
+        return np.concatenate([rows[var_label] for var_label in self.model.variables], axis=0)
+
+    def __call__(self, time, current_state):
+        """Returns Jacobian of the model function at time and current_state."""
+        state = self.model.unpack_flat_state(current_state)
+        derivatives = self.flux_derivatives(state, self.forcings_at(time))
+
+        variable_rows = self.variable_rows(derivatives)
+        flux_rows = [derivatives[label] if label in self.included else self.zeros(np.size(self.var_columns(label)))
+                     for label in self.model.fluxes]
+
+        if self.sparse:
+            block = sp.vstack([variable_rows] + flux_rows, format='csr')
+            padding = sp.csr_matrix((self.size, self.size - self.num_vars))
+            return sp.hstack([block, padding], format='csc')
+
+        jacobian = np.zeros((self.size, self.size))
+        jacobian[:, :self.num_vars] = np.concatenate([variable_rows] + flux_rows, axis=0)
+        return jacobian
@@ -1,5 +1,15 @@
-from .chemostat import NPChemostat, NPChemostat_sinu
+from .. import solvers  # registers the solvers of phydra with xso, before models are set up
+from .._lazy import lazy_loader
 
-from .slabocean import NPZDSlabOcean, NPZDSlabOcean_3layer
+# models are created on first access, only for the subpackage defining them:
+__getattr__, __dir__, __all__ = lazy_loader(__name__, {
+    'NPChemostat': '.chemostat', 'NPChemostat_sinu': '.chemostat',
 
-from .sizebased import NPxZxSizeBased
+    'NPZDSlabOcean': '.slabocean', 'NPZDSlabOcean_3layer': '.slabocean', 'NPZDSlabOcean_FusedGrazing': '.slabocean',
+    'NPZDSlabOcean_MultiStation': '.slabocean', 'NPZDSlabOcean_3layer_MultiStation': '.slabocean',
+
+    'NPxZxSizeBased': '.sizebased', 'NPxZxSizeBased_SparseGrazing': '.sizebased',
+    'NPxZxSizeBased_FusedGrazing': '.sizebased',
+
+    'NPZDWaterColumn': '.watercolumn',
+}, submodules=('chemostat', 'slabocean', 'sizebased', 'watercolumn'))
@@ -1 +1,4 @@
-from ._models import NPChemostat, NPChemostat_sinu
+from ..._lazy import lazy_loader
+
+__getattr__, __dir__, __all__ = lazy_loader(__name__, {'NPChemostat': '._models', 'NPChemostat_sinu': '._models'},
+                                            submodules=('variables', 'fluxes', 'forcings'))
@@ -1,5 +1,7 @@
 import xso
 
+import numpy as np
+
 
 @xso.component
 class LinearInflow:
@@ -12,6 +14,10 @@ class LinearInflow:
     def input(self, sink, source, rate):
         return source * rate
 
+    def input_jacobian(self, sink, source, rate):
+        """The inflow does not depend on model variables."""
+        return {}
+
 
 @xso.component
 class MonodGrowth:
@@ -26,6 +32,11 @@ class MonodGrowth:
     def uptake(self, mu_max, resource, consumer, halfsat):
         return mu_max * resource / (resource + halfsat) * consumer
 
+    def uptake_jacobian(self, mu_max, resource, consumer, halfsat):
+        """Partial derivatives of the uptake flux."""
+        return {'resource': mu_max * halfsat / (resource + halfsat) ** 2 * consumer,
+                'consumer': mu_max * resource / (resource + halfsat)}
+
 
 @xso.component
 class LinearOutflow_ListInput:
@@ -39,3 +50,7 @@ class LinearOutflow_ListInput:
         # due to the list_input=True argument, var_list is an array of variables.
         # Thanks to vectorization we can just multiply the array with the rate.
         return var_list * rate
+
+    def decay_jacobian(self, var_list, rate):
+        """Partial derivatives of the decay flux, element-wise for each variable."""
+        return {'var_list': rate * np.ones_like(var_list)}
@@ -1,25 +1,6 @@
 import xso
-import numpy as np
-
-
-@xso.component
-class ConstantExternalNutrient:
-    """Component that provides a constant external nutrient
-     as a forcing value.
-    """
-
-    forcing = xso.forcing(foreign=False, setup_func='forcing_setup', description='external nutrient')
-    value = xso.parameter(description='constant value')
-
-    def forcing_setup(self, value):
-        """Method that returns forcing function providing the
-        forcing value as a function of time."""
-        @np.vectorize
-        def forcing(time):
-            return value
-
-        return forcing
 
+from ...forcing import ConstantExternalNutrient, SinusoidalForcing
 
 
 #TODO: actually write sinusoidal forcing the way it is shown in the paper
@@ -51,9 +32,5 @@ class SinusoidalExternalNutrient:
     def forcing_setup(self, period, mean, amplitude):
         """Method that returns forcing function providing the
         forcing value as a function of time."""
-        @np.vectorize
-        def forcing(time):
-            return mean + amplitude * self.m.sin(time / period * 2 * self.m.pi)
-
-        return forcing
+        return SinusoidalForcing(mean, amplitude, period)
 
@@ -1,2 +1,6 @@
-from ._models import NPxZxSizeBased
-from . import variables, forcings, fluxes
\ No newline at end of file
+from ..._lazy import lazy_loader
+
+__getattr__, __dir__, __all__ = lazy_loader(__name__, {
+    'NPxZxSizeBased': '._models', 'NPxZxSizeBased_SparseGrazing': '._models', 'NPxZxSizeBased_FusedGrazing': '._models',
+    'run_size_sweep': '.sweep', 'size_class_setup': '.sweep',
+}, submodules=('variables', 'forcings', 'fluxes', 'sweep'))
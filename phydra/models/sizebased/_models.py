@@ -6,7 +6,9 @@ from .forcings import ConstantExternalNutrient
 
 from .fluxes.basic import LinearForcingInput, LinearPhytoMortality, QuadraticZooMortality
 from .fluxes.growth import MonodGrowth_SizeBased
-from .fluxes.grazing import SizebasedGrazingMatrix, GrossGrowthEfficiency_MatrixGrazing
+from .fluxes.grazing import (SizebasedGrazingMatrix, GrossGrowthEfficiency_MatrixGrazing,
+                             SizebasedGrazingMatrix_GrossGrowthEfficiency,
+                             SizebasedGrazingSparse, GrossGrowthEfficiency_SparseGrazing)
 
 NPxZxSizeBased = xso.create({
     # State variables
@@ -31,3 +33,13 @@ NPxZxSizeBased = xso.create({
     # Forcings
     'N0': ConstantExternalNutrient,
 })
+
+NPxZxSizeBased_SparseGrazing = NPxZxSizeBased.update_processes({
+    'Grazing': SizebasedGrazingSparse,
+    'GGE': GrossGrowthEfficiency_SparseGrazing,
+})
+
+# grazing and gross growth efficiency are computed by a single fused component, with the input layout
+# of SizebasedGrazingMatrix_GrossGrowthEfficiency, set up by size_class_input_vars:
+NPxZxSizeBased_FusedGrazing = NPxZxSizeBased.update_processes(
+    {'Grazing': SizebasedGrazingMatrix_GrossGrowthEfficiency}).drop_processes('GGE')
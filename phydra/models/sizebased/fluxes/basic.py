@@ -1,5 +1,7 @@
 import xso
 
+import numpy as np
+
 
 @xso.component
 class LinearForcingInput:
@@ -13,6 +15,10 @@ class LinearForcingInput:
         """ """
         return forcing * rate
 
+    def input_jacobian(self, var, forcing, rate):
+        """The input does not depend on model variables."""
+        return {}
+
 
 @xso.component
 class LinearPhytoMortality:
@@ -25,7 +31,10 @@ class LinearPhytoMortality:
         """Linear decay function."""
         return var * rate
 
-import numpy as np
+    def mortality_jacobian(self, var, rate):
+        """Partial derivatives of the mortality flux."""
+        return {'var': rate * np.ones_like(var)}
+
 @xso.component
 class QuadraticZooMortality:
     """Quadratic Zooplankton Mortality Flux."""
@@ -41,3 +50,8 @@ class QuadraticZooMortality:
         to allow for flexible implementation of math functions according
         to solver backend."""
         return rate * var * np.sum(var)
+
+    def mortality_jacobian(self, var, rate):
+        """Partial derivatives of the mortality flux, coupling all size classes via the total biomass."""
+        return {'var': rate * (np.diag(np.full(np.size(var), np.sum(var))) + var[:, None])}
+
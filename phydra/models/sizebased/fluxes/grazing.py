@@ -1,6 +1,28 @@
+import numpy as np
+
 import xso
 
 
+def grazing_totals_partials(phiP, resource, consumer, Imax, KsZ):
+    """Returns partial derivatives of size-based grazing totals per resource (grazed)
+    and per consumer (ingested), with respect to resource and consumer biomass.
+
+    With food scaled by half-saturation a = phiP * resource / KsZ, D = 1 + sum(a, axis=0)
+    and c = Imax * consumer, grazed = sum(c * a / D, axis=1) and ingested = c * (1 - 1 / D).
+    """
+    phi_scaled = phiP / KsZ
+    food = phi_scaled * resource[:, None]
+    total_food = 1 + np.sum(food, axis=0)
+    ingestion = np.broadcast_to(Imax * consumer, np.shape(consumer))
+
+    dgrazed_dres = (np.diag(np.sum(phi_scaled * ingestion / total_food, axis=1))
+                    - (food * ingestion / total_food ** 2) @ phi_scaled.T)
+    dgrazed_dcons = food * Imax / total_food
+    dingested_dres = (ingestion / total_food ** 2)[:, None] * phi_scaled.T
+    dingested_dcons = np.diag(np.broadcast_to(Imax * (1 - 1 / total_food), np.shape(consumer)))
+    return dgrazed_dres, dgrazed_dcons, dingested_dres, dingested_dcons
+
+
 @xso.component
 class SizebasedGrazingMatrix:
     """Size-based grazing function, adapted from Banas et al. (2011).
@@ -29,6 +51,22 @@ class SizebasedGrazingMatrix:
         FgrazP = Imax * consumer * PscaledAsFood / (1 + self.m.sum(PscaledAsFood, axis=0)) # sum over Zoo
         return FgrazP
 
+    def grazing_jacobian(self, resource, consumer, phiP, Imax, KsZ):
+        """Partial derivatives of the grazing matrix, flattened to rows in the order of the matrix."""
+        phi_scaled = phiP / KsZ
+        food = phi_scaled * resource[:, None]
+        total_food = 1 + np.sum(food, axis=0)
+        ingestion = np.broadcast_to(Imax * consumer, np.shape(consumer))
+        num_resource, num_consumer = np.shape(phiP)
+
+        # d F_ij / d resource_k = c_j / D_j * (delta_ik * phi_ij - a_ij * phi_kj / D_j)
+        dres = (np.eye(num_resource)[:, None, :] * (phi_scaled * ingestion / total_food)[:, :, None]
+                - (food * ingestion / total_food ** 2)[:, :, None] * phi_scaled.T[None, :, :])
+        # d F_ij / d consumer_l = delta_jl * Imax_j * a_ij / D_j
+        dcons = np.eye(num_consumer)[None, :, :] * (food * Imax / total_food)[:, :, None]
+        return {'resource': dres.reshape(num_resource * num_consumer, num_resource),
+                'consumer': dcons.reshape(num_resource * num_consumer, num_consumer)}
+
 
 @xso.component
 class GrossGrowthEfficiency_MatrixGrazing:
@@ -54,14 +92,193 @@ class GrossGrowthEfficiency_MatrixGrazing:
         out = self.m.sum(graze_matrix, axis=1)
         return out
 
+    def grazing_jacobian(self, assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg, epsilon):
+        """Partial derivatives with respect to the flattened grazing matrix."""
+        return {'graze_matrix': np.kron(np.eye(np.shape(graze_matrix)[0]), np.ones((1, np.shape(graze_matrix)[1])))}
+
     @xso.flux(dims='zoo', group_to_arg='graze_matrix')
     def assimilation(self, assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg, epsilon):
         """ """
         out = self.m.sum(graze_matrix, axis=0) * epsilon
         return out
 
+    def assimilation_jacobian(self, assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg,
+                              epsilon):
+        """Partial derivatives with respect to the flattened grazing matrix."""
+        return {'graze_matrix': np.kron(np.ones((1, np.shape(graze_matrix)[0])), np.eye(np.shape(graze_matrix)[1]))
+                                * epsilon}
+
     @xso.flux(group_to_arg='graze_matrix')
     def egestion(self, assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg, epsilon):
         """ """
         out = self.m.sum(graze_matrix, axis=None) * (1 - f_eg - epsilon)
         return out
+
+    def egestion_jacobian(self, assimilated_consumer, egested_detritus, grazed_resource, graze_matrix, f_eg, epsilon):
+        """Partial derivatives with respect to the flattened grazing matrix."""
+        return {'graze_matrix': np.full(np.size(graze_matrix), 1 - f_eg - epsilon)}
+
+
+@xso.component
+class SizebasedGrazingMatrix_GrossGrowthEfficiency:
+    """Size-based grazing function, adapted from Banas et al. (2011), fused with the
+    routing of GrossGrowthEfficiency_MatrixGrazing.
+
+    The grazing matrix is calculated and reduced once per evaluation. The component is not a drop-in
+    replacement of SizebasedGrazingMatrix and GrossGrowthEfficiency_MatrixGrazing. It replaces both
+    processes, the inputs 'resource' and 'consumer' of grazing and the routing variables of
+    GrossGrowthEfficiency_MatrixGrazing are replaced by the list input 'grazing_routing', which takes the labels of the grazed resource, the assimilating
+    consumer and the detritus receiving egestion, e.g. ['P', 'Z', 'N'], and f_eg and epsilon are
+    parameters of grazing.
+
+    All exchanges are returned by a single flux, routed with positive sign, so that grazing losses
+    of the resource are returned as negative values, instead of being routed with negative=True.
+    The solver 'solve_ivp_MPRK22' weights these losses by the resource, and integrates the gains
+    explicitly, so that mass is conserved to the order of the scheme, see phydra.patankar.
+    """
+    grazing_routing = xso.variable(foreign=True, flux='grazing', list_input=True, dims='grazing_routing',
+                                   description='resource, consumer and detritus')
+    phiP = xso.parameter(dims=('phyto', 'zoo'), description='feeding preferences')
+    Imax = xso.parameter(dims='zoo', description='maximum ingestion rate')
+    KsZ = xso.parameter(description='half saturation constant of grazing')
+
+    f_eg = xso.parameter(description='fraction egested')
+    epsilon = xso.parameter(description='net production efficiency')
+
+    @xso.flux(dims='grazing_exchanges')
+    def grazing(self, grazing_routing, phiP, Imax, KsZ, f_eg, epsilon):
+        """Resource and consumer are sliced from the list input according to the shape of phiP."""
+        num_resource, num_consumer = np.shape(phiP)
+        resource = grazing_routing[:num_resource]
+        consumer = grazing_routing[num_resource:num_resource + num_consumer]
+        PscaledAsFood = phiP / KsZ * resource[:, None]
+        FgrazP = Imax * consumer * PscaledAsFood / (1 + self.m.sum(PscaledAsFood, axis=0))
+        grazed = self.m.sum(FgrazP, axis=1)
+        return np.concatenate((-grazed,
+                               self.m.sum(FgrazP, axis=0) * epsilon,
+                               self.m.sum(grazed) * (1 - f_eg - epsilon)), axis=None)
+
+    def grazing_jacobian(self, grazing_routing, phiP, Imax, KsZ, f_eg, epsilon):
+        """Partial derivatives of all exchanges, with respect to the routed variables."""
+        num_resource, num_consumer = np.shape(phiP)
+        resource = grazing_routing[:num_resource]
+        consumer = grazing_routing[num_resource:num_resource + num_consumer]
+        dgrazed_dres, dgrazed_dcons, dingested_dres, dingested_dcons = grazing_totals_partials(
+            phiP, resource, consumer, Imax, KsZ)
+        dgrazed = np.concatenate((dgrazed_dres, dgrazed_dcons, np.zeros((num_resource, 1))), axis=1)
+        dingested = np.concatenate((dingested_dres, dingested_dcons, np.zeros((num_consumer, 1))), axis=1)
+        return {'grazing_routing': np.concatenate((-dgrazed,
+                                                   dingested * epsilon,
+                                                   np.sum(dgrazed, axis=0, keepdims=True) * (1 - f_eg - epsilon)))}
+
+
+@xso.component
+class SizebasedGrazingSparse:
+    """Size-based grazing function, adapted from Banas et al. (2011), computed only
+    over the retained pairs of the feeding preference matrix.
+
+    Feeding preferences are concentrated around the optimal predator:prey size ratio,
+    so for larger size spectra most entries of phiP are negligible. At model setup,
+    all entries smaller than phiP_tolerance times the largest feeding preference are dropped,
+    and grazing is computed on the remaining (resource, consumer) pairs. Setting the tolerance
+    to 0 keeps all non-zero entries, which reproduces SizebasedGrazingMatrix.
+
+    Instead of the full grazing matrix, the flux returns the grazing totals per resource
+    size class, followed by the ingestion totals per consumer size class, which are routed
+    by GrossGrowthEfficiency_SparseGrazing via the 'graze_totals' group.
+    """
+    resource = xso.variable(foreign=True, dims='phyto')
+    consumer = xso.variable(foreign=True, dims='zoo')
+    phiP = xso.parameter(dims=('phyto', 'zoo'), description='feeding preferences')
+    phiP_tolerance = xso.parameter(description='relative threshold below which feeding preferences are dropped')
+    Imax = xso.parameter(dims='zoo', description='maximum ingestion rate')
+    KsZ = xso.parameter(description='half saturation constant of grazing')
+
+    @xso.flux(group='graze_totals', dims='graze_totals')
+    def grazing(self, resource, consumer, phiP, phiP_tolerance, Imax, KsZ):
+        """Pair-wise grazing is calculated over the retained pairs only, and reduced
+        to totals per resource and per consumer with np.bincount."""
+        prey, pred, phi = self.retained_pairs(phiP, phiP_tolerance)
+        PscaledAsFood = phi / KsZ * resource[prey]
+        food = np.bincount(pred, weights=PscaledAsFood, minlength=np.size(consumer))
+        FgrazP = (Imax * consumer / (1 + food))[pred] * PscaledAsFood
+        grazed = np.bincount(prey, weights=FgrazP, minlength=np.size(resource))
+        ingested = np.bincount(pred, weights=FgrazP, minlength=np.size(consumer))
+        return np.concatenate((grazed, ingested))
+
+    def grazing_jacobian(self, resource, consumer, phiP, phiP_tolerance, Imax, KsZ):
+        """Partial derivatives of the grazing totals, calculated with the retained pairs only."""
+        prey, pred, phi = self.retained_pairs(phiP, phiP_tolerance)
+        retained_phiP = np.zeros(np.shape(phiP))
+        retained_phiP[prey, pred] = phi
+        dgrazed_dres, dgrazed_dcons, dingested_dres, dingested_dcons = grazing_totals_partials(
+            retained_phiP, resource, consumer, Imax, KsZ)
+        return {'resource': np.concatenate((dgrazed_dres, dingested_dres)),
+                'consumer': np.concatenate((dgrazed_dcons, dingested_dcons))}
+
+    def retained_pairs(self, phiP, phiP_tolerance):
+        """Returns resource indices, consumer indices and feeding preferences of retained pairs.
+
+        The pairs are computed once, at the first evaluation of the flux, which XSO performs at
+        model setup, and stored with the component. After setting phiP or phiP_tolerance in the
+        parameters of the model backend, parameters_changed has to be called, as done by
+        phydra.ensemble and phydra.continuation."""
+        cached = getattr(self, '_retained_pairs', None)
+        if cached is None:
+            phiP_max = np.max(phiP) if np.size(phiP) else 0.
+            prey, pred = np.nonzero(phiP > np.max(phiP_tolerance) * phiP_max)
+            cached = (prey, pred, np.ascontiguousarray(phiP[prey, pred]))
+            self._retained_pairs = cached
+        return cached
+
+    def parameters_changed(self, names):
+        """Discards the retained pairs, if names of changed parameters include phiP or phiP_tolerance."""
+        if {'phiP', 'phiP_tolerance'} & set(names):
+            self._retained_pairs = None
+
+
+@xso.component
+class GrossGrowthEfficiency_SparseGrazing:
+    """Component to route the grazing totals calculated by SizebasedGrazingSparse,
+    equivalent to GrossGrowthEfficiency_MatrixGrazing.
+
+    The 'graze_totals' group contains the grazing totals per resource size class,
+    followed by the ingestion totals per consumer size class.
+    """
+    grazed_resource = xso.variable(dims='phyto', foreign=True, flux='grazing', negative=True)
+    assimilated_consumer = xso.variable(dims='zoo', foreign=True, flux='assimilation')
+    egested_detritus = xso.variable(foreign=True, flux='egestion')
+
+    f_eg = xso.parameter(description='fraction egested')
+    epsilon = xso.parameter(description='net production efficiency')
+
+    @xso.flux(dims='phyto', group_to_arg='graze_totals')
+    def grazing(self, assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg, epsilon):
+        """ """
+        return graze_totals[:np.size(grazed_resource)]
+
+    def grazing_jacobian(self, assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg, epsilon):
+        """Partial derivatives with respect to the grazing totals."""
+        return {'graze_totals': np.eye(np.size(grazed_resource), np.size(graze_totals))}
+
+    @xso.flux(dims='zoo', group_to_arg='graze_totals')
+    def assimilation(self, assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg, epsilon):
+        """ """
+        return graze_totals[np.size(grazed_resource):] * epsilon
+
+    def assimilation_jacobian(self, assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg,
+                              epsilon):
+        """Partial derivatives with respect to the grazing totals."""
+        num_consumer = np.size(graze_totals) - np.size(grazed_resource)
+        return {'graze_totals': np.eye(num_consumer, np.size(graze_totals), np.size(grazed_resource)) * epsilon}
+
+    @xso.flux(group_to_arg='graze_totals')
+    def egestion(self, assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg, epsilon):
+        """ """
+        return self.m.sum(graze_totals[:np.size(grazed_resource)]) * (1 - f_eg - epsilon)
+
+    def egestion_jacobian(self, assimilated_consumer, egested_detritus, grazed_resource, graze_totals, f_eg, epsilon):
+        """Partial derivatives with respect to the grazing totals."""
+        partial = np.zeros(np.size(graze_totals))
+        partial[:np.size(grazed_resource)] = 1 - f_eg - epsilon
+        return {'graze_totals': partial}
@@ -1,5 +1,7 @@
 import xso
 
+import numpy as np
+
 
 @xso.component
 class MonodGrowth_SizeBased:
@@ -15,3 +17,9 @@ class MonodGrowth_SizeBased:
     @xso.flux(dims='phyto')
     def uptake(self, resource, consumer, halfsat, mu_max):
         return mu_max * resource / (resource + halfsat) * consumer
+
+    def uptake_jacobian(self, resource, consumer, halfsat, mu_max):
+        """Partial derivatives of the uptake flux."""
+        return {'resource': mu_max * halfsat / (resource + halfsat) ** 2 * consumer,
+                'consumer': mu_max * resource / (resource + halfsat) * np.ones_like(consumer)}
+
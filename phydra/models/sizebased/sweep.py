@@ -0,0 +1,233 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import xarray as xr
+import xsimlab as xs
+
+import xso
+
+from . import _models
+
+
+def calculate_sizes(size_min, size_max, num):
+    """initializes log spaced array of sizes from ESD size range"""
+    numbers = np.arange(num)
+    sizes = (np.log(size_max) - np.log(size_min)) * numbers / max(num - 1, 1) + np.log(size_min)
+    return np.exp(sizes)
+
+
+def calculate_zoo_I0(sizes):
+    """initializes allometric Zooplankton ingestion rate based on array of sizes (ESD)"""
+    return 26 * sizes ** -0.4
+
+
+def calculate_phyto_mu0(sizes):
+    """initializes allometric Phytoplankton maximum growth rate based on array of sizes (ESD)
+    allometric relationships are taken from meta-analyses of lab data"""
+    return 2.6 * sizes ** -0.45
+
+
+def calculate_phyto_ks(sizes):
+    """initializes allometric Phytoplankton half-saturation constant based on array of sizes (ESD)"""
+    return sizes * .1
+
+
+def calculate_opt_size(sizes):
+    """Calculating optimal prey size from Zooplankton sizes"""
+    return 0.65 * sizes ** 0.56
+
+
+def init_phiP(phytosize, zoopreyoptsize):
+    """creates matrix of feeding preferences [P...P10] for each [Z]"""
+    return np.exp(-((np.log10(phytosize[None, :]) - np.log10(zoopreyoptsize[:, None])) / 0.25) ** 2)
+
+
+def size_class_input_vars(num_classes, size_range=(1., 20.), phyto_biomass=.5, zoo_biomass=.1,
+                          KsZ=3., epsilon=1. / 3., f_eg=1. / 3., zoo_mortality=1., N0=1., N_init=1.,
+                          phiP_tolerance=None, model=_models.NPxZxSizeBased):
+    """Returns input variables of the NPxZxSizeBased model setup of notebook 3,
+    with num_classes phytoplankton and zooplankton size classes.
+
+    Total initial biomass is distributed evenly over size classes. Inputs of the grazing
+    components are adapted to the supplied model, e.g. NPxZxSizeBased_FusedGrazing or
+    NPxZxSizeBased_SparseGrazing, the latter requires phiP_tolerance.
+    """
+    # calculate log-spaced size classes from ranges and total number
+    phyto_sizes = calculate_sizes(*size_range, num_classes)
+    zoo_sizes = 2.16 * phyto_sizes ** 1.79
+
+    phyto_mu0 = calculate_phyto_mu0(phyto_sizes)
+
+    grazing = {'resource': 'P', 'consumer': 'Z', 'Imax': calculate_zoo_I0(zoo_sizes), 'KsZ': KsZ,
+               'phiP': init_phiP(phyto_sizes, calculate_opt_size(zoo_sizes))}
+    gge = {'grazed_resource': 'P', 'assimilated_consumer': 'Z', 'egested_detritus': 'N',
+           'epsilon': epsilon, 'f_eg': f_eg}
+
+    input_vars = {
+        # State variables
+        'Nutrient': {'value_label': 'N', 'value_init': N_init},
+        'Phytoplankton': {'biomass_label': 'P', 'biomass_init': np.tile(phyto_biomass / num_classes, num_classes),
+                          'phyto_index': phyto_sizes},
+        'Zooplankton': {'biomass_label': 'Z', 'biomass_init': np.tile(zoo_biomass / num_classes, num_classes),
+                        'zoo_index': zoo_sizes},
+
+        # Flows:
+        'Inflow': {'forcing': 'N0', 'rate': 1., 'var': 'N'},
+
+        # Growth
+        'Growth': {'resource': 'N', 'consumer': 'P', 'halfsat': calculate_phyto_ks(phyto_sizes),
+                   'mu_max': phyto_mu0},
+
+        # Grazing
+        'Grazing': grazing,
+        'GGE': gge,
+
+        # Mortality
+        'PhytoMortality': {'var': 'P', 'rate': 0.1 * phyto_mu0},
+        'ZooMortality': {'var': 'Z', 'rate': zoo_mortality},
+
+        # Forcings
+        'N0': {'forcing_label': 'N0', 'value': N0},
+    }
+
+    if ('Grazing', 'grazing_routing') in model.input_vars:
+        del input_vars['GGE']
+        grazing.update({'grazing_routing': [grazing.pop('resource'), grazing.pop('consumer'),
+                                            gge['egested_detritus']],
+                        'epsilon': epsilon, 'f_eg': f_eg})
+
+    if ('Grazing', 'phiP_tolerance') in model.input_vars:
+        if phiP_tolerance is None:
+            raise ValueError("Model with sparse grazing requires supplying phiP_tolerance")
+        grazing['phiP_tolerance'] = phiP_tolerance
+
+    return input_vars
+
+
+def size_class_setup(num_classes, time=None, model=_models.NPxZxSizeBased, solver='solve_ivp', **kwargs):
+    """Returns xso model setup of NPxZxSizeBased with num_classes size classes,
+    additional keyword arguments are passed to size_class_input_vars."""
+    if time is None:
+        time = np.arange(0, 365 * 10)
+    return xso.setup(solver=solver, model=model, time=time,
+                     input_vars=size_class_input_vars(num_classes, model=model, **kwargs))
+
+
+def _model_name(model):
+    """Returns name of size-based model, used to pass model to worker processes,
+    since xarray-simlab models can not be pickled."""
+    if isinstance(model, str):
+        if not isinstance(getattr(_models, model, None), xs.Model):
+            raise ValueError(f"{model} is not a model defined in phydra.models.sizebased")
+        return model
+    for name, value in vars(_models).items():
+        if value is model:
+            return name
+    raise ValueError("Sweeps can only be run with models defined in phydra.models.sizebased, "
+                     "custom models need to be added to the module to be available in worker processes")
+
+
+def _run_sweep_member(model_name, time, solver, setup_kwargs, file_path):
+    """Runs a single member of a sweep, executed in worker process.
+    Output is written to file_path if supplied, otherwise the dataset is returned."""
+    model = getattr(_models, model_name)
+    model_setup = size_class_setup(time=time, model=model, solver=solver, **setup_kwargs)
+    model_out = model_setup.xsimlab.run(model=model)
+    if file_path is None:
+        return model_out
+    model_out.to_netcdf(file_path)
+    return file_path
+
+
+def _run_coords(members, kwargs):
+    """Returns dict of the coordinates along 'run' of the scalar keyword arguments of sweep members.
+    Members can define different keys, the coordinates are the union of all keys, with values missing
+    in a member taken from the keyword arguments shared by all members, or NaN."""
+    keys = list(dict.fromkeys(key for member in members for key in member))
+    values = {key: [member.get(key, kwargs.get(key, np.nan)) for member in members] for key in keys}
+    return {key: ('run', value) for key, value in values.items() if all(np.ndim(v) == 0 for v in value)}
+
+
+def _stack_member(ds, time):
+    """Replaces size class coordinates by position along 'phyto' and 'zoo', so that outputs
+    of different numbers of size classes can be concatenated and padded with NaN.
+    Sizes are kept as coordinates 'phyto_size' and 'zoo_size'.
+
+    The time coordinate is reset to the model time supplied, since solver output
+    times can differ between members by floating point round-off."""
+    ds = ds.assign_coords(phyto_size=('phyto', ds['phyto'].values), zoo_size=('zoo', ds['zoo'].values))
+    ds = ds.assign_coords(phyto=np.arange(ds.sizes['phyto']), zoo=np.arange(ds.sizes['zoo']), time=time)
+    return ds.expand_dims('run')
+
+
+def run_size_sweep(num_classes, time=None, model=_models.NPxZxSizeBased, solver='solve_ivp',
+                   max_workers=None, output_dir=None, file_prefix='NPxZxSizeBased', combine=True,
+                   **kwargs):
+    """Runs a sweep over numbers of size classes of NPxZxSizeBased in parallel worker processes.
+
+    Parameters
+    ----------
+    num_classes : iterable of int or dict
+        Numbers of phytoplankton and zooplankton size classes of sweep members, e.g. range(2, 51).
+        Members can also be supplied as dicts of keyword arguments to size_class_input_vars,
+        containing 'num_classes', to sweep over other structural parameters.
+    time : array, optional
+        Model time, defaults to 10 years in daily steps as in notebook 3.
+    model : xsimlab.Model or str
+        Model defined in phydra.models.sizebased, defaults to NPxZxSizeBased.
+    solver : str
+        Name of the xso solver.
+    max_workers : int, optional
+        Number of worker processes, defaults to the number of processors.
+    output_dir : str, optional
+        If supplied, each output is written to a netCDF file in output_dir as soon as the
+        member finished, instead of being passed back to the main process.
+    file_prefix : str
+        Prefix of output file names, followed by the index of the member in the sweep.
+    combine : bool
+        If True, outputs are concatenated along the 'run' dimension, with swept keyword arguments
+        as coordinates, the union of the keys of all members. Size class dimensions are indexed by position and padded with NaN.
+        Otherwise a list of outputs is returned, lazily opened from file if output_dir is supplied.
+    **kwargs
+        Keyword arguments passed to size_class_input_vars for all members.
+
+    Returns
+    -------
+    xarray.Dataset or list of xarray.Dataset
+    """
+    model_name = _model_name(model)
+
+    if time is None:
+        time = np.arange(0, 365 * 10)
+
+    members = []
+    for member in num_classes:
+        if isinstance(member, dict):
+            if 'num_classes' not in member:
+                raise ValueError(f"Sweep member {member} does not define 'num_classes'")
+            members.append(member)
+        else:
+            members.append({'num_classes': int(member)})
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        file_paths = [os.path.join(output_dir, f'{file_prefix}_{i:04d}.nc') for i in range(len(members))]
+    else:
+        file_paths = [None] * len(members)
+
+    results = [None] * len(members)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_run_sweep_member, model_name, time, solver, {**kwargs, **member}, path): i
+                   for i, (member, path) in enumerate(zip(members, file_paths))}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    if output_dir is not None:
+        results = [xr.open_dataset(path) for path in results]
+
+    if not combine:
+        return results
+
+    model_out = xr.concat([_stack_member(ds, time) for ds in results], dim='run')
+    return model_out.assign_coords(_run_coords(members, kwargs))
@@ -1 +1,7 @@
-from ._models import NPZDSlabOcean, NPZDSlabOcean_3layer
+from ..._lazy import lazy_loader
+
+__getattr__, __dir__, __all__ = lazy_loader(__name__, {
+    'NPZDSlabOcean': '._models', 'NPZDSlabOcean_3layer': '._models', 'NPZDSlabOcean_FusedGrazing': '._models',
+    'NPZDSlabOcean_MultiStation': '._models', 'NPZDSlabOcean_3layer_MultiStation': '._models',
+    'calibrate': '.calibration',
+}, submodules=('variables', 'forcings', 'fluxes', 'calibration'))
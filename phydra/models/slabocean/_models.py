@@ -1,7 +1,8 @@
 import xso
 
 from .variables import SV
-from .forcings import IrradianceFromLat, StationForcingFromFile
+from .forcings import (IrradianceFromLat, StationForcingFromFile,
+                       IrradianceFromLat_MultiStation, StationForcingFromFile_MultiStation)
 from .fluxes.basic import LinearExchange, QuadraticExchange, QuadraticDecay
 
 from .fluxes.mixing import (Mixing_K, SlabUpwelling_KfromGroup,
@@ -12,6 +13,8 @@ from .fluxes.growth import (EMPOWER_Growth_ML, EMPOWER_Monod_ML, EMPOWER_Eppley_
                             EMPOWER_Smith_LambertBeer_ML)
 
 from .fluxes.grazing import (HollingTypeIII_ResourcesListInput_Consumption2Group,
+                             HollingTypeIII_ResourcesListInput_Consumption2Group_MultiStation,
+                             HollingTypeIII_GrossGrowthEfficiency,
                              GrossGrowthEfficiency)
 
 NPZDSlabOcean = xso.create({
@@ -50,3 +53,18 @@ NPZDSlabOcean = xso.create({
 })
 
 NPZDSlabOcean_3layer = NPZDSlabOcean.update_processes({'Light_lim': EMPOWER_Smith_Anderson3Layer_ML})
+
+# grazing and gross growth efficiency are computed by a single fused component, with the routing
+# list input 'grazing_routing' and the parameters of GGE on 'Grazing', see HollingTypeIII_GrossGrowthEfficiency:
+NPZDSlabOcean_FusedGrazing = NPZDSlabOcean.update_processes(
+    {'Grazing': HollingTypeIII_GrossGrowthEfficiency}).drop_processes('GGE')
+
+# all stations are solved as one state vector, with variables along the 'station' dimension:
+NPZDSlabOcean_MultiStation = NPZDSlabOcean.update_processes({
+    'Grazing': HollingTypeIII_ResourcesListInput_Consumption2Group_MultiStation,
+    'Irradiance': IrradianceFromLat_MultiStation,
+    'Forcings': StationForcingFromFile_MultiStation,
+})
+
+NPZDSlabOcean_3layer_MultiStation = NPZDSlabOcean_MultiStation.update_processes(
+    {'Light_lim': EMPOWER_Smith_Anderson3Layer_ML})
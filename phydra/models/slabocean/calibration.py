@@ -0,0 +1,320 @@
+import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas
+import xsimlab as xs
+from scipy.optimize import differential_evolution
+
+import xso
+
+from . import _models
+from .forcings import STATIONS, STATION_FORCING_FILE, StationForcingFromPath
+from ...spinup import spin_up, state_init_vars
+
+# default location of the verification file, relative to the current working directory
+STATION_VERIFICATION_FILE = os.path.join('data', 'stations_verification.csv')
+
+# station specific parameters of Anderson et al. 2015, see the parameter table of notebook 2
+STATION_PARAMETERS = {'biotrans': {'Temp_lim__VpMax': 2.5, 'Light_lim__alpha': 0.15, 'Grazing__Imax': 1.,
+                                   'ZooLinMortality__rate': 0.02},
+                      'india': {'Temp_lim__VpMax': 2.5, 'Light_lim__alpha': 0.15, 'Grazing__Imax': 1.,
+                                'ZooLinMortality__rate': 0.},
+                      'papa': {'Temp_lim__VpMax': 1.25, 'Light_lim__alpha': 0.075, 'Grazing__Imax': 1.25,
+                               'ZooLinMortality__rate': 0.02},
+                      'kerfix': {'Temp_lim__VpMax': 1.25, 'Light_lim__alpha': 0.075, 'Grazing__Imax': 2.,
+                                 'ZooLinMortality__rate': 0.02}}
+
+# verification data are monthly means, compared to the model at the middle of each month
+DAYS_PER_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+MONTH_MIDPOINTS = np.cumsum(DAYS_PER_MONTH) - DAYS_PER_MONTH / 2
+
+# conversion of chlorophyll a (mg m^-3) to phytoplankton nitrogen (µM N), as in notebook 2
+MOLAR_MASS_C = 12.0107
+C_TO_N_PHYTO = 6.625
+
+
+@functools.lru_cache(maxsize=8)
+def _read_verification_table(path, mtime):
+    """Parses the verification file, cached per absolute path and modification time."""
+    return pandas.read_csv(path, index_col=[0], header=[0, 1])
+
+
+def read_verification_data(path=STATION_VERIFICATION_FILE):
+    """Returns the monthly verification climatology of all stations, with columns (station, 'N' or 'Chla')."""
+    path = os.path.abspath(path)
+    return _read_verification_table(path, os.path.getmtime(path))
+
+
+def station_observations(verification, station, CtoChl=75.):
+    """Returns dict of monthly observations of nutrient and phytoplankton (µM N) at station,
+    keyed by the output variables of the slab ocean models. Missing months are NaN."""
+    chla_to_P = CtoChl / MOLAR_MASS_C / C_TO_N_PHYTO
+    return {'Nutrient__var': verification[station]['N'].values.astype(float),
+            'Phytoplankton__var': verification[station]['Chla'].values.astype(float) * chla_to_P}
+
+
+def station_input_vars(station, forcing_path, parameters=None):
+    """Returns input variables of NPZDSlabOcean at station, as in notebook 2,
+    with forcings read from forcing_path.
+
+    Parameters are supplied as dict with keys 'Process__var', overriding the defaults
+    of the notebook and the station specific parameters of STATION_PARAMETERS."""
+    input_vars = {
+        # State variables
+        'Nutrient': {'var_label': 'N', 'var_init': 10.},
+        'Phytoplankton': {'var_label': 'P', 'var_init': .5},
+        'Zooplankton': {'var_label': 'Z', 'var_init': .1},
+        'Detritus': {'var_label': 'D', 'var_init': .1},
+
+        # Mixing:
+        'K': {'mld': 'MLD', 'mld_deriv': 'MLDderiv', 'kappa': 0.13},
+        'Upwelling': {'n': 'N', 'n_0': 'N0'},
+        'Mixing': {'vars_sink': ['P', 'Z', 'D']},
+        'Sinking': {'var': 'D', 'mld': 'MLD', 'rate': 6.43},
+
+        # Growth
+        'Growth': {'consumer': 'P', 'resource': 'N', 'mu_max': 1.},
+        'Nut_lim': {'resource': 'N', 'halfsat': .85},
+        'Light_lim': {'pigment_biomass': 'P', 'i_0': 'I0', 'mld': 'MLD',
+                      'kw': 0.04, 'kc': 0.03, 'alpha': 0.15, 'CtoChl': 75.},
+        'Temp_lim': {'temp': 'SST', 'VpMax': 2.5},
+
+        # Grazing
+        'Grazing': {'resources': ['P', 'D'], 'consumer': 'Z',
+                    'feed_prefs': [.67, .33], 'Imax': 1., 'kZ': .6},
+        'GGE': {'assimilated_consumer': 'Z', 'egested_detritus': 'D', 'excreted_nutrient': 'N',
+                'epsilon': 0.75, 'beta': 0.69},
+
+        # Mortality & sinking
+        'PhytoLinMortality': {'source': 'P', 'sink': 'D', 'rate': 0.015},
+        'PhytoQuadMortality': {'source': 'P', 'sink': 'D', 'rate': 0.025},
+        'ZooLinMortality': {'source': 'Z', 'sink': 'D', 'rate': 0.02},
+        'HigherOrderPred': {'var': 'Z', 'rate': 0.34},
+        'DetRemineralisation': {'source': 'D', 'sink': 'N', 'rate': 0.06},
+
+        # Forcings
+        'Irradiance': {'station': station, 'I0_label': 'I0'},
+        'Forcings': {'station': station, 'file_path': os.path.abspath(forcing_path),
+                     'MLD_label': 'MLD', 'SST_label': 'SST',
+                     'MLDderiv_label': 'MLDderiv', 'N0_label': 'N0'},
+    }
+
+    for key, value in {**STATION_PARAMETERS[station], **(parameters or {})}.items():
+        process, var = key.split('__')
+        if var not in input_vars.get(process, {}):
+            raise ValueError(f"{key} is not a parameter of the slab ocean model setup")
+        input_vars[process][var] = value
+    return input_vars
+
+
+def multistation_input_vars(stations, parameters=None):
+    """Returns input variables of NPZDSlabOcean_MultiStation at stations, reproducing the batch setup
+    of notebook 2 in a single state vector, with forcings read from the current working directory.
+
+    Initial values and the station specific parameters of STATION_PARAMETERS are supplied
+    along the 'station' dimension. Parameters override the defaults for all stations,
+    see station_input_vars."""
+    per_station = [station_input_vars(station, STATION_FORCING_FILE, parameters) for station in stations]
+    input_vars = per_station[0]
+
+    for process in ('Nutrient', 'Phytoplankton', 'Zooplankton', 'Detritus'):
+        input_vars[process]['var_init'] = np.array([inputs[process]['var_init'] for inputs in per_station])
+    for key in STATION_PARAMETERS[stations[0]]:
+        process, var = key.split('__')
+        input_vars[process][var] = np.array([inputs[process][var] for inputs in per_station])
+
+    input_vars['Irradiance'] = {'I0_label': 'I0'}
+    input_vars['Forcings'] = {'station_index': list(stations), 'MLD_label': 'MLD', 'SST_label': 'SST',
+                              'MLDderiv_label': 'MLDderiv', 'N0_label': 'N0'}
+    return input_vars
+
+
+def _model_name(model):
+    """Returns name of slab ocean model, used to pass model to worker processes,
+    since xarray-simlab models can not be pickled."""
+    if isinstance(model, str):
+        if not isinstance(getattr(_models, model, None), xs.Model):
+            raise ValueError(f"{model} is not a model defined in phydra.models.slabocean")
+        return model
+    for name, value in vars(_models).items():
+        if value is model:
+            return name
+    raise ValueError("Calibration can only be run with models defined in phydra.models.slabocean, "
+                     "custom models need to be added to the module to be available in worker processes")
+
+
+@functools.lru_cache(maxsize=None)
+def _calibration_model(model_name):
+    """Returns slab ocean model with forcings read from explicit path, created once per process."""
+    return getattr(_models, model_name).update_processes({'Forcings': StationForcingFromPath})
+
+
+@functools.lru_cache(maxsize=None)
+def _reference_state(model_name, station, forcing_path, solver, spinup_items):
+    """Returns initial values of the spun-up cycle of the model at station with the default parameters,
+    computed once per process and settings, see SlabMisfit."""
+    model = _calibration_model(model_name)
+    model_setup = xso.setup(solver=solver, model=model, time=np.arange(0, 366),
+                            input_vars=station_input_vars(station, forcing_path))
+    cycle = spin_up(model, model_setup, period=365., **dict(spinup_items))
+    return {init: cycle[var].values[0] for var, init in state_init_vars(model).items()}
+
+
+def monthly_values(cycle, var):
+    """Returns values of output variable var of a cycle of one year at the middle of each month."""
+    day_of_year = cycle['time'].values - cycle['time'].values[0]
+    return np.interp(MONTH_MIDPOINTS, day_of_year, cycle[var].values)
+
+
+def station_misfit(cycle, observations):
+    """Returns misfit between a spun-up cycle of the model and the observations of a station.
+
+    For each observed variable, the mean squared difference at the middle of each observed month
+    is scaled by the squared mean of the observations, so that stations and variables of different
+    magnitude contribute equally. The misfit is the mean over variables."""
+    misfits = []
+    for var, observed in observations.items():
+        valid = np.isfinite(observed)
+        modelled = monthly_values(cycle, var)[valid]
+        misfits.append(np.mean((modelled - observed[valid]) ** 2) / np.mean(np.abs(observed[valid])) ** 2)
+    return float(np.mean(misfits))
+
+
+class SlabMisfit:
+    """Objective function of calibration, returning the misfit of a slab ocean model against the
+    verification climatology, summed over stations.
+
+    Instances are picklable and can be evaluated in worker processes. Each evaluation spins up the
+    model at every station, starting from a fixed reference state, the spun-up cycle of the station
+    with the default parameters, computed once per process. The misfit therefore depends only on
+    the parameters, not on previous evaluations, and calibration with a seed is reproducible.
+
+    Parameters
+    ----------
+    parameter_names : list of str
+        Input variables calibrated, as 'Process__var', in the order of parameter vectors.
+    model : xsimlab.Model or str
+        Model defined in phydra.models.slabocean, e.g. NPZDSlabOcean or NPZDSlabOcean_3layer.
+    stations : list of str
+        Stations included in the objective.
+    forcing_path, verification_path : str
+        Paths of forcing and verification files.
+    solver : str
+        Name of the xso solver. The default tight tolerances keep the integration error below the
+        tolerance of the spin-up, so that spin-ups from the reference state converge after a few
+        periods and the misfit is a smooth function of the parameters, see phydra.spinup.
+    spinup_kwargs : dict, optional
+        Keyword arguments passed to phydra.spinup.spin_up, e.g. max_periods and rtol.
+    penalty : float
+        Misfit returned for parameter vectors, for which the integration fails or returns non-finite values.
+        Other errors, e.g. of the model setup, are raised.
+    """
+
+    def __init__(self, parameter_names, model=_models.NPZDSlabOcean, stations=tuple(STATIONS),
+                 forcing_path=os.path.join('data', 'stations_forcing.csv'),
+                 verification_path=STATION_VERIFICATION_FILE, solver='solve_ivp_LSODA_tight', spinup_kwargs=None, penalty=1e6):
+        self.parameter_names = list(parameter_names)
+        self.model_name = _model_name(model)
+        self.stations = list(stations)
+        self.forcing_path = os.path.abspath(forcing_path)
+        self.verification_path = os.path.abspath(verification_path)
+        self.solver = solver
+        self.spinup_kwargs = {'max_periods': 10, 'rtol': 1e-2, 'atol': 1e-3, **(spinup_kwargs or {})}
+        self.penalty = penalty
+
+        input_vars = {f'{process}__{name}' for process, name in self.model.input_vars}
+        unknown = [name for name in self.parameter_names if name not in input_vars]
+        if unknown:
+            raise ValueError(f"Parameters {unknown} are not input variables of model {self.model_name}")
+
+    @property
+    def model(self):
+        return _calibration_model(self.model_name)
+
+    def station_setup(self, model, station, parameters):
+        """Returns model setup of station over the first year, with initial values of the reference state."""
+        input_vars = station_input_vars(station, self.forcing_path, parameters)
+        model_setup = xso.setup(solver=self.solver, model=model, time=np.arange(0, 366), input_vars=input_vars)
+        reference_state = _reference_state(self.model_name, station, self.forcing_path, self.solver,
+                                           tuple(sorted(self.spinup_kwargs.items())))
+        with model:
+            return model_setup.xsimlab.update_vars(input_vars=reference_state)
+
+    def station_cycles(self, x):
+        """Returns dict of spun-up cycles of all stations for parameter vector x."""
+        model = self.model
+        parameters = dict(zip(self.parameter_names, np.atleast_1d(x)))
+        return {station: spin_up(model, self.station_setup(model, station, parameters), period=365.,
+                                 **self.spinup_kwargs)
+                for station in self.stations}
+
+    def __call__(self, x):
+        verification = read_verification_data(self.verification_path)
+        CtoChl = dict(zip(self.parameter_names, np.atleast_1d(x))).get('Light_lim__CtoChl', 75.)
+        try:
+            cycles = self.station_cycles(x)
+        except (RuntimeError, FloatingPointError, np.linalg.LinAlgError):
+            # integration failures, e.g. of stiff parameter combinations:
+            return self.penalty
+        misfit = sum(station_misfit(cycles[station], station_observations(verification, station, CtoChl))
+                     for station in self.stations)
+        return misfit if np.isfinite(misfit) else self.penalty
+
+
+def calibrate(parameters, model=_models.NPZDSlabOcean, stations=tuple(STATIONS),
+              forcing_path=os.path.join('data', 'stations_forcing.csv'),
+              verification_path=STATION_VERIFICATION_FILE, solver='solve_ivp_LSODA_tight', spinup_kwargs=None,
+              max_workers=None, maxiter=50, popsize=10, seed=None, **kwargs):
+    """Calibrates parameters of a slab ocean model against the station verification data
+    by differential evolution, evaluating the candidates of each generation in parallel worker processes.
+
+    Calibrated parameters are shared by all stations, other parameters keep the station specific
+    values of Anderson et al. 2015, see STATION_PARAMETERS.
+
+    Parameters
+    ----------
+    parameters : dict
+        Bounds of calibrated parameters, keyed by input variable, e.g.
+        {'Temp_lim__VpMax': (1., 3.), 'Grazing__Imax': (0.5, 2.5)}.
+    model : xsimlab.Model or str
+        Model defined in phydra.models.slabocean, e.g. NPZDSlabOcean or NPZDSlabOcean_3layer.
+    stations : list of str
+        Stations included in the objective, defaults to all four stations.
+    forcing_path, verification_path : str
+        Paths of forcing and verification files, default to the files in the 'data' directory
+        relative to the current working directory, as in notebook 2.
+    solver : str
+        Name of the xso solver.
+    spinup_kwargs : dict, optional
+        Keyword arguments passed to phydra.spinup.spin_up, defaults to at most 10 periods
+        and rtol=1e-2, atol=1e-3.
+    max_workers : int, optional
+        Number of worker processes, defaults to the number of processors.
+        If 1, candidates are evaluated in the current process.
+    maxiter, popsize, seed
+        Maximum number of generations, population size multiplier and seed of differential evolution.
+    **kwargs
+        Additional keyword arguments passed to scipy.optimize.differential_evolution, e.g. tol.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult
+        Result of differential evolution, with additional field 'parameters',
+        a dict of the calibrated parameter values.
+    """
+    objective = SlabMisfit(list(parameters), model=model, stations=stations, forcing_path=forcing_path,
+                           verification_path=verification_path, solver=solver, spinup_kwargs=spinup_kwargs)
+    bounds = list(parameters.values())
+
+    if max_workers == 1:
+        result = differential_evolution(objective, bounds, maxiter=maxiter, popsize=popsize, seed=seed,
+                                        polish=False, **kwargs)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            result = differential_evolution(objective, bounds, maxiter=maxiter, popsize=popsize, seed=seed,
+                                            polish=False, updating='deferred', workers=executor.map, **kwargs)
+
+    result.parameters = dict(zip(objective.parameter_names, result.x))
+    return result
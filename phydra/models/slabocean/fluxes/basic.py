@@ -1,17 +1,23 @@
 import xso
 
+import numpy as np
+
 
 @xso.component
 class LinearExchange:
     """ """
     source = xso.variable(foreign=True, flux='decay', negative=True)
     sink = xso.variable(foreign=True, flux='decay', negative=False)
-    rate = xso.parameter(description='decay/mortality rate')
+    rate = xso.parameter(dims=[(), 'station'], description='decay/mortality rate')
 
-    @xso.flux
+    @xso.flux(dims=[(), 'station'])
     def decay(self, source, sink, rate):
         return source * rate
 
+    def decay_jacobian(self, source, sink, rate):
+        """Partial derivatives of the decay flux."""
+        return {'source': rate * np.ones_like(source)}
+
 
 @xso.component
 class QuadraticDecay:
@@ -19,11 +25,15 @@ class QuadraticDecay:
     var = xso.variable(foreign=True, flux='decay', negative=True, description='variable affected by flux')
     rate = xso.parameter(description='quadratic rate of change')
 
-    @xso.flux
+    @xso.flux(dims=[(), 'station'])
     def decay(self, var, rate):
         """ """
         return var ** 2 * rate
 
+    def decay_jacobian(self, var, rate):
+        """Partial derivatives of the decay flux."""
+        return {'var': 2 * var * rate}
+
 
 @xso.component
 class QuadraticExchange:
@@ -32,7 +42,11 @@ class QuadraticExchange:
     sink = xso.variable(foreign=True, flux='decay', negative=False)
     rate = xso.parameter(description='quadratic rate of change')
 
-    @xso.flux
+    @xso.flux(dims=[(), 'station'])
     def decay(self, source, sink, rate):
         """ """
-        return source ** 2 * rate
\ No newline at end of file
+        return source ** 2 * rate
+
+    def decay_jacobian(self, source, sink, rate):
+        """Partial derivatives of the decay flux."""
+        return {'source': 2 * source * rate}
@@ -1,5 +1,27 @@
 import xso
 
+import numpy as np
+
+
+def station_blocks(partials):
+    """Expands partial derivatives of shape (n, m, station), that only couple values
+    of the same station, to a matrix of shape (n * station, m * station), ordered by station last."""
+    num_stations = np.shape(partials)[-1]
+    blocks = np.einsum('ijs,st->isjt', partials, np.eye(num_stations))
+    return blocks.reshape(np.shape(partials)[0] * num_stations, np.shape(partials)[1] * num_stations)
+
+
+def holling_type_III_partials(resources, consumer, feed_prefs, Imax, kZ):
+    """Returns partial derivatives of Holling type III grazing on resources of shape (resources, station),
+    with respect to resources and consumer, as matrices ordered by station last."""
+    scaled_resources = resources ** 2 * np.reshape(feed_prefs, (-1, 1))
+    dscaled_resources = 2 * resources * np.reshape(feed_prefs, (-1, 1))
+    total = kZ ** 2 + np.sum(scaled_resources, axis=0)
+    dres = (np.eye(len(resources))[:, :, None] * dscaled_resources[None, :, :]
+            - scaled_resources[:, None, :] * dscaled_resources[None, :, :] / total) * Imax * consumer / total
+    dcons = (scaled_resources * Imax / total)[:, None, :]
+    return station_blocks(dres), station_blocks(dcons)
+
 
 @xso.component
 class HollingTypeIII_ResourcesListInput_Consumption2Group:
@@ -16,6 +38,93 @@ class HollingTypeIII_ResourcesListInput_Consumption2Group:
         scaled_resources = resources ** 2 * feed_prefs
         return scaled_resources * Imax / (kZ ** 2 + self.m.sum(scaled_resources)) * consumer
 
+    def grazing_jacobian(self, resources, consumer, feed_prefs, Imax, kZ):
+        """Partial derivatives of the grazing flux."""
+        dres, dcons = holling_type_III_partials(np.reshape(resources, (-1, 1)), consumer, feed_prefs, Imax, kZ)
+        return {'resources': dres, 'consumer': dcons}
+
+
+@xso.component
+class HollingTypeIII_ResourcesListInput_Consumption2Group_MultiStation:
+    """Holling type III grazing on a list of resources, with resources and consumer
+    along the 'station' dimension, and the maximum ingestion rate shared or per station.
+
+    The grazing flux is returned as flat array of all resources, ordered by resource."""
+    resources = xso.variable(foreign=True, negative=True, flux='grazing', list_input=True, dims='resources')
+    consumer = xso.variable(foreign=True)
+    feed_prefs = xso.parameter(dims='resources', description='feeding preference for resources')
+    Imax = xso.parameter(dims=[(), 'station'], description='maximum ingestion rate')
+    kZ = xso.parameter(description='feeding preferences')
+
+    @xso.flux(group='graze_out', dims='resources_station')
+    def grazing(self, resources, consumer, feed_prefs, Imax, kZ):
+        scaled_resources = np.reshape(resources, (np.size(feed_prefs), -1)) ** 2 * feed_prefs[:, None]
+        return (scaled_resources * Imax / (kZ ** 2 + self.m.sum(scaled_resources, axis=0)) * consumer).ravel()
+
+    def grazing_jacobian(self, resources, consumer, feed_prefs, Imax, kZ):
+        """Partial derivatives of the grazing flux, coupling values of the same station only."""
+        dres, dcons = holling_type_III_partials(np.reshape(resources, (np.size(feed_prefs), -1)), consumer,
+                                                feed_prefs, Imax, kZ)
+        return {'resources': dres, 'consumer': dcons}
+
+
+@xso.component
+class HollingTypeIII_GrossGrowthEfficiency:
+    """Holling type III grazing on a list of resources, fused with the gross growth efficiency
+    routing of GrossGrowthEfficiency, computing total ingestion once per evaluation.
+
+    The component is not a drop-in replacement of HollingTypeIII_ResourcesListInput_Consumption2Group
+    and GrossGrowthEfficiency. It replaces both processes, the inputs 'resources' and 'consumer' of grazing
+    and the routing variables of GrossGrowthEfficiency are replaced by the list input 'grazing_routing',
+    which takes the resource labels, followed by the labels of the assimilating consumer,
+    the detritus receiving egestion and the nutrient receiving excretion, e.g.
+    ['P', 'Z', 'Z', 'D', 'N'], and beta and epsilon are parameters of grazing.
+
+    All exchanges are returned by a single flux, routed with positive sign, so that grazing losses
+    of resources are returned as negative values, instead of being routed with negative=True.
+    The solver 'solve_ivp_MPRK22' weights these losses by their resource, and integrates the gains
+    of consumer, detritus and nutrient explicitly, so that mass is conserved to the order of the scheme,
+    as with the separate fluxes of GrossGrowthEfficiency, see phydra.patankar.
+
+    to N: beta*(1-epsilon)
+    to D: 1-beta
+    to Z: beta*epsilon
+    """
+    grazing_routing = xso.variable(foreign=True, flux='grazing', list_input=True, dims='grazing_routing',
+                                   description='resources, followed by consumer, detritus and nutrient')
+    feed_prefs = xso.parameter(dims='resources', description='feeding preference for resources')
+    Imax = xso.parameter(description='maximum ingestion rate')
+    kZ = xso.parameter(description='feeding preferences')
+
+    beta = xso.parameter(description='absorption efficiency')
+    epsilon = xso.parameter(description='net production efficiency')
+
+    @xso.flux(dims='grazing_exchanges')
+    def grazing(self, grazing_routing, feed_prefs, Imax, kZ, beta, epsilon):
+        """Variables are reshaped to (routing, station), so that the flux
+        can be used with variables along the 'station' dimension."""
+        routed = np.reshape(grazing_routing, (np.size(feed_prefs) + 3, -1))
+        resources, consumer = routed[:-3], routed[-3]
+        scaled_resources = resources ** 2 * np.reshape(feed_prefs, (-1, 1))
+        graze_out = scaled_resources * Imax / (kZ ** 2 + self.m.sum(scaled_resources, axis=0)) * consumer
+        total_grazing = self.m.sum(graze_out, axis=0)
+        return np.concatenate((-graze_out,
+                               total_grazing * beta * epsilon,
+                               total_grazing * (1 - beta),
+                               total_grazing * beta * (1 - epsilon)), axis=None)
+
+    def grazing_jacobian(self, grazing_routing, feed_prefs, Imax, kZ, beta, epsilon):
+        """Partial derivatives of all exchanges, with respect to the routed variables."""
+        routed = np.reshape(grazing_routing, (np.size(feed_prefs) + 3, -1))
+        num_stations = np.shape(routed)[1]
+        dres, dcons = holling_type_III_partials(routed[:-3], routed[-3], feed_prefs, Imax, kZ)
+        dgraze = np.concatenate((dres, dcons, np.zeros((len(dres), 2 * num_stations))), axis=1)
+        dtotal = np.tile(np.eye(num_stations), np.size(feed_prefs)) @ dgraze
+        return {'grazing_routing': np.concatenate((-dgraze,
+                                                   dtotal * beta * epsilon,
+                                                   dtotal * (1 - beta),
+                                                   dtotal * beta * (1 - epsilon)), axis=0)}
+
 
 @xso.component
 class GrossGrowthEfficiency:
@@ -31,14 +140,38 @@ class GrossGrowthEfficiency:
     beta = xso.parameter(description='absorption efficiency')
     epsilon = xso.parameter(description='net production efficiency')
 
-    @xso.flux(group_to_arg='graze_out')
+    @xso.flux(dims=[(), 'station'], group_to_arg='graze_out')
     def assimilation(self, assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta, epsilon):
-        return self.m.sum(graze_out) * beta * epsilon
+        return self.total_grazing(graze_out, assimilated_consumer) * beta * epsilon
 
-    @xso.flux(group_to_arg='graze_out')
+    def assimilation_jacobian(self, assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta,
+                              epsilon):
+        """Partial derivatives of the assimilation flux."""
+        return {'graze_out': self.total_grazing_partial(graze_out, assimilated_consumer) * beta * epsilon}
+
+    @xso.flux(dims=[(), 'station'], group_to_arg='graze_out')
     def egestion(self, assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta, epsilon):
-        return self.m.sum(graze_out) * (1-beta)
+        return self.total_grazing(graze_out, assimilated_consumer) * (1-beta)
+
+    def egestion_jacobian(self, assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta,
+                          epsilon):
+        """Partial derivatives of the egestion flux."""
+        return {'graze_out': self.total_grazing_partial(graze_out, assimilated_consumer) * (1 - beta)}
 
-    @xso.flux(group_to_arg='graze_out')
+    @xso.flux(dims=[(), 'station'], group_to_arg='graze_out')
     def excretion(self, assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta, epsilon):
-        return self.m.sum(graze_out) * beta * (1-epsilon)
+        return self.total_grazing(graze_out, assimilated_consumer) * beta * (1-epsilon)
+
+    def excretion_jacobian(self, assimilated_consumer, egested_detritus, excreted_nutrient, graze_out, beta,
+                           epsilon):
+        """Partial derivatives of the excretion flux."""
+        return {'graze_out': self.total_grazing_partial(graze_out, assimilated_consumer) * beta * (1 - epsilon)}
+
+    def total_grazing(self, graze_out, consumer):
+        """Helper function summing grazing over all resources, per station if
+        the consumer is defined along the 'station' dimension."""
+        return self.m.sum(np.reshape(graze_out, (-1, np.size(consumer))), axis=0)
+
+    def total_grazing_partial(self, graze_out, consumer):
+        """Helper function returning the partial derivatives of total grazing per station."""
+        return np.tile(np.eye(np.size(consumer)), np.size(graze_out) // np.size(consumer))
@@ -3,6 +3,18 @@ import xso
 import numpy as np
 
 
+# layers of the three layer light model (Anderson, 1993): top and maximum depth of each layer in m
+ANDERSON_LAYER_TOP = np.array([0., 5.0, 23.0])
+ANDERSON_LAYER_DEPTH = np.array([5.0, 23.0 - 5.0, np.inf])
+
+# coefficients of the attenuation polynomials in the square root of chlorophyll, per layer (columns)
+ANDERSON_KPAR_COEFFS = np.array([[0.13096, 0.041025, 0.021517],
+                                 [0.030969, 0.036211, 0.050150],
+                                 [0.042644, 0.062297, 0.058900],
+                                 [-0.013738, -0.030098, -0.040539],
+                                 [0.0024617, 0.0062597, 0.0087586],
+                                 [-0.00018059, -0.00051944, -0.00049476]])
+
 @xso.component
 class EMPOWER_Growth_ML:
     """Growth flux component for the Phydra implementation of the EMPOWER model."""
@@ -11,12 +23,19 @@ class EMPOWER_Growth_ML:
 
     mu_max = xso.parameter(description='maximum growth rate')
 
-    @xso.flux(group_to_arg='growth_lims')
+    @xso.flux(dims=[(), 'station'], group_to_arg='growth_lims')
     def growth(self, resource, consumer, mu_max, growth_lims):
         """Flux function that receives all terms added to the group 'growth_lims' as an
          input argument and calculates resulting product to the growth flux."""
         return mu_max * self.m.product(growth_lims) * consumer
 
+    def growth_jacobian(self, resource, consumer, mu_max, growth_lims):
+        """Partial derivatives of the growth flux, with respect to each growth limitation in the group."""
+        lims = growth_lims if isinstance(growth_lims, list) else [growth_lims]
+        lims_partials = [mu_max * self.m.product(lims[:i] + lims[i + 1:]) * consumer for i in range(len(lims))]
+        return {'consumer': mu_max * self.m.product(lims) * np.ones_like(consumer),
+                'growth_lims': lims_partials if isinstance(growth_lims, list) else lims_partials[0]}
+
 
 @xso.component
 class EMPOWER_Monod_ML:
@@ -27,10 +46,14 @@ class EMPOWER_Monod_ML:
     resource = xso.variable(foreign=True)
     halfsat = xso.parameter(description='monod half-saturation constant')
 
-    @xso.flux(group='growth_lims')
+    @xso.flux(dims=[(), 'station'], group='growth_lims')
     def monod_lim(self, resource, halfsat):
         return resource / (resource + halfsat)
 
+    def monod_lim_jacobian(self, resource, halfsat):
+        """Partial derivatives of the nutrient limitation."""
+        return {'resource': halfsat / (resource + halfsat) ** 2}
+
 
 @xso.component
 class EMPOWER_Eppley_ML:
@@ -40,12 +63,16 @@ class EMPOWER_Eppley_ML:
      The flux value is added to the group 'VpT'."""
     temp = xso.forcing(foreign=True, description='Temperature forcing')
 
-    VpMax = xso.parameter(description='Maximum photosynthetic rate at 0 degrees celcius')
+    VpMax = xso.parameter(dims=[(), 'station'], description='Maximum photosynthetic rate at 0 degrees celcius')
 
-    @xso.flux(group='VpT')
+    @xso.flux(dims=[(), 'station'], group='VpT')
     def temp_dependence(self, temp, VpMax):
         return VpMax * 1.066 ** temp
 
+    def temp_dependence_jacobian(self, temp, VpMax):
+        """Temperature dependence does not depend on model variables."""
+        return {}
+
 
 @xso.component
 class EMPOWER_Smith_LambertBeer_ML:
@@ -60,12 +87,12 @@ class EMPOWER_Smith_LambertBeer_ML:
     i_0 = xso.forcing(foreign=True, description='Light forcing')
     mld = xso.forcing(foreign=True, description='Mixed Layer Depth forcing')
 
-    alpha = xso.parameter(description='initial slope of PI curve')
+    alpha = xso.parameter(dims=[(), 'station'], description='initial slope of PI curve')
     CtoChl = xso.parameter(description='chlorophyll to carbon ratio')
     kw = xso.parameter(description='light attenuation coef for water')
     kc = xso.parameter(description='light attenuation coef for pigment biomass')
 
-    @xso.flux(group_to_arg='VpT', group='growth_lims')
+    @xso.flux(dims=[(), 'station'], group_to_arg='VpT', group='growth_lims')
     def light_limitation(self, i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
         kPAR = kw + kc * pigment_biomass
         i_0 = i_0 / 24  # from per day to per h
@@ -75,6 +102,15 @@ class EMPOWER_Smith_LambertBeer_ML:
                 self.m.log(x_0 + (VpT ** 2 + x_0 ** 2) ** 0.5) - self.m.log(x_H + (VpT ** 2 + x_H ** 2) ** 0.5))
         return VpH * 24 / CtoChl
 
+    def light_limitation_jacobian(self, i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+        """Partial derivatives of the light limitation, via the attenuation coefficient kPAR."""
+        kPAR = kw + kc * pigment_biomass
+        i_0 = i_0 / 24
+        x_0 = alpha * i_0
+        x_H = alpha * i_0 * self.m.exp(- kPAR * mld)
+        integral = self.m.log(x_0 + (VpT ** 2 + x_0 ** 2) ** 0.5) - self.m.log(x_H + (VpT ** 2 + x_H ** 2) ** 0.5)
+        dVpH_dkPAR = VpT / kPAR / mld * (- integral / kPAR + mld * x_H / (VpT ** 2 + x_H ** 2) ** 0.5)
+        return {'pigment_biomass': dVpH_dkPAR * kc * 24 / CtoChl}
 
 
 @xso.component
@@ -92,67 +128,85 @@ class EMPOWER_Smith_Anderson3Layer_ML:
     i_0 = xso.forcing(foreign=True, description='Light forcing')
     mld = xso.forcing(foreign=True, description='Mixed Layer Depth forcing')
 
-    alpha = xso.parameter(description='initial slop of PI curve')
+    alpha = xso.parameter(dims=[(), 'station'], description='initial slop of PI curve')
     CtoChl = xso.parameter(description='chlorophyll to carbon ratio')
     kw = xso.parameter(description='light attenuation coef for water')
     kc = xso.parameter(description='light attenuation coef for pigment biomass')
 
-    @xso.flux(group_to_arg='VpT', group='growth_lims')
+    @xso.flux(dims=[(), 'station'], group_to_arg='VpT', group='growth_lims')
     def light_limitation(self, i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+        """Flux function integrating light limitation over all three layers at once.
+
+        Layers are stacked along a trailing axis and layers below the mixed layer depth are
+        masked, so that mld, pigment_biomass and alpha can also be supplied as arrays."""
         i_0 = i_0 / 24
         chl = pigment_biomass * 6.625 * 12.0 / CtoChl  # convert µM N to chlorophyll, mg m-3
         # (Redfield ratio of 6.625 mol C mol N-1 assumed for C:N of phytoplankton)
 
-        ss = self.m.sqrt(chl)  # square root of chlorophyll
+        ss = np.expand_dims(self.m.sqrt(chl), -1)  # square root of chlorophyll
 
         # calculate layer specific attenuation coefficients:
-        kPAR_1 = 0.13096 + 0.030969 * ss + 0.042644 * ss ** 2 - 0.013738 * ss ** 3 + 0.0024617 * ss ** 4 - 0.00018059 * ss ** 5
-        kPAR_2 = 0.041025 + 0.036211 * ss + 0.062297 * ss ** 2 - 0.030098 * ss ** 3 + 0.0062597 * ss ** 4 - 0.00051944 * ss ** 5
-        kPAR_3 = 0.021517 + 0.050150 * ss + 0.058900 * ss ** 2 - 0.040539 * ss ** 3 + 0.0087586 * ss ** 4 - 0.00049476 * ss ** 5
-
-        kPAR = [kPAR_1, kPAR_2, kPAR_3]
-
-        # calculate layer specific light intensities:
-        if mld <= 5.0:
-            jnlay = 1
-            zbase = [0., mld]
-            zdep = [0., mld]
-            I_1 = i_0 * np.exp(-kPAR_1 * mld)
-            Ibase = [i_0, I_1]
-        elif mld > 5.0 and mld <= 23.0:
-            jnlay = 2
-            zbase = [0., 5.0, mld]
-            zdep = [0., 5.0, mld - 5.0]
-            mld_rest = mld - 5.0
-            I_1 = i_0 * np.exp(-kPAR_1 * 5.0)
-            I_2 = I_1 * np.exp(-kPAR_2 * mld - 5.0)
-            Ibase = [i_0, I_1, I_2]
-        elif mld > 23.0:
-            jnlay = 3
-            zbase = [0., 5.0, 23.0, mld]
-            zdep = [0., 5.0, 23.0 - 5.0, mld - 23.0]
-            I_1 = i_0 * np.exp(-kPAR_1 * 5.0)
-            I_2 = I_1 * np.exp(-kPAR_2 * 23.0 - 5.0)
-            I_3 = I_2 * np.exp(-kPAR_3 * mld - 23.0)
-            Ibase = [i_0, I_1, I_2, I_3]
-
-        # now add the light limitation of growth for each layer to the total light limitation:
-        L_Isum = 0
-
-        for ilay in range(1, jnlay + 1):
-            # going through the layers, integrate light limitation:
-            L_I = self.SmithFunc(zdep[ilay], Ibase[ilay - 1], Ibase[ilay], kPAR[ilay - 1], alpha, VpT)
-            L_I = L_I * 24 / CtoChl  # convert units (gC gChl^-1 h^-1 to d-1)
-            L_Isum = L_Isum + L_I * zdep[ilay]  # add to total weighted by layer depth
-
-        L_I = L_Isum / mld  # divide by total depth to get average light limitation
-
-        return L_I
-
-    def SmithFunc(self, zdepth, Iin, Iout, kPARlay, alpha, Vp):
-        """Helper function to calculate light limitation of growth according to the Smith function."""
+        c = ANDERSON_KPAR_COEFFS
+        kPAR = c[0] + c[1] * ss + c[2] * ss ** 2 + c[3] * ss ** 3 + c[4] * ss ** 4 + c[5] * ss ** 5
+
+        # depth of each layer within the mixed layer, zero for layers below:
+        zdep = self.m.min(self.m.max(np.expand_dims(mld, -1) - ANDERSON_LAYER_TOP, 0.), ANDERSON_LAYER_DEPTH)
+
+        # calculate layer specific light intensities at top and base of layers. The attenuation of a layer
+        # reproduces the operator precedence bug of the previous implementation, exp(-kPAR_2 * mld - 5.0)
+        # instead of exp(-kPAR_2 * (mld - 5.0)), i.e. the depth of the layer base, not the layer thickness,
+        # times kPAR, minus the depth of the layer top, so that results are unchanged:
+        attenuation = self.m.exp(-kPAR * (ANDERSON_LAYER_TOP + zdep) - ANDERSON_LAYER_TOP)
+        Ibase = np.expand_dims(i_0, -1) * np.cumprod(attenuation, axis=-1)
+        Itop = Ibase / attenuation
+
+        # light limitation of growth for each layer, weighted by layer depth:
+        L_I = self.SmithIntegral(Itop, Ibase, kPAR, np.expand_dims(alpha, -1), np.expand_dims(VpT, -1))
+        L_I = self.m.sum(L_I * (zdep > 0.), axis=-1) * 24 / CtoChl  # convert units (gC gChl^-1 h^-1 to d-1)
+
+        return L_I / mld  # divide by total depth to get average light limitation
+
+    def light_limitation_jacobian(self, i_0, mld, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+        """Partial derivatives of the light limitation with respect to pigment biomass.
+
+        Biomass affects the layer attenuation coefficients kPAR, and by that the light
+        at top and base of each layer, through the attenuation of all layers above."""
+        i_0 = i_0 / 24
+        chl = pigment_biomass * 6.625 * 12.0 / CtoChl
+        ss = np.expand_dims(self.m.sqrt(chl), -1)
+
+        c = ANDERSON_KPAR_COEFFS
+        kPAR = c[0] + c[1] * ss + c[2] * ss ** 2 + c[3] * ss ** 3 + c[4] * ss ** 4 + c[5] * ss ** 5
+        dkPAR_dss = c[1] + 2 * c[2] * ss + 3 * c[3] * ss ** 2 + 4 * c[4] * ss ** 3 + 5 * c[5] * ss ** 4
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dss_dP = np.where(ss > 0, 6.625 * 12.0 / CtoChl / (2 * ss), 0.)
+        dkPAR_dP = dkPAR_dss * dss_dP
+
+        zdep = self.m.min(self.m.max(np.expand_dims(mld, -1) - ANDERSON_LAYER_TOP, 0.), ANDERSON_LAYER_DEPTH)
+        # attenuation as in light_limitation, including the operator precedence bug of the previous implementation:
+        attenuation = self.m.exp(-kPAR * (ANDERSON_LAYER_TOP + zdep) - ANDERSON_LAYER_TOP)
+        Ibase = np.expand_dims(i_0, -1) * np.cumprod(attenuation, axis=-1)
+        Itop = Ibase / attenuation
+
+        # derivatives of logarithms of light at base and top of layers:
+        dlog_attenuation_dP = -(ANDERSON_LAYER_TOP + zdep) * dkPAR_dP
+        dlog_Ibase_dP = np.cumsum(dlog_attenuation_dP, axis=-1)
+        dlog_Itop_dP = dlog_Ibase_dP - dlog_attenuation_dP
+
+        Vp = np.expand_dims(VpT, -1)
+        alpha = np.expand_dims(alpha, -1)
+        x0 = alpha * Itop
+        xH = alpha * Ibase
+        dL_dP = (- self.SmithIntegral(Itop, Ibase, kPAR, alpha, Vp) / kPAR * dkPAR_dP
+                 + Vp / kPAR * x0 / (Vp ** 2 + x0 ** 2) ** 0.5 * dlog_Itop_dP
+                 - Vp / kPAR * xH / (Vp ** 2 + xH ** 2) ** 0.5 * dlog_Ibase_dP)
+        dL_dP = self.m.sum(dL_dP * (zdep > 0.), axis=-1) * 24 / CtoChl
+        return {'pigment_biomass': dL_dP / mld}
+
+    def SmithIntegral(self, Iin, Iout, kPARlay, alpha, Vp):
+        """Helper function to calculate light limitation of growth according to the Smith function,
+        integrated over the depth of a layer."""
         x0 = alpha * Iin
         xH = alpha * Iout
-        VpH = Vp / kPARlay / zdepth * (
-                np.log(x0 + (Vp ** 2 + x0 ** 2) ** 0.5) - np.log(xH + (Vp ** 2 + xH ** 2) ** 0.5))
-        return VpH
+        return Vp / kPARlay * (
+                self.m.log(x0 + (Vp ** 2 + x0 ** 2) ** 0.5) - self.m.log(xH + (Vp ** 2 + xH ** 2) ** 0.5))
@@ -1,6 +1,11 @@
 import xso
 
+import numpy as np
 
+from ....splitting import physics
+
+
+@physics
 @xso.component
 class SlabSinking:
     """ """
@@ -8,10 +13,14 @@ class SlabSinking:
     mld = xso.forcing(foreign=True)
     rate = xso.parameter(description='sinking rate, units: m d^-1')
 
-    @xso.flux
+    @xso.flux(dims=[(), 'station'])
     def sinking(self, var, rate, mld):
         return var * rate / mld
 
+    def sinking_jacobian(self, var, rate, mld):
+        """Partial derivatives of the sinking flux."""
+        return {'var': rate / mld * np.ones_like(var)}
+
 
 @xso.component
 class Mixing_K:
@@ -21,24 +30,34 @@ class Mixing_K:
 
     kappa = xso.parameter(description='constant mixing coefficient')
 
-    @xso.flux(group='mixing_K')
+    @xso.flux(dims=[(), 'station'], group='mixing_K')
     def mixing(self, mld, mld_deriv, kappa):
         return (self.m.max(mld_deriv, 0) + kappa) / mld
 
+    def mixing_jacobian(self, mld, mld_deriv, kappa):
+        """Mixing coefficient K does not depend on model variables."""
+        return {}
+
 
+@physics
 @xso.component
 class SlabUpwelling_KfromGroup:
     """ """
     n = xso.variable(foreign=True, flux='mixing', description='nutrient mixed into system')
     n_0 = xso.forcing(foreign=True, description='nutrient concentration below mixed layer depth')
 
-    @xso.flux(group_to_arg='mixing_K')
+    @xso.flux(dims=[(), 'station'], group_to_arg='mixing_K')
     def mixing(self, n, n_0, mixing_K):
         """ componentute function of on_demand xarray variable
          specific flux needs to be implemented in BaseFlux """
         return (n_0 - n) * mixing_K
 
+    def mixing_jacobian(self, n, n_0, mixing_K):
+        """Partial derivatives of the upwelling flux."""
+        return {'n': -mixing_K * np.ones_like(n), 'mixing_K': (n_0 - n) * np.ones_like(mixing_K)}
 
+
+@physics
 @xso.component
 class SlabMixing_KfromGroup:
     """ """
@@ -49,4 +68,13 @@ class SlabMixing_KfromGroup:
     def mixing(self, vars_sink, mixing_K):
         """ componentute function of on_demand xarray variable
          specific flux needs to be implemented in BaseFlux """
-        return vars_sink * mixing_K
+        # variables along 'station' dimension are concatenated, reshape to apply mixing per station
+        return (np.reshape(vars_sink, (-1, np.size(mixing_K))) * mixing_K).ravel()
+
+    def mixing_jacobian(self, vars_sink, mixing_K):
+        """Partial derivatives of the mixing flux, element-wise for variables and
+        per station for the mixing coefficient."""
+        num_vars = np.size(vars_sink) // np.size(mixing_K)
+        K_partial = np.kron(np.ones((num_vars, 1)), np.eye(np.size(mixing_K))) * np.reshape(vars_sink, (-1, 1))
+        return {'vars_sink': np.tile(mixing_K, num_vars), 'mixing_K': K_partial}
+
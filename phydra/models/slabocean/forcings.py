@@ -1,7 +1,321 @@
+import os
+import functools
+import warnings
+
 import xso
-import pandas
+import xsimlab as xs
 import numpy as np
-import scipy.interpolate as intrp
+
+from ...forcing import AnalyticForcing, AffineForcing, TabulatedForcing, InterpolatedForcing
+
+
+# default location of the forcing file, relative to the current working directory
+STATION_FORCING_FILE = os.path.join('data', 'stations_forcing.csv')
+
+STATIONS = {'india': {'MLD': 'MLD_India', 'SST': 'SST_India'},
+            'biotrans': {'MLD': 'MLD_Biotrans', 'SST': 'SST_Biotrans'},
+            'kerfix': {'MLD': 'MLD_Kerfix', 'SST': 'SST_Kerfix'},
+            'papa': {'MLD': 'MLD_Papa', 'SST': 'SST_Papa'}}
+
+# latitude (degrees), cloud fraction (oktas) and atmospheric vapour pressure of stations
+STATION_LOCATIONS = {'india': (60.0, 6.0, 12.0),
+                     'biotrans': (47.0, 6.0, 12.0),
+                     'kerfix': (-50.67, 6.0, 12.0),
+                     'papa': (50.0, 6.0, 12.0)}
+
+# the EMPOWER irradiance formula uses 0.00274 d^-1 as annual frequency
+IRRADIANCE_PERIOD = 1 / 0.00274
+
+# coefficients for N0 as a linear function of MLD (aN * MLD + bN)
+N0_COEFFICIENTS = {'india': (0.0074, 10.85),
+                   'biotrans': (0.0174, 4.0),
+                   'kerfix': (0.0, 26.1),
+                   'papa': (0.0, 14.6)}
+
+
+def set_breakpoints(func, breakpoints, period=None):
+    """Attaches discontinuity times to forcing function, e.g. knots of a piecewise interpolation,
+    and returns the function.
+
+    Breakpoints of periodic forcings are supplied within one period, starting at 0.
+    Solvers like 'solve_ivp_piecewise' integrate between breakpoints, instead of
+    resolving each discontinuity by rejected steps, see phydra.solvers.forcing_breakpoints.
+    """
+    func.breakpoints = np.asarray(breakpoints, dtype=float)
+    func.period = period
+    return func
+
+
+def merged_breakpoints(functions):
+    """Returns union of breakpoints and common period of forcing functions,
+    or (None, None) if none of the functions defines breakpoints."""
+    functions = [func for func in functions if getattr(func, 'breakpoints', None) is not None]
+    if not functions:
+        return None, None
+    periods = {func.period for func in functions}
+    if len(periods) > 1:
+        raise ValueError(f"Can not merge breakpoints of forcing functions with different periods: {periods}")
+    return np.unique(np.concatenate([func.breakpoints for func in functions])), periods.pop()
+
+
+@functools.lru_cache(maxsize=8)
+def _read_forcing_table(path, mtime):
+    """Parses the forcing file, cached per absolute path and modification time."""
+    # imported on first use, so that importing the models does not load pandas and scipy:
+    import pandas
+    return pandas.read_csv(path, sep=r'\s*,\s*', header=0, encoding='ascii', engine='python')
+
+
+@functools.lru_cache(maxsize=64)
+def _create_forcing_function(path, mtime, column, k, smooth, deriv):
+    """Fits periodic spline to monthly forcing data, cached per file, column and spline settings."""
+    import scipy.interpolate as intrp
+
+    station_data = _read_forcing_table(path, mtime)[column].values[:-1]
+
+    dayspermonth = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    dpm = dayspermonth
+    dpm_cumsum = np.cumsum(dpm) - np.array(dpm) / 2
+
+    time = np.concatenate([[0], dpm_cumsum, [365]], axis=None)
+
+    boundary_int = [(station_data[0] + station_data[-1]) / 2]
+    dat = np.concatenate([boundary_int, station_data, boundary_int], axis=None)
+
+    spl = intrp.splrep(time, dat, per=True, k=k, s=smooth)
+    return PeriodicSplineForcing(spl, deriv, period=365.)
+
+
+class PeriodicSplineForcing(InterpolatedForcing):
+    """Forcing interpolating periodic data by a B-spline, or its derivative of order deriv.
+
+    Parameters
+    ----------
+    spl : tuple
+        Knots, coefficients and degree of the spline, as returned by scipy.interpolate.splrep.
+    deriv : int
+        Order of the derivative of the spline.
+    period : float
+        Period of the forcing, time is wrapped to [0, period).
+    """
+
+    def __init__(self, spl, deriv=0, period=365.):
+        from scipy.interpolate import splev
+        self.splev = splev
+        self.spl = spl
+        self.deriv = deriv
+        # derivatives of order k - 1 and higher are discontinuous at the knots of the spline:
+        knots = np.unique(spl[0])
+        set_breakpoints(self, knots[(knots >= 0) & (knots < period)], period=period)
+
+    def __call__(self, time):
+        """Returns interpolated forcing at time (in days)."""
+        return self.splev(np.mod(time, self.period), self.spl, der=self.deriv)
+
+
+def read_forcing_table(path):
+    """Returns the parsed forcing table stored at path.
+
+    The table is parsed once per process and kept in memory, until
+    the file is modified or the entry is evicted from the cache."""
+    path = os.path.abspath(path)
+    return _read_forcing_table(path, os.path.getmtime(path))
+
+
+def station_forcing_function(path, station, data, k=1, smooth=1, deriv=0):
+    """Returns function interpolating the monthly forcing data of a station to any time (in days).
+
+    Fitted splines are shared between all components and model runs in the process,
+    the cache key is (file path, modification time, column, k, smooth, deriv)."""
+    try:
+        column = STATIONS[station][data]
+    except KeyError:
+        raise ValueError("station label not found, options: 'india', 'biotrans', 'kerfix', 'papa'")
+
+    path = os.path.abspath(path)
+    return _create_forcing_function(path, os.path.getmtime(path), column, k, smooth, deriv)
+
+
+def station_N0_function(MLD_func, station):
+    """Returns function of nutrient concentration below the mixed layer, computed from MLD function."""
+    aN, bN = N0_COEFFICIENTS[station]
+    return AffineForcing(MLD_func, aN, bN)
+
+
+def clear_forcing_cache():
+    """Removes all parsed forcing tables and fitted splines from memory."""
+    _read_forcing_table.cache_clear()
+    _create_forcing_function.cache_clear()
+
+
+class PeriodicForcingTable(TabulatedForcing):
+    """Lookup table of a periodic forcing function, sampled once on a regular grid.
+
+    Calling the table evaluates the forcing by piecewise polynomial lookup into
+    contiguous coefficient arrays, which avoids spline or trigonometric evaluation
+    at every right-hand side evaluation of the model.
+
+    Forcing functions can be vector-valued, e.g. one value per station, in which case
+    time has to be the last axis of the function output, as for StationForcingFromFile_MultiStation.
+
+    Parameters
+    ----------
+    func : callable
+        Vectorized forcing function of time (in days).
+    period : float
+        Period of the forcing function, time is wrapped to [0, period).
+    step : float
+        Approximate grid spacing, adjusted to divide the period evenly.
+    order : {0, 1, 3}
+        Order of lookup: 0 samples cell midpoints (for piecewise constant forcings, e.g. spline derivatives),
+        1 interpolates linearly between grid nodes, 3 uses periodic cubic Hermite (Catmull-Rom) interpolation,
+        for smooth forcings, e.g. irradiance, it overshoots at the kinks of piecewise linear forcings.
+    rtol : float
+        Tolerance of the accuracy check, relative to the maximum absolute value of the forcing.
+        A warning is raised at construction, if the table deviates further from func.
+    """
+
+    def __init__(self, func, period=365., step=0.1, order=1, rtol=1e-4):
+        if order not in (0, 1, 3):
+            raise ValueError("order of lookup table needs to be 0, 1 or 3")
+
+        self.period = float(period)
+        self.size = max(int(round(self.period / step)), 1)
+        self.step = self.period / self.size
+        self.order = order
+
+        nodes = np.arange(self.size) * self.step
+
+        if order == 0:
+            values = np.asarray(func(nodes + self.step / 2), dtype=float)
+            coefficients = [values]
+        else:
+            values = np.asarray(func(nodes), dtype=float)
+            values_next = np.roll(values, -1, axis=-1)
+            if order == 1:
+                coefficients = [values, values_next - values]
+            else:
+                tangents = (values_next - np.roll(values, 1, axis=-1)) / 2
+                tangents_next = np.roll(tangents, -1, axis=-1)
+                coefficients = [values, tangents,
+                                3 * (values_next - values) - 2 * tangents - tangents_next,
+                                2 * (values - values_next) + tangents + tangents_next]
+
+        # store coefficients as contiguous array of shape (order + 1, ..., size)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+
+        # discontinuities of func within the period, the table is evaluated on the same period:
+        breakpoints, period = merged_breakpoints([func])
+        self.breakpoints = breakpoints if period == self.period else None
+
+        self.max_error = self.check_accuracy(func)
+        if self.max_error > rtol * max(np.max(np.abs(values)), np.finfo(float).tiny):
+            warnings.warn(f"Tabulated forcing deviates from forcing function by up to {self.max_error:.3g}, "
+                          f"consider decreasing the step size or changing the order of the lookup table.")
+
+    def check_accuracy(self, func, samples=4):
+        """Returns maximum absolute deviation of table from func, evaluated between grid nodes."""
+        offsets = (np.arange(samples) + 0.5) / samples
+        time = ((np.arange(self.size)[:, None] + offsets) * self.step).ravel()
+        return float(np.max(np.abs(self(time) - func(time))))
+
+    def __call__(self, time):
+        """Returns tabulated forcing value at time."""
+        if np.ndim(time) == 0:
+            position = (float(time) % self.period) / self.step
+            index = min(int(position), self.size - 1)
+        else:
+            position = np.mod(time, self.period) / self.step
+            index = np.minimum(position.astype(np.intp), self.size - 1)
+
+        coefficients = self.coefficients
+        if self.order == 0:
+            return coefficients[0][..., index]
+
+        fraction = position - index
+        if self.order == 1:
+            return coefficients[0][..., index] + fraction * coefficients[1][..., index]
+
+        return coefficients[0][..., index] + fraction * (coefficients[1][..., index] + fraction * (
+                coefficients[2][..., index] + fraction * coefficients[3][..., index]))
+
+
+def stacked_forcing_table(functions, order=1):
+    """Returns lookup table of a list of forcing functions, stacked along first axis,
+    with the union of their breakpoints."""
+    def stacked(time):
+        return np.stack([func(time) for func in functions])
+
+    breakpoints, period = merged_breakpoints(functions)
+    if breakpoints is not None:
+        set_breakpoints(stacked, breakpoints, period)
+    return PeriodicForcingTable(stacked, order=order)
+
+
+def day_length_calc(jday, latradians):
+    """Function to calculate day length for location"""
+    declin = 23.45 * np.sin(2 * np.pi * (284 + jday) * 0.00274) * np.pi / 180  # solar declination angle
+    daylnow = 2 * np.arccos(-1 * np.tan(latradians) * np.tan(declin)) * 12 / np.pi  # day length
+    return daylnow
+
+
+def noon_PAR_calc(jday, latradians, clouds, e0):
+    """Function to calculate noon PAR for location"""
+    albedo = 0.04  # albedo
+    solarconst = 1368.0  # solar constant, w m-2
+    parrac = 0.43  # PAR fraction
+    declin = 23.45 * np.sin(2 * np.pi * (284 + jday) * 0.00274) * np.pi / 180  # solar declination angle
+    coszen = np.sin(latradians) * np.sin(declin) + np.cos(latradians) * np.cos(declin)  # cosine of zenith angle
+    zen = np.arccos(coszen) * 180 / np.pi  # zenith angle, degrees
+    Rvector = 1 / np.sqrt(1 + 0.033 * np.cos(2 * np.pi * jday * 0.00274))  # Earth's radius vector
+    Iclear = solarconst * coszen ** 2 / (Rvector ** 2) / (
+            1.2 * coszen + e0 * (1.0 + coszen) * 0.001 + 0.0455)  # irradiance at ocean surface, clear sky
+    cfac = (1 - 0.62 * clouds * 0.125 + 0.0019 * (90 - zen))  # cloud factor (atmospheric transmission)
+    Inoon = Iclear * cfac * (1 - albedo)  # noon irradiance: total solar
+    noonparnow = parrac * Inoon
+    return noonparnow
+
+
+def daily_PAR(time, latradians, clouds, e0):
+    """Returns daily PAR for location"""
+    day_length = day_length_calc(time, latradians)
+    noonpar = noon_PAR_calc(time, latradians, clouds, e0)
+    return noonpar * day_length * np.sin(2 / np.pi)  # sinusoidal integration
+    # return noonpar * day_length / 2  # trapezoidal integration
+
+
+def stations_daily_PAR(time, latradians, clouds, e0):
+    """Returns array of daily PAR, with stations along first axis"""
+    return np.moveaxis(daily_PAR(np.expand_dims(time, -1), latradians, clouds, e0), -1, 0)
+
+
+class IrradianceForcing(AnalyticForcing):
+    """Forcing of daily PAR at latitude (degrees), for cloud fraction (oktas)
+    and atmospheric vapour pressure e0, adapted from EMPOWER model (Anderson et al. 2015).
+
+    Latitude, clouds and e0 can be arrays of stations, the forcing then returns
+    an array with stations along the first axis."""
+
+    def __init__(self, latitude, clouds, e0):
+        latradians = np.asarray(latitude, dtype=float) * np.pi / 180.
+        expression = daily_PAR if np.ndim(latradians) == 0 else stations_daily_PAR
+        super().__init__(expression, latradians=latradians if np.ndim(latradians) else float(latradians),
+                         clouds=clouds, e0=e0)
+
+
+def irradiance_function(latitude, clouds, e0):
+    """Returns forcing of daily PAR at latitude (degrees), for cloud fraction (oktas)
+    and atmospheric vapour pressure e0, see IrradianceForcing."""
+    return IrradianceForcing(latitude, clouds, e0)
+
+
+def station_irradiance_function(station):
+    """Returns function of daily PAR at the station."""
+    try:
+        latitude, clouds, e0 = STATION_LOCATIONS[station]
+    except KeyError:
+        raise ValueError("station label not found, options: 'india', 'biotrans', 'kerfix', 'papa'")
+    return irradiance_function(latitude, clouds, e0)
 
 
 @xso.component
@@ -15,64 +329,16 @@ class IrradianceFromLat:
 
     def calculate_I0(self, station):
         """Function adapted from EMPOWER model (Anderson et al. 2015)."""
-
-        def day_length_calc(jday, latradians):
-            """Function to calculate day length for location"""
-            declin = 23.45 * np.sin(2 * np.pi * (284 + jday) * 0.00274) * np.pi / 180  # solar declination angle
-            daylnow = 2 * np.arccos(-1 * np.tan(latradians) * np.tan(declin)) * 12 / np.pi  # day length
-            return daylnow
-
-        def noon_PAR_calc(jday, latradians, clouds, e0):
-            """Function to calculate noon PAR for location"""
-            albedo = 0.04  # albedo
-            solarconst = 1368.0  # solar constant, w m-2
-            parrac = 0.43  # PAR fraction
-            declin = 23.45 * np.sin(2 * np.pi * (284 + jday) * 0.00274) * np.pi / 180  # solar declination angle
-            coszen = np.sin(latradians) * np.sin(declin) + np.cos(latradians) * np.cos(declin)  # cosine of zenith angle
-            zen = np.arccos(coszen) * 180 / np.pi  # zenith angle, degrees
-            Rvector = 1 / np.sqrt(1 + 0.033 * np.cos(2 * np.pi * jday * 0.00274))  # Earth's radius vector
-            Iclear = solarconst * coszen ** 2 / (Rvector ** 2) / (
-                    1.2 * coszen + e0 * (1.0 + coszen) * 0.001 + 0.0455)  # irradiance at ocean surface, clear sky
-            cfac = (1 - 0.62 * clouds * 0.125 + 0.0019 * (90 - zen))  # cloud factor (atmospheric transmission)
-            Inoon = Iclear * cfac * (1 - albedo)  # noon irradiance: total solar
-            noonparnow = parrac * Inoon
-            return noonparnow
-
-        if station == 'india':
-            latitude = 60.0  # latitude, degrees
-            clouds = 6.0  # cloud fraction, oktas
-            e0 = 12.0  # atmospheric vapour pressure
-        elif station == 'biotrans':
-            latitude = 47.0
-            clouds = 6.0
-            e0 = 12.0
-        elif station == 'kerfix':
-            latitude = -50.67
-            clouds = 6.0
-            e0 = 12.0
-        elif station == 'papa':
-            latitude = 50.0
-            clouds = 6.0
-            e0 = 12.0
-        else:
-            raise ValueError("station label not found, options: 'india', 'biotrans', 'kerfix', 'papa'")
-
-        latradians = latitude * np.pi / 180.
-
-        def return_PAR_forcing(time):
-            """Forcing function to return daily PAR for location"""
-            day_length = day_length_calc(time, latradians)
-            noonpar = noon_PAR_calc(time, latradians, clouds, e0)
-            return noonpar * day_length * np.sin(2 / np.pi)  # sinusoidal integration
-            # return noonpar * day_length / 2  # trapezoidal integration
-
-        return return_PAR_forcing
+        return station_irradiance_function(station)
 
 
 
 @xso.component
 class StationForcingFromFile:
-    """Component that reads forcing data for EMPOWER stations from file."""
+    """Component that reads forcing data for EMPOWER stations from file.
+
+    The file is expected at 'data/stations_forcing.csv' relative to the
+    current working directory, use StationForcingFromPath to supply the path explicitly."""
 
     MLD = xso.forcing(setup_func='create_MLD_forcing', description='Empower MLD Forcing', attrs={'unit': 'm'})
     MLDderiv = xso.forcing(setup_func='create_MLD_deriv_forcing', description='Empower MLDderiv Forcing')
@@ -83,68 +349,179 @@ class StationForcingFromFile:
 
     def read_intrp_forcing(self, station, data, k, smooth, deriv):
         """Method to read forcing data from file and interpolate to daily values."""
-
-        stations_dict = {'india': {'MLD': 'MLD_India', 'SST': 'SST_India'},
-                         'biotrans': {'MLD': 'MLD_Biotrans', 'SST': 'SST_Biotrans'},
-                         'kerfix': {'MLD': 'MLD_Kerfix', 'SST': 'SST_Kerfix'},
-                         'papa': {'MLD': 'MLD_Papa', 'SST': 'SST_Papa'}}
-
         # read the forcing file from the current directory
         try:
-            all_forcings = pandas.read_csv("data/stations_forcing.csv", sep=r'\s*,\s*',
-                                   header=0, encoding='ascii', engine='python')
+            return station_forcing_function(STATION_FORCING_FILE, station, data, k=k, smooth=smooth, deriv=deriv)
         except FileNotFoundError:
             raise FileNotFoundError("Forcing file not found, make sure it is in the current working directory. \n"
                                     "This error could arise because you moved the Notebook for the slab model, "
                                     "or moved the stations_forcing.csv file from the data folder.")
 
-        station_data = all_forcings[stations_dict[station][data]].values[:-1]
+    def create_MLD_forcing(self, station):
+        return self.read_intrp_forcing(station, 'MLD', deriv=0, k=1, smooth=1)
 
-        dayspermonth = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-        dpm = dayspermonth
-        dpm_cumsum = np.cumsum(dpm) - np.array(dpm) / 2
+    def create_MLD_deriv_forcing(self, station):
+        return self.read_intrp_forcing(station, 'MLD', deriv=1, k=1, smooth=1)
 
-        time = np.concatenate([[0], dpm_cumsum, [365]], axis=None)
+    def create_SST_forcing(self, station):
+        return self.read_intrp_forcing(station, 'SST', deriv=0, k=1, smooth=1)
+
+    def create_N0_forcing(self, station):
+        MLD_func = self.read_intrp_forcing(station, 'MLD', deriv=0, k=1, smooth=1)
+        return station_N0_function(MLD_func, station)
+
+
+@xso.component
+class StationForcingFromPath:
+    """Component that reads forcing data for EMPOWER stations from the file at the supplied path.
+
+    Independent of the current working directory, otherwise equivalent to StationForcingFromFile."""
+
+    MLD = xso.forcing(setup_func='create_MLD_forcing', description='Empower MLD Forcing', attrs={'unit': 'm'})
+    MLDderiv = xso.forcing(setup_func='create_MLD_deriv_forcing', description='Empower MLDderiv Forcing')
+    SST = xso.forcing(setup_func='create_SST_forcing', description='Empower SST Forcing')
+    N0 = xso.forcing(setup_func='create_N0_forcing', description='Empower N0 Forcing')
+
+    station = xso.parameter(description="name of station, options: 'india', 'biotrans', 'kerfix', 'papa'")
+    file_path = xso.parameter(description='path to forcing file, e.g. stations_forcing.csv')
+
+    def create_MLD_forcing(self, station, file_path):
+        return station_forcing_function(str(file_path), station, 'MLD', deriv=0, k=1, smooth=1)
+
+    def create_MLD_deriv_forcing(self, station, file_path):
+        return station_forcing_function(str(file_path), station, 'MLD', deriv=1, k=1, smooth=1)
 
-        boundary_int = [(station_data[0] + station_data[-1]) / 2]
-        dat = np.concatenate([boundary_int, station_data, boundary_int], axis=None)
+    def create_SST_forcing(self, station, file_path):
+        return station_forcing_function(str(file_path), station, 'SST', deriv=0, k=1, smooth=1)
 
-        spl = intrp.splrep(time, dat, per=True, k=k, s=smooth)
+    def create_N0_forcing(self, station, file_path):
+        MLD_func = station_forcing_function(str(file_path), station, 'MLD', deriv=0, k=1, smooth=1)
+        return station_N0_function(MLD_func, station)
 
-        def forcing(time):
-            """Forcing function to return interpolated daily forcing for location"""
-            return intrp.splev(np.mod(time, 365), spl, der=deriv)
 
-        return forcing
+@xso.component
+class TabulatedIrradianceFromLat:
+    """Component that calculates daily irradiance from latitude of station,
+    precomputed once at setup into a periodic lookup table.
+
+    The table uses cubic interpolation on a 0.1 day grid, see PeriodicForcingTable."""
+
+    I0 = xso.forcing(setup_func='calculate_I0', description='tabulated irradiance for latitude',
+                     attrs={'unit': 'W m^-2'})
+
+    station = xso.parameter(description="name of station, options: 'india', 'biotrans', 'kerfix', 'papa'")
+
+    def calculate_I0(self, station):
+        return PeriodicForcingTable(station_irradiance_function(station), period=IRRADIANCE_PERIOD, order=3)
+
+
+@xso.component
+class TabulatedStationForcingFromFile:
+    """Component that reads forcing data for EMPOWER stations from file,
+    precomputed once at setup into periodic lookup tables.
+
+    MLD, SST and N0 are piecewise linear in time and are tabulated with linear lookup,
+    MLDderiv is piecewise constant and is tabulated at cell midpoints. The 0.1 day grid
+    contains the monthly spline knots, so the tables reproduce StationForcingFromFile
+    to floating point precision, apart from the exact knot times."""
+
+    MLD = xso.forcing(setup_func='create_MLD_forcing', description='Empower MLD Forcing', attrs={'unit': 'm'})
+    MLDderiv = xso.forcing(setup_func='create_MLD_deriv_forcing', description='Empower MLDderiv Forcing')
+    SST = xso.forcing(setup_func='create_SST_forcing', description='Empower SST Forcing')
+    N0 = xso.forcing(setup_func='create_N0_forcing', description='Empower N0 Forcing')
+
+    station = xso.parameter(description="name of station, options: 'india', 'biotrans', 'kerfix', 'papa'")
+
+    def read_intrp_forcing(self, station, data, k, smooth, deriv):
+        """Method to read forcing data from file and interpolate to daily values."""
+        try:
+            return station_forcing_function(STATION_FORCING_FILE, station, data, k=k, smooth=smooth, deriv=deriv)
+        except FileNotFoundError:
+            raise FileNotFoundError("Forcing file not found, make sure it is in the current working directory. \n"
+                                    "This error could arise because you moved the Notebook for the slab model, "
+                                    "or moved the stations_forcing.csv file from the data folder.")
 
     def create_MLD_forcing(self, station):
-        return self.read_intrp_forcing(station, 'MLD', deriv=0, k=1, smooth=1)
+        return PeriodicForcingTable(self.read_intrp_forcing(station, 'MLD', deriv=0, k=1, smooth=1))
 
     def create_MLD_deriv_forcing(self, station):
-        return self.read_intrp_forcing(station, 'MLD', deriv=1, k=1, smooth=1)
+        return PeriodicForcingTable(self.read_intrp_forcing(station, 'MLD', deriv=1, k=1, smooth=1), order=0)
 
     def create_SST_forcing(self, station):
-        return self.read_intrp_forcing(station, 'SST', deriv=0, k=1, smooth=1)
+        return PeriodicForcingTable(self.read_intrp_forcing(station, 'SST', deriv=0, k=1, smooth=1))
 
     def create_N0_forcing(self, station):
         MLD_func = self.read_intrp_forcing(station, 'MLD', deriv=0, k=1, smooth=1)
+        return PeriodicForcingTable(station_N0_function(MLD_func, station))
 
-        if station == 'india':
-            aN = 0.0074  # coeff. for N0 as fn depth
-            bN = 10.85  # coeff. for N0 as fn depth
-        elif station == 'biotrans':
-            aN = 0.0174
-            bN = 4.0
-        elif station == 'kerfix':
-            aN = 0
-            bN = 26.1
-        elif station == 'papa':
-            aN = 0.0
-            bN = 14.6
-        else:
+
+@xso.component
+class StationForcingFromFile_MultiStation:
+    """Component that reads forcing data for multiple EMPOWER stations from file,
+    evaluated for all stations at once along the 'station' dimension.
+
+    The interpolated forcings of all stations are stacked into periodic lookup tables,
+    which reproduce the piecewise linear forcings of StationForcingFromFile to floating
+    point precision, see TabulatedStationForcingFromFile."""
+
+    MLD = xso.forcing(setup_func='create_MLD_forcing', dims=[(), 'station'], description='Empower MLD Forcing',
+                      attrs={'unit': 'm'})
+    MLDderiv = xso.forcing(setup_func='create_MLD_deriv_forcing', dims=[(), 'station'],
+                           description='Empower MLDderiv Forcing')
+    SST = xso.forcing(setup_func='create_SST_forcing', dims=[(), 'station'], description='Empower SST Forcing')
+    N0 = xso.forcing(setup_func='create_N0_forcing', dims=[(), 'station'], description='Empower N0 Forcing')
+
+    station = xso.index(dims='station',
+                        description="names of stations, options: 'india', 'biotrans', 'kerfix', 'papa'")
+
+    def read_intrp_forcing(self, station_index, data, k, smooth, deriv):
+        """Method to read forcing data of all stations from file, returning list of interpolating functions."""
+        try:
+            return [station_forcing_function(STATION_FORCING_FILE, station, data, k=k, smooth=smooth, deriv=deriv)
+                    for station in np.atleast_1d(station_index)]
+        except FileNotFoundError:
+            raise FileNotFoundError("Forcing file not found, make sure it is in the current working directory. \n"
+                                    "This error could arise because you moved the Notebook for the slab model, "
+                                    "or moved the stations_forcing.csv file from the data folder.")
+
+    def create_MLD_forcing(self, station_index):
+        return stacked_forcing_table(self.read_intrp_forcing(station_index, 'MLD', deriv=0, k=1, smooth=1))
+
+    def create_MLD_deriv_forcing(self, station_index):
+        return stacked_forcing_table(self.read_intrp_forcing(station_index, 'MLD', deriv=1, k=1, smooth=1), order=0)
+
+    def create_SST_forcing(self, station_index):
+        return stacked_forcing_table(self.read_intrp_forcing(station_index, 'SST', deriv=0, k=1, smooth=1))
+
+    def create_N0_forcing(self, station_index):
+        MLD_funcs = self.read_intrp_forcing(station_index, 'MLD', deriv=0, k=1, smooth=1)
+        return stacked_forcing_table([station_N0_function(MLD_func, station)
+                                    for MLD_func, station in zip(MLD_funcs, np.atleast_1d(station_index))])
+
+
+@xso.component
+class _StationIrradiance_MultiStation:
+    """Component that calculates daily irradiance from latitude for the stations of station_index,
+    evaluated for all stations at once along the 'station' dimension."""
+
+    I0 = xso.forcing(setup_func='calculate_I0', dims=[(), 'station'],
+                     description='calculated irradiance for latitude', attrs={'unit': 'W m^-2'})
+
+    def calculate_I0(self, station_index):
+        try:
+            latitude, clouds, e0 = np.array([STATION_LOCATIONS[label] for label in np.atleast_1d(station_index)]).T
+        except KeyError:
             raise ValueError("station label not found, options: 'india', 'biotrans', 'kerfix', 'papa'")
 
-        def N0_forcing(time):
-            return aN * MLD_func(time) + bN
+        return irradiance_function(latitude, clouds, e0)
+
+
+@xs.process
+class IrradianceFromLat_MultiStation(_StationIrradiance_MultiStation):
+    """Component that calculates daily irradiance from latitude for multiple stations,
+    evaluated for all stations at once along the 'station' dimension.
+
+    The stations are read from the 'station' index of StationForcingFromFile_MultiStation,
+    so that they are supplied only once to the model setup."""
 
-        return N0_forcing
+    station_index = xs.foreign(StationForcingFromFile_MultiStation, 'station_index')
@@ -3,5 +3,7 @@ import xso
 
 @xso.component
 class SV:
-    """XSO component to define a state variable in the model."""
-    var = xso.variable(description='basic state variable', attrs={'units': 'µM N'})
+    """XSO component to define a state variable in the model.
+
+    The variable can be a scalar, or an array along the 'station' dimension."""
+    var = xso.variable(dims=[(), 'station'], description='basic state variable', attrs={'units': 'µM N'})
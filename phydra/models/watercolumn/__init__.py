@@ -0,0 +1,6 @@
+from ..._lazy import lazy_loader
+
+__getattr__, __dir__, __all__ = lazy_loader(__name__, {
+    'NPZDWaterColumn': '._models',
+    'uniform_layers': '.grid', 'column_input_vars': '.grid',
+}, submodules=('variables', 'fluxes', 'grid'))
@@ -0,0 +1,46 @@
+import xso
+
+from .variables import LayeredSV, VerticalGrid, along_depth
+
+from ..slabocean.forcings import IrradianceFromLat, StationForcingFromFile
+from ..slabocean.fluxes.basic import LinearExchange, QuadraticExchange, QuadraticDecay
+from ..slabocean.fluxes.growth import EMPOWER_Growth_ML, EMPOWER_Monod_ML, EMPOWER_Eppley_ML
+from ..slabocean.fluxes.grazing import HollingTypeIII_GrossGrowthEfficiency
+
+from .fluxes.growth import EMPOWER_Smith_LambertBeer_Layers
+from .fluxes.transport import MLDDiffusivity, VerticalDiffusion, VerticalDiffusion_FixedBottom, LayeredSinking
+
+NPZDWaterColumn = xso.create({
+    # Layers and state variables
+    'Grid': VerticalGrid,
+    'Nutrient': LayeredSV,
+    'Phytoplankton': LayeredSV,
+    'Zooplankton': LayeredSV,
+    'Detritus': LayeredSV,
+
+    # Vertical transport:
+    'K': MLDDiffusivity,
+    'Diffusion': VerticalDiffusion,
+    'NutrientDiffusion': VerticalDiffusion_FixedBottom,
+    'Sinking': LayeredSinking,
+
+    # Growth, components of the slab ocean evaluated per layer
+    'Growth': along_depth(EMPOWER_Growth_ML),
+    'Nut_lim': along_depth(EMPOWER_Monod_ML),
+    'Light_lim': EMPOWER_Smith_LambertBeer_Layers,
+    'Temp_lim': along_depth(EMPOWER_Eppley_ML),
+
+    # Grazing, fused with gross growth efficiency, with variables reshaped to (routing, depth)
+    'Grazing': HollingTypeIII_GrossGrowthEfficiency,
+
+    # Mortality
+    'PhytoLinMortality': along_depth(LinearExchange),
+    'PhytoQuadMortality': along_depth(QuadraticExchange),
+    'ZooLinMortality': along_depth(LinearExchange),
+    'HigherOrderPred': along_depth(QuadraticDecay),
+    'DetRemineralisation': along_depth(LinearExchange),
+
+    # Forcings
+    'Irradiance': IrradianceFromLat,
+    'Forcings': StationForcingFromFile,
+})
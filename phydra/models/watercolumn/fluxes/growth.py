@@ -0,0 +1,65 @@
+import xso
+
+import numpy as np
+
+
+def optical_depths(pigment_biomass, thickness, kw, kc):
+    """Returns attenuation coefficients of the layers, and the optical depth at the top and base
+    of each layer, attenuating light by water and pigment biomass of all layers above."""
+    kPAR = kw + kc * pigment_biomass
+    base = np.cumsum(kPAR * thickness)
+    return kPAR, base - kPAR * thickness, base
+
+
+@xso.component
+class EMPOWER_Smith_LambertBeer_Layers:
+    """Component to calculate light limitation of growth in each layer of the water column.
+
+     Light is attenuated by water and pigment biomass of all layers above according to
+     the Lambert-Beer law, and the Smith function is integrated over the thickness of each layer,
+     as over the mixed layer by EMPOWER_Smith_LambertBeer_ML of the slab ocean.
+
+     The flux value is added to the group 'growth_lims'."""
+    pigment_biomass = xso.variable(foreign=True)
+
+    i_0 = xso.forcing(foreign=True, description='Light forcing')
+    thickness = xso.forcing(foreign=True, description='thickness of layers')
+
+    alpha = xso.parameter(description='initial slope of PI curve')
+    CtoChl = xso.parameter(description='chlorophyll to carbon ratio')
+    kw = xso.parameter(description='light attenuation coef for water')
+    kc = xso.parameter(description='light attenuation coef for pigment biomass')
+
+    @xso.flux(dims='depth', group_to_arg='VpT', group='growth_lims')
+    def light_limitation(self, i_0, thickness, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+        kPAR, tau_top, tau_base = optical_depths(pigment_biomass, thickness, kw, kc)
+        i_0 = i_0 / 24  # from per day to per h
+        x_top = alpha * i_0 * self.m.exp(-tau_top)
+        x_base = alpha * i_0 * self.m.exp(-tau_base)
+        VpH = VpT / kPAR / thickness * (self.m.log(x_top + (VpT ** 2 + x_top ** 2) ** 0.5)
+                                        - self.m.log(x_base + (VpT ** 2 + x_base ** 2) ** 0.5))
+        return VpH * 24 / CtoChl
+
+    def light_limitation_jacobian(self, i_0, thickness, pigment_biomass, alpha, VpT, kw, kc, CtoChl):
+        """Partial derivatives of the light limitation with respect to pigment biomass.
+
+        Biomass of a layer affects its own attenuation coefficient, and the light at top and base
+        of all layers below, so that the partial derivatives are a dense lower triangular matrix,
+        with layers * (layers + 1) / 2 non-zero entries. Unlike the transport Jacobians, it is not
+        banded, and couples the light limitation of each layer to the biomass of all layers above."""
+        kPAR, tau_top, tau_base = optical_depths(pigment_biomass, thickness, kw, kc)
+        i_0 = i_0 / 24
+        x_top = alpha * i_0 * self.m.exp(-tau_top)
+        x_base = alpha * i_0 * self.m.exp(-tau_base)
+        integral = (self.m.log(x_top + (VpT ** 2 + x_top ** 2) ** 0.5)
+                    - self.m.log(x_base + (VpT ** 2 + x_base ** 2) ** 0.5))
+        scale = VpT / kPAR / thickness * 24 / CtoChl
+
+        layers = np.size(pigment_biomass)
+        # derivatives of the optical depth at top (layers above) and base (including the layer itself):
+        dtau_top = np.tril(np.ones((layers, layers)), -1) * kc * thickness
+        dtau_base = np.tril(np.ones((layers, layers))) * kc * thickness
+        dintegral = (- (x_top / (VpT ** 2 + x_top ** 2) ** 0.5)[:, None] * dtau_top
+                     + (x_base / (VpT ** 2 + x_base ** 2) ** 0.5)[:, None] * dtau_base)
+        dscale = np.diag(- scale / kPAR * kc * np.ones(layers))
+        return {'pigment_biomass': scale[:, None] * dintegral + dscale * integral[:, None]}
@@ -0,0 +1,142 @@
+import xso
+
+import numpy as np
+from scipy import sparse as sp
+
+from ....splitting import physics
+
+
+def interface_depths(thickness):
+    """Returns depth of the base of each layer."""
+    return np.cumsum(thickness)
+
+
+def diffusion_bands(diffusivity, thickness):
+    """Returns lower, main and upper diagonal of the tridiagonal matrix of turbulent diffusion
+    between layers, with no flux through the surface and the base of the water column.
+
+    The diffusivity is given at the base of each layer, concentration gradients at interfaces
+    are taken over the distance between the midpoints of adjacent layers. The lower diagonal
+    starts, and the upper diagonal ends, with a zero entry, so that all bands have the length
+    of the water column."""
+    distance = (thickness[:-1] + thickness[1:]) / 2
+    exchange = diffusivity[:-1] / distance
+    lower = np.concatenate(([0.], exchange)) / thickness
+    upper = np.concatenate((exchange, [0.])) / thickness
+    return lower, -(lower + upper), upper
+
+
+def tridiagonal_dot(lower, diag, upper, values):
+    """Returns product of the tridiagonal matrix given by its bands with values."""
+    product = diag * values
+    product[1:] += lower[1:] * values[:-1]
+    product[:-1] += upper[:-1] * values[1:]
+    return product
+
+
+def tridiagonal_matrix(lower, diag, upper):
+    """Returns tridiagonal matrix given by its bands as scipy.sparse.csr_matrix."""
+    return sp.diags([lower[1:], diag, upper[:-1]], [-1, 0, 1], format='csr')
+
+
+@xso.component
+class MLDDiffusivity:
+    """Turbulent diffusivity at the base of each layer of the water column, high within
+    the mixed layer and low below, with a smooth transition of the given width around
+    the mixed layer depth.
+
+    The flux value is added to the group 'diffusivity'."""
+    mld = xso.forcing(foreign=True, description='Mixed Layer Depth forcing')
+    thickness = xso.forcing(foreign=True, description='thickness of layers')
+
+    kappa_ml = xso.parameter(description='diffusivity within the mixed layer, units: m^2 d^-1')
+    kappa_deep = xso.parameter(description='diffusivity below the mixed layer, units: m^2 d^-1')
+    width = xso.parameter(description='width of the transition at the mixed layer depth, units: m')
+
+    @xso.flux(dims='depth', group='diffusivity')
+    def diffusivity(self, mld, thickness, kappa_ml, kappa_deep, width):
+        within = 0.5 * (1 - np.tanh((interface_depths(thickness) - mld) / width))
+        return kappa_deep + (kappa_ml - kappa_deep) * within
+
+    def diffusivity_jacobian(self, mld, thickness, kappa_ml, kappa_deep, width):
+        """Diffusivity does not depend on model variables."""
+        return {}
+
+
+@physics
+@xso.component
+class VerticalDiffusion:
+    """Turbulent diffusion of a list of variables between the layers of the water column,
+    without exchange through the surface and the base of the water column.
+
+    The flux is the net rate of change of each layer, returned as flat array of all variables."""
+    vars_diffused = xso.variable(foreign=True, flux='diffusion', list_input=True, dims='diffused_vars',
+                                 description='list of variables affected')
+    thickness = xso.forcing(foreign=True, description='thickness of layers')
+
+    @xso.flux(dims='diffused_vars_depth', group_to_arg='diffusivity')
+    def diffusion(self, vars_diffused, thickness, diffusivity):
+        bands = diffusion_bands(diffusivity, thickness)
+        # variables are concatenated, reshape to apply diffusion per variable
+        values = np.reshape(vars_diffused, (-1, np.size(thickness)))
+        return np.concatenate([tridiagonal_dot(*bands, var) for var in values])
+
+    def diffusion_jacobian(self, vars_diffused, thickness, diffusivity):
+        """Partial derivatives of the diffusion, a tridiagonal block for each variable."""
+        num_vars = np.size(vars_diffused) // np.size(thickness)
+        operator = tridiagonal_matrix(*diffusion_bands(diffusivity, thickness))
+        return {'vars_diffused': sp.kron(sp.identity(num_vars), operator, format='csr')}
+
+
+@physics
+@xso.component
+class VerticalDiffusion_FixedBottom:
+    """Turbulent diffusion of a variable between the layers of the water column, and exchange
+    with the concentration given by a forcing below the base of the water column,
+    e.g. nutrient supply from deep water.
+
+    The flux is the net rate of change of each layer."""
+    var = xso.variable(foreign=True, flux='diffusion', description='variable affected by flux')
+    bottom = xso.forcing(foreign=True, description='concentration below the water column')
+    thickness = xso.forcing(foreign=True, description='thickness of layers')
+
+    @xso.flux(dims='depth', group_to_arg='diffusivity')
+    def diffusion(self, var, bottom, thickness, diffusivity):
+        change = tridiagonal_dot(*diffusion_bands(diffusivity, thickness), var)
+        change[-1] += self.bottom_exchange(thickness, diffusivity) * (bottom - var[-1])
+        return change
+
+    def diffusion_jacobian(self, var, bottom, thickness, diffusivity):
+        """Partial derivatives of the diffusion, a tridiagonal matrix."""
+        lower, diag, upper = diffusion_bands(diffusivity, thickness)
+        diag[-1] -= self.bottom_exchange(thickness, diffusivity)
+        return {'var': tridiagonal_matrix(lower, diag, upper)}
+
+    def bottom_exchange(self, thickness, diffusivity):
+        """Helper function returning the exchange rate of the lowest layer with the water below,
+        over the distance from its midpoint to the base of the water column."""
+        return diffusivity[-1] / (thickness[-1] / 2) / thickness[-1]
+
+
+@physics
+@xso.component
+class LayeredSinking:
+    """Sinking of a variable from each layer into the layer below, at constant speed,
+    by first-order upwind differences. Sinking out of the lowest layer leaves the water column.
+
+    The flux is the net rate of change of each layer."""
+    var = xso.variable(foreign=True, flux='sinking', description='variable affected by flux')
+    thickness = xso.forcing(foreign=True, description='thickness of layers')
+    rate = xso.parameter(description='sinking rate, units: m d^-1')
+
+    @xso.flux(dims='depth')
+    def sinking(self, var, thickness, rate):
+        outflow = var * rate
+        change = - outflow / thickness
+        change[1:] += outflow[:-1] / thickness[1:]
+        return change
+
+    def sinking_jacobian(self, var, thickness, rate):
+        """Partial derivatives of the sinking flux, a lower bidiagonal matrix."""
+        return {'var': tridiagonal_matrix(np.concatenate(([0.], rate / thickness[1:])), - rate / thickness,
+                                          np.zeros(np.size(thickness)))}
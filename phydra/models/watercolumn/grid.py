@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def uniform_layers(layers, total_depth):
+    """Returns depth of the midpoints and thickness of layers of equal thickness,
+    dividing the water column down to total_depth."""
+    thickness = np.full(layers, total_depth / layers)
+    return np.cumsum(thickness) - thickness / 2, thickness
+
+
+def column_input_vars(layers=100, total_depth=200., station='biotrans', N_init=10., P_init=.5, Z_init=.1, D_init=.1,
+                      kappa_ml=50., kappa_deep=.5, width=5., sinking_rate=6.43):
+    """Returns input variables of the NPZDWaterColumn model setup, with the parameters of the
+    NPZDSlabOcean setup of notebook 2 and uniform initial concentrations in all layers.
+
+    Parameters
+    ----------
+    layers : int
+        Number of layers of equal thickness.
+    total_depth : float
+        Depth of the base of the water column, in m.
+    station : str
+        Station of the forcing, one of 'india', 'biotrans', 'kerfix', 'papa'.
+    N_init, P_init, Z_init, D_init : float
+        Initial concentrations in all layers.
+    kappa_ml, kappa_deep : float
+        Turbulent diffusivity within and below the mixed layer, in m^2 d^-1.
+    width : float
+        Width of the transition of diffusivity at the mixed layer depth, in m.
+    sinking_rate : float
+        Sinking speed of detritus, in m d^-1.
+    """
+    depth, thickness = uniform_layers(layers, total_depth)
+    return {
+        # Layers and state variables
+        'Grid': {'depth_index': depth, 'layer_thickness': thickness, 'thickness_label': 'dz'},
+        'Nutrient': {'var_label': 'N', 'var_init': np.full(layers, N_init)},
+        'Phytoplankton': {'var_label': 'P', 'var_init': np.full(layers, P_init)},
+        'Zooplankton': {'var_label': 'Z', 'var_init': np.full(layers, Z_init)},
+        'Detritus': {'var_label': 'D', 'var_init': np.full(layers, D_init)},
+
+        # Vertical transport:
+        'K': {'mld': 'MLD', 'thickness': 'dz', 'kappa_ml': kappa_ml, 'kappa_deep': kappa_deep, 'width': width},
+        'Diffusion': {'vars_diffused': ['P', 'Z', 'D'], 'thickness': 'dz'},
+        'NutrientDiffusion': {'var': 'N', 'bottom': 'N0', 'thickness': 'dz'},
+        'Sinking': {'var': 'D', 'thickness': 'dz', 'rate': sinking_rate},
+
+        # Growth
+        'Growth': {'consumer': 'P', 'resource': 'N', 'mu_max': 1.},
+        'Nut_lim': {'resource': 'N', 'halfsat': .85},
+        'Light_lim': {'pigment_biomass': 'P', 'i_0': 'I0', 'thickness': 'dz',
+                      'kw': 0.04, 'kc': 0.03, 'alpha': 0.15, 'CtoChl': 75.},
+        'Temp_lim': {'temp': 'SST', 'VpMax': 2.5},
+
+        # Grazing
+        'Grazing': {'grazing_routing': ['P', 'D', 'Z', 'D', 'N'], 'feed_prefs': [.67, .33], 'Imax': 1., 'kZ': .6,
+                    'epsilon': 0.75, 'beta': 0.69},
+
+        # Mortality
+        'PhytoLinMortality': {'source': 'P', 'sink': 'D', 'rate': 0.015},
+        'PhytoQuadMortality': {'source': 'P', 'sink': 'D', 'rate': 0.025},
+        'ZooLinMortality': {'source': 'Z', 'sink': 'D', 'rate': 0.02},
+        'HigherOrderPred': {'var': 'Z', 'rate': 0.34},
+        'DetRemineralisation': {'source': 'D', 'sink': 'N', 'rate': 0.06},
+
+        # Forcings
+        'Irradiance': {'station': station, 'I0_label': 'I0'},
+        'Forcings': {'station': station, 'MLD_label': 'MLD', 'SST_label': 'SST',
+                     'MLDderiv_label': 'MLDderiv', 'N0_label': 'N0'},
+    }
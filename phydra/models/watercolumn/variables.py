@@ -0,0 +1,53 @@
+import attr
+import xsimlab as xs
+import xso
+
+from ...forcing import ConstantForcing
+
+
+@xso.component
+class LayeredSV:
+    """XSO component to define a state variable in the model,
+    as an array of concentrations in the layers of the water column, along the 'depth' dimension."""
+    var = xso.variable(dims='depth', description='state variable per layer', attrs={'units': 'µM N'})
+
+
+@xso.component
+class VerticalGrid:
+    """XSO component defining the layers of the water column.
+
+    The 'depth' dimension is labeled by the depth of the layer midpoints, the thickness of
+    the layers is provided as forcing, to be shared by all components that transport
+    or attenuate along depth."""
+    depth = xso.index(dims='depth', description='depth of layer midpoints',
+                      attrs={'units': 'm', 'long_name': 'Depth of layer midpoints', 'positive': 'down'})
+    thickness = xso.forcing(setup_func='thickness_setup', dims=[(), 'depth'], description='thickness of layers',
+                            attrs={'units': 'm'})
+
+    layer_thickness = xso.parameter(dims='depth', description='thickness of each layer, units: m')
+
+    def thickness_setup(self, layer_thickness):
+        """Returns constant forcing of the layer thickness."""
+        return ConstantForcing(layer_thickness)
+
+
+def along_depth(component):
+    """Returns component of the slab ocean, whose inputs and outputs along 'station' are
+    along 'depth' instead, so that it is evaluated per layer of the water column.
+
+    Fluxes of the slab ocean components are vectorized over stations, and evaluated
+    element-wise over layers in the same way. xarray-simlab allows a single dimension label
+    per number of dimensions, so the dimension is replaced in a subclass of the component,
+    which keeps its flux functions, Jacobians and compiled kernels, see phydra.compiled."""
+    replaced = {}
+    for field in attr.fields(component):
+        # only variables have dims, not groups and foreign variables of xarray-simlab:
+        dims = field.metadata.get('dims', ())
+        if not any('station' in d for d in dims):
+            continue
+        replaced[field.name] = xs.variable(
+            dims=[tuple('depth' if dim == 'station' else dim for dim in d) for d in dims],
+            intent=field.metadata['intent'].value, groups=field.metadata.get('groups'), default=field.default,
+            static=field.metadata.get('static', False), description=field.metadata.get('description', ''),
+            attrs=field.metadata.get('attrs'), encoding=field.metadata.get('encoding'))
+    return xs.process(type(component.__name__, (component,), replaced))
@@ -0,0 +1,154 @@
+"""Streaming output of long XSO model runs to chunked Zarr or NetCDF stores.
+
+Model runs keep the full output dataset in memory, including every flux variable, which adds up
+to gigabytes for decade-long daily runs of NPxZxSizeBased with many size classes. Here the model
+is run in windows of fixed length, restarting each window from the final state of the previous one,
+and the output of each window is written to the store before the next window is integrated,
+so that peak memory is bounded by the window length rather than the run length::
+
+    write_run(NPxZxSizeBased, model_setup, 'sizebased_out.zarr', window=365, dtype='float32')
+    model_out = xr.open_zarr('sizebased_out.zarr')
+
+Zarr stores are appended along 'time' with one chunk per window. NetCDF output is written as
+one file per window into a directory, to be opened with xarray.open_mfdataset.
+Zarr and the NetCDF libraries are only imported when writing to the store.
+"""
+import importlib.util
+import os
+import warnings
+
+import numpy as np
+
+from .windows import run_windows
+
+
+def output_variables(model, model_out, variables=None):
+    """Returns names of output variables along dimension 'time' of model_out, i.e. state variables,
+    flux values and forcing values, excluding inputs of the model setup.
+    If variables is given, checks that all of them are such output variables."""
+    input_vars = {f'{process}__{name}' for process, name in model.input_vars}
+    available = [var for var in model_out.data_vars if 'time' in model_out[var].dims and var not in input_vars]
+    if variables is None:
+        return available
+    unknown = set(variables) - set(available)
+    if unknown:
+        raise ValueError(f"Variables {sorted(unknown)} are not output variables of the model along 'time'")
+    return list(variables)
+
+
+def window_encoding(window_out, variables, format, dtype, compression):
+    """Returns encoding of the variables written per window, with down-casting of floating point
+    variables to dtype and compression, chunked by window along 'time' for Zarr stores."""
+    encoding = {}
+    for var in variables:
+        var_encoding = {}
+        if dtype is not None and np.issubdtype(window_out[var].dtype, np.floating):
+            var_encoding['dtype'] = dtype
+        if format == 'zarr':
+            import numcodecs
+
+            var_encoding['chunks'] = window_out[var].shape
+            var_encoding['compressor'] = numcodecs.Blosc(cname='zstd', clevel=5, shuffle=numcodecs.Blosc.SHUFFLE) \
+                if compression else None
+        elif compression:
+            var_encoding.update({'zlib': True, 'complevel': 4})
+        encoding[var] = var_encoding
+    return encoding
+
+
+def truncate_zarr(path, length):
+    """Truncates all variables along 'time' of the Zarr store at path to length time steps."""
+    import zarr
+
+    group = zarr.open_group(path, mode='r+')
+    for name, array in group.arrays():
+        dims = array.attrs.get('_ARRAY_DIMENSIONS', [])
+        if 'time' in dims and array.shape[dims.index('time')] > length:
+            shape = list(array.shape)
+            shape[dims.index('time')] = length
+            array.resize(*shape)
+    zarr.consolidate_metadata(path)
+
+
+def netcdf_engine(compression):
+    """Returns the xarray engine NetCDF files are written with and whether they are compressed.
+
+    Compression needs netCDF4 or h5netcdf. Without either, files are written uncompressed
+    with the NetCDF3 writer of scipy, with a warning."""
+    if not compression:
+        return None, False
+    for engine, module in (('netcdf4', 'netCDF4'), ('h5netcdf', 'h5netcdf')):
+        if importlib.util.find_spec(module) is not None:
+            return engine, True
+    warnings.warn("Compression of NetCDF files requires netCDF4 or h5netcdf, writing uncompressed files "
+                  "with scipy instead")
+    return 'scipy', False
+
+
+def write_run(model, model_setup, path, window=365, variables=None, format='zarr', dtype=None,
+              compression=True, checkpoint=None):
+    """Runs model setup in windows of fixed length, writing the output of each window to path.
+
+    Windows are run by phydra.windows.run_windows, the written output has the same time steps as
+    a single run of the model setup.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model, e.g. NPxZxSizeBased.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining all inputs, the solver and the output time.
+    path : str
+        Path of the Zarr store, or of the directory of NetCDF files 'window_00000.nc', ...
+        Existing stores are overwritten.
+    window : int
+        Number of time steps per window, the chunk length along 'time' of the written variables.
+    variables : list of str, optional
+        Output variables along 'time' to write, e.g. ['Phytoplankton__biomass', 'Grazing__grazing_value'],
+        defaults to all state variables, flux values and forcing values. Inputs of the model setup
+        are written with the first window, and to each NetCDF file.
+    format : {'zarr', 'netcdf'}
+        Format of the store. Compression of NetCDF files requires netCDF4 or h5netcdf,
+        without either files are written uncompressed, see netcdf_engine.
+    dtype : str, optional
+        Data type floating point variables are down-cast to in the store, e.g. 'float32'.
+    compression : bool
+        If True, variables are compressed with Blosc Zstandard for Zarr, or zlib for NetCDF.
+    checkpoint : phydra.checkpoint.Checkpoint, optional
+        Checkpoint of the run, if the checkpoint file exists the run resumes from it and continues
+        writing to the existing store.
+
+    Returns
+    -------
+    str
+        Path of the written store.
+    """
+    if format not in ('zarr', 'netcdf'):
+        raise ValueError("format needs to be 'zarr' or 'netcdf'")
+    if format == 'netcdf':
+        os.makedirs(path, exist_ok=True)
+        engine, compression = netcdf_engine(compression)
+    restored = checkpoint.load() if checkpoint is not None else None
+    if format == 'zarr' and restored is not None:
+        # windows written after the checkpoint are written again:
+        truncate_zarr(path, restored['first'])
+
+    for first, window_out in run_windows(model, model_setup, window, checkpoint):
+        window_vars = output_variables(model, window_out, variables)
+        if first == 0 or format == 'netcdf':
+            window_out = window_out.drop_dims('clock', errors='ignore')
+            window_out = window_out.drop_vars([var for var in window_out.data_vars if 'time' in window_out[var].dims
+                                               and var not in window_vars])
+        else:
+            window_out = window_out[window_vars]
+        encoding = window_encoding(window_out, window_vars, format, dtype, compression)
+
+        if format == 'zarr' and first == 0:
+            window_out.to_zarr(path, mode='w', encoding=encoding, consolidated=True)
+        elif format == 'zarr':
+            window_out.to_zarr(path, append_dim='time', consolidated=True)
+        else:
+            window_out.to_netcdf(os.path.join(path, f'window_{first // window:05d}.nc'), encoding=encoding,
+                                 engine=engine)
+
+    return path
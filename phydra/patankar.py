@@ -0,0 +1,255 @@
+"""Positivity-preserving integration of XSO models by a modified Patankar-Runge-Kutta scheme.
+
+Fluxes of XSO components are routed to variables with a sign, declared by negative=True or False,
+so the model function is a production-destruction system: every flux value removes mass from the
+variables it is routed to with negative sign, and adds it to those with positive sign. The
+'solve_ivp_MPRK22' solver integrates this system with the second order MPRK22 scheme of Kopecz and
+Meister (2018), which weights each flux by the ratio of the new to the old value of its donor
+variable. Each stage is then a linear system, whose solution stays positive for any step size.
+
+Per value of a flux, the donor is the only variable the value is subtracted from, after
+accounting for the sign of the value, e.g. the resource of MonodGrowth, or the source of
+LinearExchange. The value is weighted by the donor for all variables it is routed to, so
+the transfer conserves mass exactly. Values without donor, e.g. inputs from forcings, are
+integrated explicitly. Values subtracted from several variables are weighted by each of them
+separately, as are transfers that components return as separate fluxes, e.g. the grazing loss
+and assimilation of NPxZxSizeBased. These remain positive, with mass conserved to the order of
+the scheme. The same holds for fused components returning losses as negative values of a flux
+routed with positive sign, e.g. HollingTypeIII_GrossGrowthEfficiency of NPZDWaterColumn: each
+value is routed to a single variable, so losses are weighted by their donor and gains are explicit.
+"""
+import numpy as np
+from scipy import sparse as sp
+from scipy.optimize import OptimizeResult
+from scipy.sparse.linalg import spsolve
+
+from xso.solvers import IVPSolver
+
+from .solvers import initial_state, store_solution
+
+# systems of more variables are solved with sparse matrices:
+SPARSE_SIZE = 200
+
+
+def routing_matrix(model):
+    """Returns sparse matrix routing the flat array of all flux values to the time derivatives
+    of variables of an assembled XSO model, in the same way as the XSO model function.
+
+    Rows are the entries of variables in the state vector, columns the entries of flux values,
+    ordered as the time integrals of fluxes following the variables in the state vector."""
+    offsets, sizes = {}, {}
+    size = 0
+    for key, dims in model.full_model_dims.items():
+        sizes[key] = int(np.prod(dims)) if dims is not None else 1
+        offsets[key] = size
+        size += sizes[key]
+    num_vars = sum(sizes[var] for var in model.variables)
+
+    rows, columns, signs = [], [], []
+
+    def route(var_label, flux_label, flux_entries, negative):
+        """Routes entries of a flux value to a variable, summed for scalar variables, and
+        broadcast for single entries routed to array variables."""
+        var_rows = offsets[var_label] + np.arange(sizes[var_label])
+        flux_columns = offsets[flux_label] - num_vars + np.asarray(flux_entries)
+        if sizes[var_label] == 1:
+            var_rows = np.repeat(var_rows, np.size(flux_columns))
+        elif np.size(flux_columns) == 1:
+            flux_columns = np.repeat(flux_columns, sizes[var_label])
+        elif sizes[var_label] != np.size(flux_columns):
+            raise ValueError(f"Flux {flux_label} of size {np.size(flux_columns)} can not be routed "
+                             f"to variable {var_label} of size {sizes[var_label]}")
+        rows.append(var_rows)
+        columns.append(flux_columns)
+        signs.append(np.full(np.size(var_rows), -1. if negative else 1.))
+
+    for var_label in model.variables:
+        for flux_var_dict in model.fluxes_per_var.get(var_label, []):
+            flux_label, negative, list_input = flux_var_dict.values()
+            route(var_label, flux_label, np.arange(sizes[flux_label]), negative)
+
+    for flux_var_dict in model.fluxes_per_var.get("list_input", []):
+        flux_label, negative, list_input = flux_var_dict.values()
+        if len(list_input) == sizes[flux_label]:
+            for i, var_label in enumerate(list_input):
+                route(var_label, flux_label, [i], negative)
+        else:
+            index = 0
+            for var_label in list_input:
+                route(var_label, flux_label, index + np.arange(sizes[var_label]), negative)
+                index += sizes[var_label]
+
+    return sp.csr_matrix((np.concatenate(signs), (np.concatenate(rows), np.concatenate(columns))),
+                         shape=(num_vars, size - num_vars))
+
+
+class ProductionDestruction:
+    """Production-destruction form of the model function of an assembled XSO model.
+
+    Called with flux values and the Patankar weights sigma, returns the implicit contributions of
+    flux values to variables as rows, columns and coefficients of a matrix, weighted by the new value
+    of their donor over sigma, the explicit contributions of values without donor, and the donor
+    of each flux value, or -1.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        routing = routing_matrix(model).tocoo()
+        self.rows, self.columns, self.signs = routing.row, routing.col, routing.data
+        self.num_vars, self.num_fluxes = routing.shape
+
+    def flux_values(self, time, current_state):
+        """Returns flat array of all flux values at time and current_state."""
+        return self.model.model_function(time=time, current_state=current_state)[self.num_vars:]
+
+    def __call__(self, values, sigma):
+        contributions = self.signs * values[self.columns]
+        losses = contributions < 0
+        num_donors = np.bincount(self.columns[losses], minlength=self.num_fluxes)
+        donors = np.full(self.num_fluxes, -1)
+        donors[self.columns[losses]] = self.rows[losses]
+        donors[num_donors != 1] = -1
+
+        # single donor: all contributions of the value are weighted by the donor,
+        # several donors: losses are weighted by each variable itself, gains are explicit:
+        weighted_by = np.where(num_donors[self.columns] == 1, donors[self.columns],
+                               np.where(losses & (num_donors[self.columns] > 1), self.rows, -1))
+        implicit = weighted_by >= 0
+        columns = weighted_by[implicit]
+        # values of empty donors are not transferred:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coefficients = np.where(sigma[columns] > 0, contributions[implicit] / sigma[columns], 0.)
+
+        explicit = np.bincount(self.rows[~implicit], weights=contributions[~implicit], minlength=self.num_vars)
+        return (self.rows[implicit], columns, coefficients), explicit, donors
+
+
+class PatankarIVPSolver(IVPSolver):
+    """Solver backend integrating the model by the modified Patankar-Runge-Kutta scheme MPRK22,
+    keeping all variables positive and conserving mass transferred between variables by fluxes,
+    see module docstring.
+
+    The step size is adapted by comparison with the embedded first order modified Patankar-Euler
+    scheme, as in solve_ivp, or fixed. Steps end at each output time, so that output intervals
+    limit the step; for multi-day steps, model time is set with multi-day intervals. Fixed steps
+    keep variables positive, but not necessarily accurate: the oscillations of NPxZxSizeBased
+    are resolved only with steps well below a day.
+
+    Parameters
+    ----------
+    step : float, optional
+        Fixed step, each output time step is divided into equal steps no longer than step.
+        Defaults to adaptive steps.
+    rtol, atol : float
+        Relative and absolute tolerance of adaptive steps.
+    first_step : float, optional
+        Initial step of adaptive steps, defaults to the first output time step.
+    max_step : float
+        Longest adaptive step.
+    sparse : bool, optional
+        If True, the linear systems are solved with sparse matrices, defaults to True for models
+        of more than SPARSE_SIZE variable entries, e.g. NPZDWaterColumn.
+    """
+
+    def __init__(self, step=None, rtol=1e-3, atol=1e-6, first_step=None, max_step=np.inf, sparse=None):
+        super().__init__()
+        self.step = step
+        self.rtol = rtol
+        self.atol = atol
+        self.first_step = first_step
+        self.max_step = max_step
+        self.sparse = sparse
+        self.solution = None
+
+    def solve_linear(self, implicit, h, rhs):
+        """Returns solution of (I - h A) y = rhs, for the matrix A given by rows, columns
+        and coefficients of implicit contributions, with repeated entries summed."""
+        rows, columns, coefficients = implicit
+        size = np.size(rhs)
+        if self.sparse:
+            diagonal = np.arange(size)
+            system = sp.csc_matrix((np.concatenate((np.ones(size), - h * coefficients)),
+                                    (np.concatenate((diagonal, rows)), np.concatenate((diagonal, columns)))),
+                                   shape=(size, size))
+            return spsolve(system, rhs)
+        system = np.eye(size) - h * np.bincount(rows * size + columns, weights=coefficients,
+                                                minlength=size * size).reshape(size, size)
+        return np.linalg.solve(system, rhs)
+
+    def mprk22_step(self, pds, time, state, h, values=None):
+        """Returns state advanced by a step h of MPRK22 from time, the state after the first stage,
+        a first order estimate, and the flux values at time, reused after rejected steps."""
+        num_vars = pds.num_vars
+        variables = state[:num_vars]
+        if values is None:
+            values = pds.flux_values(time, state)
+
+        implicit, explicit, _ = pds(values, variables)
+        stage = state.copy()
+        stage[:num_vars] = self.solve_linear(implicit, h, variables + h * explicit)
+
+        mean_values = (values + pds.flux_values(time + h, stage)) / 2
+        implicit, explicit, donors = pds(mean_values, stage[:num_vars])
+        new = state.copy()
+        new[:num_vars] = self.solve_linear(implicit, h, variables + h * explicit)
+
+        # time integrals of flux values, as transferred with the weights of donors:
+        sigma = stage[:num_vars][donors]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = np.where(donors < 0, 1., np.where(sigma > 0, new[:num_vars][donors] / sigma, 0.))
+        new[num_vars:] += h * mean_values * weights
+        return new, stage, values
+
+    def error_norm(self, new, stage, old, num_vars):
+        """Returns RMS norm of the difference of the second and first order estimates,
+        scaled by the tolerances."""
+        scale = self.atol + self.rtol * np.maximum(np.abs(new[:num_vars]), np.abs(old[:num_vars]))
+        return np.sqrt(np.mean(((new[:num_vars] - stage[:num_vars]) / scale) ** 2))
+
+    def integrate_interval(self, pds, start, stop, state, h):
+        """Returns state advanced from start to stop with adaptive steps, starting with step h,
+        and the step proposed for the next interval."""
+        time = start
+        values = None
+        while time < stop:
+            shortened = stop - time < h
+            step = stop - time if shortened else h
+            new, stage, values = self.mprk22_step(pds, time, state, step, values)
+            error = self.error_norm(new, stage, state, pds.num_vars)
+            factor = min(5., max(0.2, 0.9 * error ** -0.5)) if error > 0 else 5.
+            if error <= 1.:
+                time = stop if shortened else time + step
+                state, values = new, None
+                # steps shortened to end at stop do not limit the next proposed step:
+                h = max(h, step * factor) if shortened else step * factor
+            else:
+                h = step * factor
+                if h < 1e-12 * max(abs(time), 1.):
+                    raise RuntimeError(f"Step size of MPRK22 became too small at time {time}")
+            h = min(h, self.max_step)
+        return state, h
+
+    def solve(self, model, time_step):
+        """Solve model by MPRK22 between all points of model.time."""
+        full_init = initial_state(self)
+
+        pds = ProductionDestruction(model)
+        if self.sparse is None:
+            self.sparse = pds.num_vars > SPARSE_SIZE
+
+        time = np.asarray(model.time, dtype=float)
+        state = np.asarray(full_init, dtype=float)
+        states = [state]
+        h = self.first_step or (time[1] - time[0] if np.size(time) > 1 else 1.)
+        for start, stop in zip(time[:-1], time[1:]):
+            if self.step is None:
+                state, h = self.integrate_interval(pds, start, stop, state, h)
+            else:
+                substeps = max(int(np.ceil((stop - start) / self.step - 1e-9)), 1)
+                for i in range(substeps):
+                    state = self.mprk22_step(pds, start + i * (stop - start) / substeps, state,
+                                             (stop - start) / substeps)[0]
+            states.append(state)
+
+        self.solution = OptimizeResult(t=time, y=np.stack(states, axis=-1), success=True)
+        store_solution(model, self.solution, time_step)
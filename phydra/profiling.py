@@ -0,0 +1,193 @@
+"""Opt-in profiling of XSO model runs.
+
+RunProfiler is an xarray-simlab runtime hook, that instruments the assembled model backend
+after initialization, i.e. right before the solver starts. It replaces the model function,
+all flux functions and all forcing functions of the run by wrappers recording call counts and
+cumulative wall time, and counts accepted and rejected steps of solvers with a 'method' attribute,
+e.g. the solvers of phydra.solvers. Without the hook nothing is wrapped, so runs that are not
+profiled are unaffected::
+
+    with RunProfiler() as profiler:
+        model_out = model_setup.xsimlab.run(model=NPZDSlabOcean)
+    profiler.report()
+
+Fluxes evaluated outside of Python, e.g. by the 'solve_ivp_numba' solver, are not recorded.
+The built-in 'solve_ivp' solver does not expose step statistics, for its runs only RHS
+evaluations are recorded.
+"""
+import time as tm
+
+import numpy as np
+import pandas
+import xsimlab as xs
+
+# attributes of forcing functions read by solvers, kept on wrapped forcings:
+FORCING_ATTRIBUTES = ('breakpoints', 'period')
+
+
+def unwrap_profiled(func):
+    """Returns function wrapped by RunProfiler, or func if it is not wrapped."""
+    return getattr(func, 'profiled_function', func)
+
+
+class CallTimer:
+    """Records number of calls and cumulative wall time of a function."""
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.
+
+    def wrap(self, func):
+        """Returns wrapper of func recording its calls, keeping attributes read by solvers."""
+        def profiled(*args, **kwargs):
+            start = tm.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.time += tm.perf_counter() - start
+                self.calls += 1
+
+        profiled.profiled_function = func
+        for attribute in FORCING_ATTRIBUTES:
+            if hasattr(func, attribute):
+                setattr(profiled, attribute, getattr(func, attribute))
+        return profiled
+
+
+def counting_method(method, counts):
+    """Returns subclass of the solve_ivp method, that adds the number of accepted and rejected
+    steps of each integration to dict counts. Rejected steps are only counted for Runge-Kutta methods,
+    where each attempted step takes n_stages evaluations of the model function."""
+    # phydra.solvers imports phydra.jacobian, which imports this module:
+    from .solvers import IVP_METHODS
+
+    base = IVP_METHODS[method] if isinstance(method, str) else method
+    runge_kutta = hasattr(base, 'n_stages')
+
+    class CountingMethod(base):
+        def _step_impl(self):
+            nfev = self.nfev
+            success, message = super()._step_impl()
+            if success:
+                counts['accepted_steps'] += 1
+                if runge_kutta:
+                    counts['rejected_steps'] += (self.nfev - nfev) // self.n_stages - 1
+            return success, message
+
+    CountingMethod.__name__ = CountingMethod.__qualname__ = base.__name__
+    return CountingMethod
+
+
+class RunProfiler(xs.RuntimeHook):
+    """Runtime hook recording RHS evaluations, solver steps and the cost of
+    each flux and forcing function of XSO model runs.
+
+    Statistics are accumulated over all runs with the hook, e.g. over batch runs.
+
+    Attributes
+    ----------
+    timers : dict
+        CallTimer of the model function and each flux and forcing function,
+        keyed by ('model', 'model_function'), ('flux', label) and ('forcing', label).
+    statistics : dict
+        Solver statistics: 'rhs_evaluations', 'accepted_steps', 'rejected_steps',
+        'jacobian_evaluations', 'lu_decompositions' and 'solve_time' (seconds).
+        Statistics that the solver does not expose are None.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.timers = {}
+        self.statistics = {'rhs_evaluations': 0, 'accepted_steps': None, 'rejected_steps': None,
+                           'jacobian_evaluations': None, 'lu_decompositions': None, 'solve_time': 0.}
+        self.runs = 0
+        self._step_counts = None
+        self._solve_start = None
+        self._rhs_calls = 0
+
+    def timer(self, kind, label):
+        return self.timers.setdefault((kind, label), CallTimer())
+
+    @xs.runtime_hook('initialize', 'model', 'post')
+    def instrument(self, model, context, state):
+        """Wraps model function, flux and forcing functions of the assembled model backend."""
+        core = state[('Core', 'core')]
+        backend = core.model
+
+        rhs_timer = self.timer('model', 'model_function')
+        self._rhs_calls = rhs_timer.calls
+        backend.model_function = rhs_timer.wrap(backend.model_function)
+        for label, flux in backend.fluxes.items():
+            backend.fluxes[label] = self.timer('flux', label).wrap(flux)
+        for label, func in backend.forcing_func.items():
+            backend.forcing_func[label] = self.timer('forcing', label).wrap(func)
+
+        solver = core.solver
+        if getattr(solver, 'method', None) is not None:
+            self._step_counts = {'accepted_steps': 0, 'rejected_steps': 0}
+            solver.method = counting_method(solver.method, self._step_counts)
+        self._solve_start = tm.perf_counter()
+
+    @xs.runtime_hook('finalize', 'model', 'pre')
+    def collect(self, model, context, state):
+        """Adds solver statistics of the finished run."""
+        statistics = self.statistics
+        statistics['solve_time'] += tm.perf_counter() - self._solve_start
+        self.runs += 1
+
+        solution = getattr(state[('Core', 'core')].solver, 'solution', None)
+        if solution is not None:
+            statistics['rhs_evaluations'] += int(solution.nfev)
+            for key, field in (('jacobian_evaluations', 'njev'), ('lu_decompositions', 'nlu')):
+                statistics[key] = (statistics[key] or 0) + int(getattr(solution, field, 0))
+        else:
+            statistics['rhs_evaluations'] += self.timers[('model', 'model_function')].calls - self._rhs_calls
+
+        solver = state[('Core', 'core')].solver
+        if self._step_counts is not None:
+            statistics['accepted_steps'] = (statistics['accepted_steps'] or 0) + self._step_counts['accepted_steps']
+            if hasattr(solver.method, 'n_stages'):
+                statistics['rejected_steps'] = (statistics['rejected_steps'] or 0) + \
+                                               self._step_counts['rejected_steps']
+            self._step_counts = None
+
+    def report(self):
+        """Returns table of call counts and cumulative wall time of the model function
+        and each flux and forcing function, sorted by total time.
+
+        The model function row includes the time of fluxes and forcings called from it,
+        the row 'routing' is the remaining time spent in the model function itself."""
+        rows = [{'kind': kind, 'label': label, 'calls': timer.calls, 'total_time': timer.time,
+                 'time_per_call': timer.time / timer.calls if timer.calls else np.nan}
+                for (kind, label), timer in self.timers.items()]
+        model_function = self.timers.get(('model', 'model_function'))
+        if model_function is not None:
+            inner = sum(timer.time for (kind, label), timer in self.timers.items() if kind != 'model')
+            rows.append({'kind': 'model', 'label': 'routing', 'calls': model_function.calls,
+                         'total_time': max(model_function.time - inner, 0.),
+                         'time_per_call': np.nan})
+        table = pandas.DataFrame(rows, columns=['kind', 'label', 'calls', 'total_time', 'time_per_call'])
+        table['fraction'] = table['total_time'] / self.statistics['solve_time'] if self.runs else np.nan
+        return table.sort_values('total_time', ascending=False).set_index(['kind', 'label'])
+
+    def summary(self):
+        """Returns dict of solver statistics with 'profile_' prefix, statistics not
+        exposed by the solver are omitted, as used for attributes of output datasets."""
+        return {f'profile_{key}': value for key, value in self.statistics.items() if value is not None}
+
+
+def profile_run(model_setup, model, **kwargs):
+    """Runs model setup with RunProfiler, additional keyword arguments are passed to xsimlab.run.
+
+    Returns
+    -------
+    model_out : xarray.Dataset
+        Model output, with solver statistics as attributes, e.g. 'profile_rhs_evaluations'.
+    report : pandas.DataFrame
+        Calls and cumulative wall time of model function, fluxes and forcings, see RunProfiler.report.
+    """
+    profiler = RunProfiler()
+    hooks = list(kwargs.pop('hooks', [])) + [profiler]
+    model_out = model_setup.xsimlab.run(model=model, hooks=hooks, **kwargs)
+    model_out.attrs.update(profiler.summary())
+    return model_out, profiler.report()
@@ -0,0 +1,245 @@
+"""On-the-fly reductions of XSO model outputs.
+
+Analyses of model runs typically reduce the output straight away, e.g. the mean and standard deviation
+of the summed phytoplankton biomass over the last year of NPxZxSizeBased runs. Here reductions are
+declared per output variable and accumulated window by window during the run, see
+phydra.windows.run_windows, so that only the reduced arrays are kept::
+
+    reductions = {'P_last_year': TimeReduction('Phytoplankton__biomass', ('mean', 'std'),
+                                               sum_dims='phyto', last=365),
+                  'P_annual': AnnualReduction('Phytoplankton__biomass', 'mean'),
+                  'N_monthly': ClimatologyReduction('Nutrient__value', 'mean'),
+                  'Z_last_year': LastValues('Zooplankton__biomass', last=365)}
+    reduced_out = reduce_run(NPxZxSizeBased, model_setup, reductions)
+
+Statistics are 'mean', 'std', 'min' and 'max' over time. Means and standard deviations of each
+window are combined with those of previous windows by the parallel algorithm of Chan et al.,
+without storing values of previous windows.
+"""
+import numpy as np
+import xarray as xr
+
+from .windows import run_windows
+
+STATISTICS = ('mean', 'std', 'min', 'max')
+
+
+class TimeReduction:
+    """Reduction of an output variable over time, in groups of time steps.
+
+    The base class reduces over all time steps of the run, or of the last time units of the run.
+
+    Parameters
+    ----------
+    var : str
+        Output variable along 'time', e.g. 'Phytoplankton__biomass'.
+    statistics : str or tuple of str
+        Statistics computed per group, of 'mean', 'std', 'min' and 'max'.
+    sum_dims : str or tuple of str, optional
+        Dimensions summed over before the reduction, e.g. 'phyto' for the total phytoplankton
+        biomass of all size classes.
+    last : float, optional
+        Only the time steps within the last time units of the run are reduced, e.g. 365 days.
+        The interval excludes its start, so that the last 365 days of a daily run are 365 time steps.
+    """
+    group_dim = None
+
+    def __init__(self, var, statistics='mean', sum_dims=None, last=None):
+        self.var = var
+        self.statistics = (statistics,) if isinstance(statistics, str) else tuple(statistics)
+        unknown = set(self.statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"Unknown statistics {sorted(unknown)}, available are {STATISTICS}")
+        self.sum_dims = (sum_dims,) if isinstance(sum_dims, str) else tuple(sum_dims or ())
+        self.last = last
+
+    def initialize(self, time):
+        """Sets up accumulators for the time of the run."""
+        self.time = np.asarray(time, dtype=float)
+        self.start = self.time[-1] - self.last if self.last is not None else -np.inf
+        groups = self.groups(self.time)
+        self.group_count = int(groups.max()) + 1 if np.size(groups) else 0
+        self.count = np.zeros(self.group_count)
+        self.dims = self.mean = self.m2 = self.min = self.max = None
+
+    def groups(self, time):
+        """Returns group index of each time step of the run."""
+        return np.zeros(np.size(time), dtype=int)
+
+    def group_coords(self):
+        """Returns coordinate of the group dimension."""
+        return None
+
+    def select(self, window_out):
+        """Returns values of the reduced variable in a window, summed over sum_dims, with time as first axis."""
+        data = window_out[self.var]
+        if self.sum_dims:
+            data = data.sum(self.sum_dims)
+        data = data.transpose('time', ...)
+        return data.dims[1:], data.values
+
+    def update(self, window_out):
+        """Accumulates statistics of the time steps of a window of the run."""
+        time = window_out['time'].values
+        dims, values = self.select(window_out)
+        if self.mean is None:
+            self.dims = dims
+            shape = (self.group_count, *values.shape[1:])
+            self.mean, self.m2 = np.zeros(shape), np.zeros(shape)
+            self.min, self.max = np.full(shape, np.inf), np.full(shape, -np.inf)
+
+        groups = self.groups(time)
+        included = time > self.start
+        for group in np.unique(groups[included]):
+            group_values = values[included & (groups == group)]
+            n, mean = len(group_values), group_values.mean(axis=0)
+            m2 = ((group_values - mean) ** 2).sum(axis=0)
+            # combination of mean and sum of squared deviations of two sets of values (Chan et al. 1979):
+            total = self.count[group] + n
+            delta = mean - self.mean[group]
+            self.mean[group] += delta * n / total
+            self.m2[group] += m2 + delta ** 2 * self.count[group] * n / total
+            self.count[group] = total
+            self.min[group] = np.minimum(self.min[group], group_values.min(axis=0))
+            self.max[group] = np.maximum(self.max[group], group_values.max(axis=0))
+
+    def result(self, coords):
+        """Returns dict of DataArrays of the statistics, with the coordinates of the reduced dimensions."""
+        count = self.count.reshape((-1,) + (1,) * (self.mean.ndim - 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {'mean': np.where(count > 0, self.mean, np.nan),
+                      'std': np.where(count > 0, np.sqrt(self.m2 / count), np.nan),
+                      'min': np.where(count > 0, self.min, np.nan),
+                      'max': np.where(count > 0, self.max, np.nan)}
+        dims = self.dims
+        if self.group_dim is None:
+            values = {key: value[0] for key, value in values.items()}
+        else:
+            dims = (self.group_dim, *dims)
+        result_coords = {dim: coords[dim] for dim in dims if dim in coords}
+        if self.group_dim is not None:
+            result_coords[self.group_dim] = self.group_coords()
+        return {statistic: xr.DataArray(values[statistic], dims=dims, coords=result_coords)
+                for statistic in self.statistics}
+
+
+class AnnualReduction(TimeReduction):
+    """Reduction of an output variable per year of the run, along dimension 'year',
+    with years counted from the start of the run."""
+    group_dim = 'year'
+
+    def __init__(self, var, statistics='mean', sum_dims=None, last=None, period=365.):
+        super().__init__(var, statistics, sum_dims, last)
+        self.period = period
+
+    def groups(self, time):
+        return np.floor((time - self.time[0]) / self.period + 1e-9).astype(int)
+
+    def group_coords(self):
+        return np.arange(self.group_count)
+
+
+class ClimatologyReduction(TimeReduction):
+    """Climatological reduction of an output variable per month of the year over all years of the run,
+    along dimension 'month'. The year of length period is divided into bins of equal length."""
+    group_dim = 'month'
+
+    def __init__(self, var, statistics='mean', sum_dims=None, last=None, period=365., bins=12):
+        super().__init__(var, statistics, sum_dims, last)
+        self.period = period
+        self.bins = bins
+
+    def initialize(self, time):
+        super().initialize(time)
+        # all months are reported, also if the run is shorter than a year:
+        self.group_count = self.bins
+        self.count = np.zeros(self.bins)
+
+    def groups(self, time):
+        phase = np.mod(time - self.time[0], self.period) / self.period
+        return np.minimum(np.floor(phase * self.bins + 1e-9).astype(int), self.bins - 1)
+
+    def group_coords(self):
+        return np.arange(1, self.bins + 1)
+
+
+class LastValues:
+    """Values of an output variable over the last time units of the run, e.g. the last year.
+
+    Parameters
+    ----------
+    var : str
+        Output variable along 'time', e.g. 'Phytoplankton__biomass'.
+    last : float
+        Length of the period at the end of the run, in model time units. The period excludes its start,
+        so that the last 365 days of a daily run are 365 time steps.
+    sum_dims : str or tuple of str, optional
+        Dimensions summed over, e.g. 'phyto'.
+    """
+
+    def __init__(self, var, last, sum_dims=None):
+        self.var = var
+        self.last = last
+        self.sum_dims = (sum_dims,) if isinstance(sum_dims, str) else tuple(sum_dims or ())
+        self.values = []
+
+    def initialize(self, time):
+        self.start = np.asarray(time, dtype=float)[-1] - self.last
+        self.values = []
+
+    def update(self, window_out):
+        data = window_out[self.var].sel(time=window_out['time'] > self.start)
+        if self.sum_dims:
+            data = data.sum(self.sum_dims)
+        if data.sizes['time']:
+            self.values.append(data.drop_vars([coord for coord in data.coords if coord not in data.dims]))
+
+    def result(self, coords):
+        return {'values': xr.concat(self.values, dim='time')}
+
+
+def reduce_run(model, model_setup, reductions, window=365, checkpoint=None):
+    """Runs model setup in windows of fixed length, see phydra.windows.run_windows, accumulating
+    reductions of output variables during the run and returning only the reduced arrays.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model, e.g. NPxZxSizeBased.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining all inputs, the solver and the output time.
+    reductions : dict
+        Reductions keyed by name, instances of TimeReduction, AnnualReduction,
+        ClimatologyReduction or LastValues.
+    window : int
+        Number of time steps per window, bounding the memory of the unreduced output.
+    checkpoint : phydra.checkpoint.Checkpoint, optional
+        Checkpoint of the run, storing the accumulated reductions. If the checkpoint file exists,
+        the run resumes from it with the reductions of the checkpoint.
+
+    Returns
+    -------
+    xarray.Dataset
+        Reduced variables, named '{name}_{statistic}' for reductions with statistics,
+        and name for LastValues.
+    """
+    restored = checkpoint.load() if checkpoint is not None else None
+    if restored is not None:
+        reductions = restored['state']
+    else:
+        time = model_setup['Time__time_input'].values
+        for reduction in reductions.values():
+            reduction.initialize(time)
+
+    coords = {}
+    for first, window_out in run_windows(model, model_setup, window, checkpoint, state=reductions):
+        coords = {name: coord.values for name, coord in window_out.coords.items() if name not in ('time', 'clock')}
+        for reduction in reductions.values():
+            reduction.update(window_out)
+
+    data_vars = {}
+    for name, reduction in reductions.items():
+        for statistic, values in reduction.result(coords).items():
+            values.attrs['reduced_variable'] = reduction.var
+            data_vars[name if isinstance(reduction, LastValues) else f'{name}_{statistic}'] = values
+    return xr.Dataset(data_vars)
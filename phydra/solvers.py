@@ -0,0 +1,295 @@
+"""Additional solver backends for XSO models.
+
+XSO resolves solvers by name at model setup, so the solvers defined here
+are registered with the names in ``SOLVERS`` upon import of phydra, e.g.::
+
+    xso.setup(solver='solve_ivp_BDF', model=NPxZxSizeBased, ...)
+
+Further solvers, e.g. with other tolerances, are registered with register_solver.
+"""
+from collections import defaultdict
+from functools import partial
+
+import numpy as np
+import xsimlab as xs
+from scipy.integrate import solve_ivp, RK23, RK45, DOP853, Radau, BDF, LSODA
+from scipy.optimize import OptimizeResult
+
+import xso.core
+from xso.solvers import IVPSolver
+
+from .jacobian import ModelJacobian
+
+# methods of scipy.integrate.solve_ivp by name:
+IVP_METHODS = {'RK23': RK23, 'RK45': RK45, 'DOP853': DOP853, 'Radau': Radau, 'BDF': BDF, 'LSODA': LSODA}
+
+
+def initial_state(solver):
+    """Returns flat array of the initial values of all variables and flux integrals of
+    an XSO solver backend, as passed to the integrator."""
+    return np.concatenate([[v for val in solver.var_init.values() for v in val.ravel()],
+                           [v for val in solver.flux_init.values() for v in val.ravel()]], axis=None)
+
+
+def run_backend(model, model_setup):
+    """Runs model setup and returns the XSO core, containing the assembled model backend,
+    a dict mapping backend labels of variables and fluxes to the names of their output variables,
+    and the model output."""
+    store = {}
+
+    @xs.runtime_hook('initialize', 'model', 'post')
+    def get_core(model, context, state):
+        core = state[('Core', 'core')]
+        storage = {**core.model.variables, **core.model.flux_values}
+        store['core'] = core
+        # variables and flux values of the backend are stored in the output variables of components:
+        store['names'] = {label: f'{process}__{name}' for (process, name), value in state.items()
+                          for label, stored in storage.items() if value is stored}
+
+    model_out = model_setup.xsimlab.run(model=model, hooks=[get_core])
+    return store['core'], store['names'], model_out
+
+
+def store_solution(model, solution, time_step):
+    """Assigns solution of scipy.integrate.solve_ivp to the value storage of the XSO model,
+    in the same way as the built-in 'solve_ivp' solver."""
+    # round off 1e150-th decimal to remove floating point numerical errors
+    state_rows = [row for row in np.around(solution.y, decimals=150)]
+
+    # unpack and reshape state array to appropriate dimensions:
+    state_dict = defaultdict()
+    index = 0
+    for key, dims in model.full_model_dims.items():
+        if dims is None:
+            state_dict[key] = state_rows[index]
+            index += 1
+        else:
+            _length = int(np.prod(dims))
+            full_dims = (*np.atleast_1d(dims), np.size(model.time))
+            state_dict[key] = np.array(state_rows[index:index + _length]).reshape(full_dims)
+            index += _length
+
+    # assign solved model state to value storage in xsimlab framework:
+    for var_key, val in model.variables.items():
+        val[...] = state_dict[var_key]
+
+    # flux values are stored as time integrals, the output is the difference per time step:
+    for flux_key, val in model.flux_values.items():
+        difference = np.diff(state_dict[flux_key]) / time_step
+        val[...] = np.concatenate((difference[..., :1], difference), axis=-1)
+
+
+class ImplicitIVPSolver(IVPSolver):
+    """Solver backend using scipy.integrate.solve_ivp with an implicit method,
+    supplied with the analytic Jacobian of the model function.
+
+    Parameters
+    ----------
+    method : {'BDF', 'Radau', 'LSODA'}
+        Integration method of solve_ivp.
+    jacobian : bool
+        If True, the Jacobian assembled from the partial derivatives of components
+        is passed to the solver, otherwise it is estimated by solve_ivp with finite differences.
+    sparse : bool
+        If True, the Jacobian is supplied as sparse matrix, not supported by 'LSODA'.
+    **options
+        Additional keyword arguments passed to solve_ivp, e.g. rtol and atol.
+    """
+
+    def __init__(self, method='BDF', jacobian=True, sparse=False, **options):
+        super().__init__()
+        if sparse and method == 'LSODA':
+            raise ValueError("Method 'LSODA' does not support sparse Jacobians")
+        self.method = method
+        self.jacobian = jacobian
+        self.sparse = sparse
+        self.options = options
+        self.solution = None
+
+    def solve(self, model, time_step):
+        """Solve model using scipy.integrate.solve_ivp, passing model_function, initial values,
+        model.time and the Jacobian of the model function."""
+        full_init = initial_state(self)
+
+        jac = ModelJacobian(model, sparse=self.sparse) if self.jacobian else None
+
+        self.solution = solve_ivp(model.model_function,
+                                  t_span=[model.time[0], model.time[-1]],
+                                  y0=full_init,
+                                  t_eval=model.time,
+                                  method=self.method,
+                                  jac=jac,
+                                  **self.options)
+
+        store_solution(model, self.solution, time_step)
+
+
+def implicit_method(method):
+    """Returns True if the solve_ivp method, supplied by name or class, uses the Jacobian."""
+    if isinstance(method, str):
+        return method in ('BDF', 'Radau', 'LSODA')
+    return issubclass(method, (BDF, Radau, LSODA))
+
+
+def forcing_breakpoints(forcing_funcs, t_start, t_stop):
+    """Returns sorted discontinuity times of forcing functions within the open interval (t_start, t_stop).
+
+    Forcing functions expose discontinuities by the attributes 'breakpoints', an array of times,
+    and 'period'. Breakpoints of periodic forcings are given within one period and repeated
+    over the interval, see phydra.models.slabocean.forcings.set_breakpoints.
+    """
+    times = []
+    for func in forcing_funcs:
+        breakpoints = getattr(func, 'breakpoints', None)
+        if breakpoints is None or np.size(breakpoints) == 0:
+            continue
+        period = getattr(func, 'period', None)
+        if period:
+            first, last = np.floor(t_start / period), np.ceil(t_stop / period)
+            offsets = np.arange(first, last + 1) * period
+            breakpoints = (offsets[:, None] + np.asarray(breakpoints)[None, :]).ravel()
+        times.append(np.asarray(breakpoints, dtype=float))
+    if not times:
+        return np.array([])
+    times = np.unique(np.concatenate(times))
+    return times[(times > t_start) & (times < t_stop)]
+
+
+def solve_piecewise(fun, time, y0, breakpoints, **options):
+    """Integrates fun with scipy.integrate.solve_ivp over time, restarting the integration at each breakpoint.
+
+    Each segment between consecutive breakpoints is integrated separately, starting from the final
+    state of the previous segment, so that the solver never steps across a discontinuity of the
+    right-hand side. Values are returned at all points of time, as with t_eval in solve_ivp.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult
+        With fields t, y, nfev, njev, nlu, status, message and success as returned by solve_ivp,
+        summed over segments, and segments, the number of integrated segments.
+    """
+    bounds = np.concatenate([[time[0]], breakpoints, [time[-1]]])
+    y_segments = []
+    nfev = njev = nlu = 0
+    y_start = np.asarray(y0, dtype=float)
+
+    for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+        last = i == len(bounds) - 2
+        t_segment = time[(time >= start) & ((time <= stop) if last else (time < stop))]
+        # the end of the segment is evaluated as initial state of the next one:
+        t_eval = t_segment if last else np.append(t_segment, stop)
+
+        solution = solve_ivp(fun, t_span=[start, stop], y0=y_start, t_eval=t_eval, **options)
+        nfev, njev, nlu = nfev + solution.nfev, njev + solution.njev, nlu + solution.nlu
+        if not solution.success:
+            return OptimizeResult(t=time, y=None, nfev=nfev, njev=njev, nlu=nlu, status=solution.status,
+                                  message=f"Segment [{start}, {stop}]: {solution.message}", success=False,
+                                  segments=i + 1)
+
+        y_segments.append(solution.y[:, :np.size(t_segment)])
+        y_start = solution.y[:, -1]
+
+    return OptimizeResult(t=time, y=np.concatenate(y_segments, axis=1), nfev=nfev, njev=njev, nlu=nlu,
+                          status=0, message='The solver successfully reached the end of the integration interval.',
+                          success=True, segments=len(bounds) - 1)
+
+
+class PiecewiseIVPSolver(IVPSolver):
+    """Solver backend using scipy.integrate.solve_ivp, integrating piecewise between
+    the breakpoints of forcing functions, e.g. the knots of the interpolated monthly
+    forcing data of NPZDSlabOcean.
+
+    Adaptive solvers otherwise detect each discontinuity of the forcing by repeatedly
+    rejecting and shrinking steps across it. Each restart costs the selection of a new
+    initial step, so integrating piecewise pays off for implicit and multistep methods
+    and tight tolerances, e.g. 15-25 % fewer RHS evaluations with 'LSODA' or 'BDF' and rtol=1e-6
+    for NPZDSlabOcean, while 'RK45' with default tolerances takes more evaluations,
+    see benchmarks/breakpoints.py.
+
+    Parameters
+    ----------
+    method : str
+        Integration method of solve_ivp, defaults to 'RK45' as the built-in 'solve_ivp' solver.
+    jacobian : bool
+        If True and the method is implicit, the Jacobian assembled from the partial derivatives
+        of components is passed to the solver, see ImplicitIVPSolver.
+    **options
+        Additional keyword arguments passed to solve_ivp, e.g. rtol and atol.
+    """
+
+    def __init__(self, method='RK45', jacobian=False, **options):
+        super().__init__()
+        self.method = method
+        self.jacobian = jacobian
+        self.options = options
+        self.solution = None
+
+    def solve(self, model, time_step):
+        """Solve model using scipy.integrate.solve_ivp on each segment between forcing breakpoints."""
+        full_init = initial_state(self)
+
+        options = dict(self.options)
+        if self.jacobian and implicit_method(self.method):
+            options['jac'] = ModelJacobian(model)
+
+        breakpoints = forcing_breakpoints(model.forcing_func.values(), model.time[0], model.time[-1])
+        self.solution = solve_piecewise(model.model_function, np.asarray(model.time), full_init, breakpoints,
+                                        method=self.method, **options)
+        if not self.solution.success:
+            raise RuntimeError(f"Integration failed: {self.solution.message}")
+
+        store_solution(model, self.solution, time_step)
+
+
+def compiled_solver(**options):
+    """Returns solver using the numba-compiled model function, see phydra.compiled.
+    numba is imported only once the solver is used."""
+    from .compiled import CompiledIVPSolver
+    return CompiledIVPSolver(**options)
+
+
+def splitting_solver(**options):
+    """Returns solver integrating physics and biology by Strang splitting, see phydra.splitting."""
+    from .splitting import SplittingIVPSolver
+    return SplittingIVPSolver(**options)
+
+
+def patankar_solver(**options):
+    """Returns solver keeping variables positive by modified Patankar weights, see phydra.patankar."""
+    from .patankar import PatankarIVPSolver
+    return PatankarIVPSolver(**options)
+
+
+SOLVERS = {
+    'solve_ivp_BDF': partial(ImplicitIVPSolver, method='BDF'),
+    'solve_ivp_BDF_sparse': partial(ImplicitIVPSolver, method='BDF', sparse=True),
+    'solve_ivp_Radau': partial(ImplicitIVPSolver, method='Radau'),
+    'solve_ivp_Radau_sparse': partial(ImplicitIVPSolver, method='Radau', sparse=True),
+    'solve_ivp_LSODA': partial(ImplicitIVPSolver, method='LSODA'),
+    # tight tolerances, e.g. to compare consecutive cycles during spin-up:
+    'solve_ivp_LSODA_tight': partial(ImplicitIVPSolver, method='LSODA', rtol=1e-8, atol=1e-10),
+    'solve_ivp_numba': compiled_solver,
+    # integrating between discontinuities of forcings:
+    'solve_ivp_piecewise': PiecewiseIVPSolver,
+    'solve_ivp_LSODA_piecewise': partial(PiecewiseIVPSolver, method='LSODA', jacobian=True),
+    # physics by matrix exponential, biology by RK45, in Strang splitting steps:
+    'solve_ivp_split': splitting_solver,
+    # positive and conservative, for long steps, e.g. of size spectra:
+    'solve_ivp_MPRK22': patankar_solver,
+}
+
+def register_solver(name, factory):
+    """Registers solver with XSO, so that it can be selected by name at model setup.
+
+    Parameters
+    ----------
+    name : str
+        Name of the solver, e.g. passed to xso.setup(solver=name, ...).
+    factory : callable
+        Returns a new instance of the solver backend, e.g. a class or functools.partial.
+    """
+    xso.core._built_in_solvers[name] = factory
+
+
+for name, factory in SOLVERS.items():
+    register_solver(name, factory)
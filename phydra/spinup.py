@@ -0,0 +1,136 @@
+"""Spin-up of XSO models to a periodic steady state.
+
+Models forced by annual cycles, e.g. NPZDSlabOcean, or with constant forcing, e.g. NPxZxSizeBased,
+are typically run for several years, keeping only the last one. Here the model is integrated
+one period at a time, restarting each period from the final state of the previous one,
+until two consecutive cycles agree within a tolerance.
+
+The difference between cycles can only fall below the tolerance of the spin-up, if the
+integration error of the solver is well below it, e.g. by using the 'solve_ivp_LSODA_tight'
+solver. With the default tolerances of solve_ivp consecutive years of NPZDSlabOcean
+differ by a few percent, even after the model has converged.
+"""
+import numpy as np
+import xarray as xr
+
+from xso.xsimlabwrappers import update_setup
+
+
+def state_init_vars(model):
+    """Returns dict mapping output state variables of model to their initial value inputs,
+    e.g. {'Nutrient__var': 'Nutrient__var_init'}."""
+    init_vars = {}
+    for process, name in model.input_vars:
+        if name.endswith('_init'):
+            init_vars[f'{process}__{name[:-len("_init")]}'] = f'{process}__{name}'
+    return init_vars
+
+
+def setup_with_time(model, model_setup, time):
+    """Returns model setup with the time array time, with the solver of the setup.
+
+    Runs restarted from a previous state, e.g. by spin_up or phydra.windows.run_windows, are set up
+    by xso.xsimlabwrappers.update_setup, except for the 'stepwise' solver, whose setups use the time
+    array as clock 'time_input'. update_setup sets a separate clock 'clock' for these, which is not
+    synchronized with 'time_input', so the clock 'time_input' is replaced instead."""
+    solver = str(model_setup['Core__solver_type'].values)
+    if solver != 'stepwise':
+        return update_setup(model, model_setup, solver, new_time=time)
+    with model:
+        new_setup = model_setup.xsimlab.update_vars(input_vars={'Time__time_input': time})
+        return new_setup.xsimlab.update_clocks(clocks={'time_input': time}, master_clock='time_input')
+
+
+def cycle_residual(cycle, previous_cycle, state_vars, rtol, atol):
+    """Returns maximum difference between state variables of two cycles,
+    scaled by atol + rtol * abs(previous value). Cycles agree within tolerance if it is <= 1."""
+    residual = 0.
+    for var in state_vars:
+        current, previous = cycle[var].values, previous_cycle[var].values
+        scaled = np.abs(current - previous) / (atol + rtol * np.abs(previous))
+        residual = max(residual, float(np.nanmax(scaled)))
+    return residual
+
+
+def spin_up(model, model_setup, period=365., max_periods=50, rtol=1e-2, atol=1e-4):
+    """Runs model period by period, until the periodic steady state is reached.
+
+    Each period is integrated from the final state of the previous period, on the
+    time step of the model setup, with model time continuing across periods.
+    The run stops as soon as the state variables of two consecutive cycles
+    agree within the tolerance at every time step, i.e.:
+    abs(cycle - previous_cycle) <= atol + rtol * abs(previous_cycle)
+
+    Models that do not approach a cycle of the given period, e.g. NPxZxSizeBased
+    setups with persistent oscillations of size classes, stop after max_periods,
+    with attribute 'spinup_converged' set to 0.
+
+    Parameters
+    ----------
+    model : xsimlab.Model
+        XSO model, e.g. NPZDSlabOcean or NPxZxSizeBased.
+    model_setup : xarray.Dataset
+        Model setup created by xso.setup, defining initial values, solver and the start time
+        and time step of the spin-up. The time array of the setup needs at least 2 elements,
+        its total length is otherwise ignored.
+    period : float
+        Period of the cycle, in model time units. Has to be a multiple of the time step.
+    max_periods : int
+        Maximum number of periods to integrate, before the run is stopped without convergence.
+    rtol, atol : float
+        Relative and absolute tolerance of the difference between consecutive cycles.
+
+    Returns
+    -------
+    xarray.Dataset
+        Model output of the last cycle, excluding the end point of the period, so that it
+        has the same time steps as the last period of a longer model run, with the model time
+        of the last cycle as time coordinate.
+        Convergence diagnostics are stored as variable 'spinup_residual' along
+        dimension 'spinup_period', the scaled residual of each cycle to the previous cycle,
+        and attributes 'spinup_converged' and 'spinup_periods'.
+    """
+    setup_time = model_setup['Time__time_input'].values
+    if np.size(setup_time) < 2:
+        raise ValueError("Time array of model setup needs to contain at least 2 time steps")
+    time_step = setup_time[1] - setup_time[0]
+    steps_per_period = int(round(period / time_step))
+    if steps_per_period < 1 or not np.isclose(steps_per_period * time_step, period):
+        raise ValueError(f"Period {period} is not a multiple of the time step {time_step} of the model setup")
+    if max_periods < 1:
+        raise ValueError(f"max_periods needs to be at least 1, got {max_periods}")
+
+    init_vars = state_init_vars(model)
+
+    start = setup_time[0]
+    current_setup = model_setup
+    previous_cycle = None
+    residuals = []
+    converged = False
+
+    for i in range(max_periods):
+        time = start + np.arange(steps_per_period + 1) * time_step
+        current_setup = setup_with_time(model, current_setup, time)
+        model_out = current_setup.xsimlab.run(model=model)
+
+        # the end point is the initial state of the next period:
+        cycle = model_out.isel(time=slice(0, -1)).assign_coords(time=time[:-1])
+        if previous_cycle is not None:
+            residuals.append(cycle_residual(cycle, previous_cycle, init_vars, rtol, atol))
+            if residuals[-1] <= 1.:
+                converged = True
+                break
+
+        with model:
+            current_setup = current_setup.xsimlab.update_vars(
+                input_vars={init: model_out[var].isel(time=-1).values for var, init in init_vars.items()})
+        previous_cycle = cycle
+        start = time[-1]
+
+    cycle = cycle.assign(spinup_residual=xr.DataArray(residuals, dims='spinup_period',
+                                                      coords={'spinup_period': np.arange(2, len(residuals) + 2)},
+                                                      attrs={'description': 'maximum scaled difference of state '
+                                                                            'variables to the previous cycle'}))
+    cycle.attrs.update({'spinup_converged': int(converged), 'spinup_periods': i + 1,
+                        'spinup_rtol': rtol, 'spinup_atol': atol})
+    return cycle
@@ -0,0 +1,197 @@
+"""Operator splitting of XSO models into physics and biology.
+
+Physical transport terms, e.g. mixing and sinking of NPZDSlabOcean or vertical diffusion of
+NPZDWaterColumn, are linear in the model state, but become stiff for shallow mixed layers or thin
+layers, which limits the step of explicit solvers for the whole model. Flux components are tagged
+as physics with the class decorator physics, all other fluxes are biology::
+
+    @physics
+    @xso.component
+    class SlabSinking:
+        ...
+
+The 'solve_ivp_split' solver integrates each step by Strang splitting: half a step of the physics,
+a full step of the biology and another half step of the physics. The physics are integrated
+exactly by the matrix exponential of their Jacobian, so that steps are not limited by the physics,
+the biology is integrated with an explicit adaptive method of scipy.integrate.solve_ivp.
+"""
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse as sp
+from scipy.linalg import expm
+from scipy.optimize import OptimizeResult
+from scipy.sparse.linalg import expm_multiply
+
+from xso.solvers import IVPSolver
+
+from .jacobian import ModelJacobian, flux_component
+from .solvers import IVP_METHODS, initial_state, store_solution
+
+# states with more entries are advanced by the physics with sparse matrices:
+SPARSE_SIZE = 200
+
+
+def physics(component):
+    """Class decorator tagging an XSO component as physics, applied on top of xso.component.
+    The fluxes of physics components need to be linear in the model state."""
+    component.operator = 'physics'
+    return component
+
+
+def physics_fluxes(model, processes=None):
+    """Returns labels of physics fluxes of the model backend, the fluxes of components tagged
+    with physics, or of the given processes, e.g. ['Mixing', 'Upwelling', 'Sinking']."""
+    labels = set()
+    for label, flux in model.fluxes.items():
+        component, func = flux_component(flux)
+        if component is None:
+            continue
+        if processes is None and getattr(component, 'operator', None) == 'physics':
+            labels.add(label)
+        elif processes is not None and label in {f'{process}_{func.__name__}' for process in processes}:
+            labels.add(label)
+    return labels
+
+
+class SplitModelFunction:
+    """Callable parts of the model function of an assembled XSO model, routing either only
+    physics fluxes or only all other fluxes to the variables. The sum of both parts is
+    the model function.
+
+    Time integrals of flux values in the state vector are part of the physics for physics
+    fluxes, and part of the biology for all other fluxes, including group fluxes.
+    """
+
+    def __init__(self, model, physics_labels):
+        self.model = model
+        self.physics_labels = set(physics_labels)
+
+        self.fluxes_per_var = {}
+        for is_physics in (True, False):
+            routing = defaultdict(list)
+            for var_label, flux_var_dicts in model.fluxes_per_var.items():
+                routing[var_label] = [flux_var_dict for flux_var_dict in flux_var_dicts
+                                      if (flux_var_dict['label'] in self.physics_labels) == is_physics]
+            self.fluxes_per_var[is_physics] = routing
+
+        # entries of the flux integrals of physics fluxes in the state vector:
+        self.physics_entries = np.zeros(0, dtype=bool)
+        self.num_vars = 0
+        for key, dims in model.full_model_dims.items():
+            size = int(np.prod(dims)) if dims is not None else 1
+            if key in model.variables:
+                self.num_vars += size
+            else:
+                self.physics_entries = np.append(self.physics_entries, np.full(size, key in self.physics_labels))
+
+    def part(self, time, current_state, is_physics):
+        """Returns the physics or biology part of the model function at time and current_state."""
+        fluxes_per_var = self.model.fluxes_per_var
+        self.model.fluxes_per_var = self.fluxes_per_var[is_physics]
+        try:
+            out = self.model.model_function(time=time, current_state=current_state)
+        finally:
+            self.model.fluxes_per_var = fluxes_per_var
+        out[self.num_vars:] *= self.physics_entries if is_physics else ~self.physics_entries
+        return out
+
+    def physics(self, time, current_state):
+        return self.part(time, current_state, True)
+
+    def biology(self, time, current_state):
+        return self.part(time, current_state, False)
+
+
+class SplittingIVPSolver(IVPSolver):
+    """Solver backend integrating physics and biology of the model by Strang splitting.
+
+    Each output time step is divided into equal steps no longer than step. Per step, the physics
+    are advanced by half a step, the biology by a full step, and the physics by another half step.
+    The physics are linearized in the middle of the half step and advanced by the matrix
+    exponential of the sparse Jacobian of the physics fluxes, which is exact for physics that are
+    linear in the state and constant over the half step, and keeps concentrations positive for
+    transport between variables. The biology is integrated with an adaptive explicit method.
+
+    Parameters
+    ----------
+    step : float, optional
+        Longest splitting step, defaults to the output time step. The splitting error is of second
+        order in the step.
+    method : str or scipy.integrate.OdeSolver
+        Integration method of solve_ivp for the biology, e.g. 'RK45'.
+    physics : list of str, optional
+        Processes treated as physics, defaults to the components tagged with phydra.splitting.physics.
+    sparse : bool, optional
+        If True, the physics are advanced with the sparse Jacobian, defaults to True for states
+        of more than SPARSE_SIZE entries, e.g. of NPZDWaterColumn.
+    **options
+        Additional keyword arguments passed to the method for the biology, e.g. rtol and atol.
+    """
+
+    def __init__(self, step=None, method='RK45', physics=None, sparse=None, **options):
+        super().__init__()
+        self.step = step
+        self.method = method
+        self.physics = physics
+        self.sparse = sparse
+        self.options = options
+        self.solution = None
+        self.proposed_step = None
+
+    def physics_step(self, function, jacobian, time, state, h):
+        """Returns state advanced by the physics over the time interval h from time."""
+        midpoint = time + h / 2
+        A = jacobian(midpoint, state)
+        b = function.physics(midpoint, state) - A @ state
+        # affine system, integrated as linear system augmented by a constant unit entry:
+        if jacobian.sparse:
+            augmented = sp.bmat([[A, sp.csc_matrix(b.reshape(-1, 1))],
+                                 [None, sp.csc_matrix((1, 1))]], format='csc')
+            return expm_multiply(augmented * h, np.append(state, 1.))[:-1]
+        augmented = np.zeros((np.size(state) + 1, np.size(state) + 1))
+        augmented[:-1, :-1], augmented[:-1, -1] = A, b
+        return expm(augmented * h)[:-1] @ np.append(state, 1.)
+
+    def biology_step(self, function, time, state, h):
+        """Returns state advanced by the biology over the time interval h from time.
+
+        The integration of each interval starts with the step proposed by the method at the end of
+        the previous interval, instead of selecting an initial step anew."""
+        method = IVP_METHODS[self.method] if isinstance(self.method, str) else self.method
+        first_step = min(self.proposed_step, h) if self.proposed_step else None
+        solver = method(function.biology, time, state, time + h, first_step=first_step, **self.options)
+        message = None
+        while solver.status == 'running':
+            # step proposed before the last step, which is shortened to end at the interval:
+            self.proposed_step = getattr(solver, 'h_abs', None)
+            message = solver.step()
+        if solver.status == 'failed':
+            raise RuntimeError(f"Integration of biology failed at time {time}: {message}")
+        return solver.y
+
+    def solve(self, model, time_step):
+        """Solve model by Strang splitting of physics and biology, between all points of model.time."""
+        full_init = initial_state(self)
+
+        labels = physics_fluxes(model, self.physics)
+        function = SplitModelFunction(model, labels)
+        sparse = self.sparse if self.sparse is not None else np.size(full_init) > SPARSE_SIZE
+        jacobian = ModelJacobian(model, sparse=sparse, fluxes=labels)
+
+        self.proposed_step = None
+        time = np.asarray(model.time, dtype=float)
+        state = np.asarray(full_init, dtype=float)
+        states = [state]
+        for start, stop in zip(time[:-1], time[1:]):
+            substeps = max(int(np.ceil((stop - start) / (self.step or stop - start) - 1e-9)), 1)
+            h = (stop - start) / substeps
+            for i in range(substeps):
+                t = start + i * h
+                state = self.physics_step(function, jacobian, t, state, h / 2)
+                state = self.biology_step(function, t, state, h)
+                state = self.physics_step(function, jacobian, t + h / 2, state, h / 2)
+            states.append(state)
+
+        self.solution = OptimizeResult(t=time, y=np.stack(states, axis=-1), success=True)
+        store_solution(model, self.solution, time_step)
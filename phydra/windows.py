@@ -0,0 +1,58 @@
+"""Runs of XSO models in windows of fixed length.
+
+Long runs are split into windows, each restarted from the final state of the previous window,
+so that the output of a window can be written or reduced before the next window is integrated,
+see phydra.output.write_run and phydra.reductions.reduce_run. This module only depends on xso,
+not on the libraries of the output stores.
+"""
+import numpy as np
+
+from .spinup import state_init_vars, setup_with_time
+
+
+def run_windows(model, model_setup, window, checkpoint=None, state=None):
+    """Runs model setup in windows of fixed length, yielding the index of the first time step
+    and the output of each window, with the time of the model setup as coordinate.
+
+    Each window is run on the time step of the model setup with the solver of the setup, starting
+    from the state at the last time step of the previous window. The runs of consecutive windows
+    overlap by that time step, so that flux values, the difference of time integrals per time step,
+    are continuous across windows. The output has the same time steps as a single run of
+    the model setup, it differs from it only by the restart of the solver at each window.
+
+    With a phydra.checkpoint.Checkpoint, the setup of the next window is saved after each completed
+    window, together with state, the accumulated state of the consumer of the windows. If the
+    checkpoint file exists, the run resumes at the window following the checkpoint.
+    """
+    setup_time = model_setup['Time__time_input'].values
+    if window < 2:
+        raise ValueError("window needs to contain at least 2 time steps")
+
+    init_vars = state_init_vars(model)
+
+    current_setup = model_setup
+    first = 0
+    restored = checkpoint.load() if checkpoint is not None else None
+    if restored is not None:
+        current_setup, first = restored['model_setup'], restored['first']
+
+    windows = 0
+    while first < np.size(setup_time):
+        last = min(first + window, np.size(setup_time))
+        # windows after the first start at the last time step of the previous window:
+        start = max(first - 1, 0)
+        current_setup = setup_with_time(model, current_setup, setup_time[start:last])
+        model_out = current_setup.xsimlab.run(model=model)
+
+        yield first, model_out.isel(time=slice(first - start, None)).assign_coords(time=setup_time[first:last])
+
+        with model:
+            current_setup = current_setup.xsimlab.update_vars(
+                input_vars={init: model_out[var].isel(time=-1).values for var, init in init_vars.items()})
+        first = last
+        windows += 1
+        if checkpoint is not None and (windows % checkpoint.every == 0 or first == np.size(setup_time)):
+            checkpoint.save(current_setup, first, state)
+
+    if checkpoint is not None:
+        checkpoint.finish()
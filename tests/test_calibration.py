@@ -0,0 +1,37 @@
+"""Tests of the objective function of slab ocean calibration."""
+import os
+
+import numpy as np
+import pytest
+
+from phydra.models.slabocean.calibration import SlabMisfit
+
+DATA = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks', 'data')
+PATHS = {'forcing_path': os.path.join(DATA, 'stations_forcing.csv'),
+         'verification_path': os.path.join(DATA, 'stations_verification.csv')}
+
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError, match='Growth__mu_mx'):
+        SlabMisfit(['Growth__mu_mx'], **PATHS)
+
+
+@pytest.mark.parametrize('error', [RuntimeError('Integration failed'), FloatingPointError(),
+                                   np.linalg.LinAlgError()])
+def test_integration_failure_penalty(monkeypatch, error):
+    misfit = SlabMisfit(['Growth__mu_max'], **PATHS, penalty=123.)
+
+    def fail(x):
+        raise error
+    monkeypatch.setattr(misfit, 'station_cycles', fail)
+    assert misfit([1.]) == 123.
+
+
+def test_other_errors_raise(monkeypatch):
+    misfit = SlabMisfit(['Growth__mu_max'], **PATHS)
+
+    def fail(x):
+        raise KeyError('Growth__mu_max')
+    monkeypatch.setattr(misfit, 'station_cycles', fail)
+    with pytest.raises(KeyError):
+        misfit([1.])
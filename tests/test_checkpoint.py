@@ -0,0 +1,56 @@
+"""Tests of runs in windows resumed from checkpoints."""
+import numpy as np
+import pytest
+import xso
+from numpy.testing import assert_array_equal
+
+from phydra.models import NPChemostat_sinu
+from phydra.checkpoint import Checkpoint
+from phydra.windows import run_windows
+
+INPUT_VARS = {
+    'Nutrient': {'value_label': 'N', 'value_init': 1.},
+    'Phytoplankton': {'value_label': 'P', 'value_init': 0.1},
+    'Inflow': {'source': 'N0', 'rate': 0.1, 'sink': 'N'},
+    'Outflow': {'var_list': ['N', 'P'], 'rate': 0.1},
+    'Growth': {'resource': 'N', 'consumer': 'P', 'halfsat': 0.7, 'mu_max': 1},
+    'N0': {'forcing_label': 'N0', 'period': 24, 'mean': 1, 'amplitude': 0.5},
+}
+VARIABLES = ['Nutrient__value', 'Phytoplankton__value', 'Growth__uptake_value', 'N0__forcing_value']
+
+
+def model_setup(solver):
+    return xso.setup(solver=solver, model=NPChemostat_sinu, time=np.arange(0, 100, 0.5), input_vars=INPUT_VARS)
+
+
+def window_values(windows):
+    """Returns dict of the output variables concatenated over the windows."""
+    outputs = [out for first, out in windows]
+    return {var: np.concatenate([out[var].values for out in outputs]) for var in VARIABLES}
+
+
+@pytest.mark.parametrize('interrupted', [1, 3])
+def test_resumed_run_equals_uninterrupted(tmp_path, interrupted):
+    setup = model_setup('solve_ivp')
+    expected = window_values(run_windows(NPChemostat_sinu, setup, window=40))
+
+    checkpoint = Checkpoint(str(tmp_path / 'run.ckpt'))
+    windows = run_windows(NPChemostat_sinu, setup, window=40, checkpoint=checkpoint)
+    completed = [next(windows) for _ in range(interrupted)]
+    windows.close()
+
+    # the checkpoint of a window is written once the consumer has finished it, when requesting the next window,
+    # so that the last yielded window is run again:
+    resumed = list(run_windows(NPChemostat_sinu, setup, window=40, checkpoint=checkpoint))
+    assert resumed[0][0] == 40 * (interrupted - 1)
+    values = window_values(completed[:-1] + resumed)
+    for var in VARIABLES:
+        assert_array_equal(values[var], expected[var])
+
+
+def test_stepwise_windows_equal_single_run():
+    setup = model_setup('stepwise')
+    expected = setup.xsimlab.run(model=NPChemostat_sinu)
+    values = window_values(run_windows(NPChemostat_sinu, setup, window=40))
+    for var in VARIABLES:
+        assert_array_equal(values[var], expected[var].values)
@@ -0,0 +1,93 @@
+"""Regression tests for numerical equivalence of the compiled model function with the XSO model function."""
+import os
+from functools import partial
+
+import numpy as np
+import pytest
+import xso
+
+pytest.importorskip('numba')
+
+from phydra.models import NPChemostat, NPChemostat_sinu, NPxZxSizeBased
+from phydra.models.slabocean.calibration import station_input_vars, _calibration_model
+from phydra.models.sizebased.sweep import size_class_input_vars
+from phydra.compiled import CompiledModelFunction, CompiledIVPSolver
+from phydra.solvers import ImplicitIVPSolver, register_solver, run_backend
+
+FORCING_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks', 'data', 'stations_forcing.csv')
+
+TOLERANCES = {'rtol': 1e-10, 'atol': 1e-12}
+
+
+@pytest.fixture(scope='module')
+def tight_solvers():
+    """Registers RK45 at tight tolerances, with the XSO model function and with the compiled model function."""
+    register_solver('solve_ivp_tight', partial(ImplicitIVPSolver, method='RK45', jacobian=False, **TOLERANCES))
+    register_solver('solve_ivp_numba_tight', partial(CompiledIVPSolver, **TOLERANCES))
+
+
+def chemostat_input_vars(sinusoidal=False):
+    """Input variables of notebook 1."""
+    return {
+        'Nutrient': {'value_label': 'N', 'value_init': 1.},
+        'Phytoplankton': {'value_label': 'P', 'value_init': 0.1},
+        'Inflow': {'source': 'N0', 'rate': 0.1, 'sink': 'N'},
+        'Outflow': {'var_list': ['N', 'P'], 'rate': 0.1},
+        'Growth': {'resource': 'N', 'consumer': 'P', 'halfsat': 0.7, 'mu_max': 1},
+        'N0': ({'forcing_label': 'N0', 'period': 24, 'mean': 1, 'amplitude': 0.5} if sinusoidal
+               else {'forcing_label': 'N0', 'value': 1.}),
+    }
+
+
+# model, input variables and run length in days:
+MODELS = {
+    'NPChemostat': (NPChemostat, chemostat_input_vars(), 100),
+    'NPChemostat_sinu': (NPChemostat_sinu, chemostat_input_vars(sinusoidal=True), 100),
+    'NPZDSlabOcean': (_calibration_model('NPZDSlabOcean'), station_input_vars('biotrans', FORCING_PATH), 365),
+    'NPZDSlabOcean_3layer': (_calibration_model('NPZDSlabOcean_3layer'),
+                             station_input_vars('biotrans', FORCING_PATH), 365),
+    'NPxZxSizeBased': (NPxZxSizeBased, size_class_input_vars(10), 365),
+}
+
+
+def assembled_model(model, input_vars):
+    """Returns assembled backend model, after a run over a single time step."""
+    model_setup = xso.setup(solver='solve_ivp', model=model, time=np.arange(0, 2), input_vars=input_vars)
+    return run_backend(model, model_setup)[0].model
+
+
+def model_output(model, input_vars, days, solver):
+    model_setup = xso.setup(solver=solver, model=model, time=np.arange(0, days), input_vars=input_vars)
+    return model_setup.xsimlab.run(model=model)
+
+
+@pytest.mark.parametrize('name', list(MODELS))
+def test_model_function_random_states(name):
+    model, input_vars, days = MODELS[name]
+    backend = assembled_model(model, input_vars)
+    compiled = CompiledModelFunction(backend)
+
+    rng = np.random.default_rng(42)
+    for _ in range(20):
+        time = rng.uniform(0., 2 * 365.)
+        state = rng.uniform(0., 2., compiled.size)
+        # the model time is a variable of XSO models:
+        state[compiled.slices['time']] = time
+        reference = backend.model_function(time=time, current_state=state)
+        np.testing.assert_allclose(compiled(time, state), reference,
+                                   rtol=1e-12, atol=1e-12 * np.max(np.abs(reference)))
+
+
+# the reference solver passes jac=None, which has no effect with RK45:
+@pytest.mark.filterwarnings('ignore:The following arguments have no effect')
+@pytest.mark.parametrize('name', list(MODELS))
+def test_solve_ivp_numba_matches_solve_ivp(tight_solvers, name):
+    model, input_vars, days = MODELS[name]
+    reference = model_output(model, input_vars, days, 'solve_ivp_tight')
+    compiled = model_output(model, input_vars, days, 'solve_ivp_numba_tight')
+    # solutions differ by round-off, amplified by the step size control over the run, most for the
+    # daily time integrals of mixing fluxes of the slab ocean, across jumps of the MLD derivative:
+    for var in reference.data_vars:
+        if np.issubdtype(reference[var].dtype, np.floating) and 'time' in reference[var].dims:
+            np.testing.assert_allclose(compiled[var].values, reference[var].values, rtol=1e-6,
+                                       atol=1e-6 * np.max(np.abs(reference[var].values)), err_msg=var)
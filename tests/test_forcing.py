@@ -0,0 +1,36 @@
+"""Tests of the accuracy of tabulated forcings of the slab ocean."""
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from phydra.models.slabocean.forcings import PeriodicForcingTable, station_forcing_function, STATIONS
+
+FORCING_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks', 'data', 'stations_forcing.csv')
+
+# tolerance of PeriodicForcingTable, relative to the maximum absolute value of the forcing:
+RTOL = 1e-4
+
+
+# linear lookup of linear and cubic splines, cubic lookup of cubic splines:
+@pytest.mark.parametrize('k, order', [(1, 1), (3, 1), (3, 3)])
+@pytest.mark.parametrize('data', ['MLD', 'SST'])
+@pytest.mark.parametrize('station', list(STATIONS))
+def test_table_deviation_from_spline(station, data, k, order):
+    spline = station_forcing_function(FORCING_PATH, station, data, k=k)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        table = PeriodicForcingTable(spline, order=order, rtol=RTOL)
+
+    # a year of times between and on grid nodes and spline knots:
+    time = np.linspace(0., 365., 365 * 97 + 1)
+    reference = spline(time)
+    assert np.max(np.abs(table(time) - reference)) <= RTOL * np.max(np.abs(reference))
+
+
+def test_cubic_table_of_linear_spline_warns():
+    # cubic lookup overshoots at the kinks of the piecewise linear MLD:
+    spline = station_forcing_function(FORCING_PATH, 'india', 'MLD', k=1)
+    with pytest.warns(UserWarning, match='Tabulated forcing deviates'):
+        PeriodicForcingTable(spline, order=3, rtol=RTOL)
@@ -0,0 +1,23 @@
+"""Tests of the lazily loaded packages of phydra."""
+import importlib
+
+import pytest
+
+BASELINE_MODELS = ['NPChemostat', 'NPChemostat_sinu', 'NPZDSlabOcean', 'NPZDSlabOcean_3layer', 'NPxZxSizeBased']
+
+
+@pytest.mark.parametrize('package', ['phydra', 'phydra.models', 'phydra.models.chemostat', 'phydra.models.slabocean',
+                                     'phydra.models.sizebased', 'phydra.models.watercolumn'])
+def test_star_import(package):
+    namespace = {}
+    exec(f'from {package} import *', namespace)
+    module = importlib.import_module(package)
+    assert module.__all__
+    assert set(module.__all__) <= set(namespace)
+    assert set(module.__all__) <= set(dir(module))
+
+
+def test_star_import_models():
+    namespace = {}
+    exec('from phydra.models import *', namespace)
+    assert set(BASELINE_MODELS) <= set(namespace)
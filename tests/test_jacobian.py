@@ -0,0 +1,73 @@
+"""Tests of the analytic Jacobians of the shipped models against finite differences of the model function."""
+import os
+
+import numpy as np
+import pytest
+import xso
+from scipy import sparse as sp
+
+from phydra.models import NPChemostat_sinu, NPxZxSizeBased, NPxZxSizeBased_FusedGrazing, NPZDWaterColumn
+from phydra.models.slabocean.calibration import station_input_vars, _calibration_model
+from phydra.models.slabocean.forcings import StationForcingFromPath
+from phydra.models.sizebased.sweep import size_class_input_vars
+from phydra.models.watercolumn import column_input_vars
+from phydra.jacobian import ModelJacobian
+from phydra.solvers import initial_state, run_backend
+
+FORCING_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks', 'data', 'stations_forcing.csv')
+
+CHEMOSTAT_INPUT_VARS = {
+    'Nutrient': {'value_label': 'N', 'value_init': 1.},
+    'Phytoplankton': {'value_label': 'P', 'value_init': 0.1},
+    'Inflow': {'source': 'N0', 'rate': 0.1, 'sink': 'N'},
+    'Outflow': {'var_list': ['N', 'P'], 'rate': 0.1},
+    'Growth': {'resource': 'N', 'consumer': 'P', 'halfsat': 0.7, 'mu_max': 1},
+    'N0': {'forcing_label': 'N0', 'period': 24, 'mean': 1, 'amplitude': 0.5},
+}
+
+
+def water_column_input_vars(layers):
+    input_vars = column_input_vars(layers=layers)
+    input_vars['Forcings']['file_path'] = FORCING_PATH
+    return input_vars
+
+
+MODELS = {
+    'NPChemostat_sinu': lambda: (NPChemostat_sinu, CHEMOSTAT_INPUT_VARS),
+    'NPZDSlabOcean': lambda: (_calibration_model('NPZDSlabOcean'), station_input_vars('biotrans', FORCING_PATH)),
+    'NPZDSlabOcean_3layer': lambda: (_calibration_model('NPZDSlabOcean_3layer'),
+                                     station_input_vars('biotrans', FORCING_PATH)),
+    'NPxZxSizeBased': lambda: (NPxZxSizeBased, size_class_input_vars(10)),
+    'NPxZxSizeBased_FusedGrazing': lambda: (NPxZxSizeBased_FusedGrazing,
+                                            size_class_input_vars(10, model=NPxZxSizeBased_FusedGrazing)),
+    'NPZDWaterColumn': lambda: (NPZDWaterColumn.update_processes({'Forcings': StationForcingFromPath}),
+                                water_column_input_vars(10)),
+}
+
+
+def finite_difference_jacobian(function, time, state, step=1e-6):
+    """Returns Jacobian of function by central differences, with steps relative to the state."""
+    columns = []
+    for i in range(np.size(state)):
+        h = step * max(abs(state[i]), 1e-3)
+        upper, lower = state.copy(), state.copy()
+        upper[i] += h
+        lower[i] -= h
+        columns.append((function(time, upper) - function(time, lower)) / (2 * h))
+    return np.stack(columns, axis=1)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+@pytest.mark.parametrize('name', list(MODELS))
+def test_jacobian_matches_finite_differences(name, sparse):
+    model, input_vars = MODELS[name]()
+    model_setup = xso.setup(solver='solve_ivp', model=model, time=np.arange(0, 2), input_vars=input_vars)
+    core = run_backend(model, model_setup)[0]
+    state, time = initial_state(core.solver), 100.
+
+    jacobian = ModelJacobian(core.model, sparse=sparse)(time, state)
+    assert sp.issparse(jacobian) == sparse
+    jacobian = jacobian.toarray() if sparse else jacobian
+
+    expected = finite_difference_jacobian(core.model.model_function, time, state)
+    assert np.max(np.abs(jacobian - expected)) <= 4e-8 * np.max(np.abs(expected))
@@ -0,0 +1,82 @@
+"""Regression test of the vectorized three layer light limitation against the previous loop implementation."""
+import os
+
+import numpy as np
+import pytest
+import xso
+
+from phydra.models.slabocean.calibration import station_input_vars, _calibration_model
+from phydra.jacobian import flux_component
+from phydra.solvers import run_backend
+
+FORCING_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks', 'data', 'stations_forcing.csv')
+
+
+def smith_function(zdepth, Iin, Iout, kPARlay, alpha, Vp):
+    x0 = alpha * Iin
+    xH = alpha * Iout
+    return Vp / kPARlay / zdepth * (np.log(x0 + (Vp ** 2 + x0 ** 2) ** 0.5) - np.log(xH + (Vp ** 2 + xH ** 2) ** 0.5))
+
+
+def loop_light_limitation(i_0, mld, pigment_biomass, alpha, VpT, CtoChl):
+    """Previous implementation of EMPOWER_Smith_Anderson3Layer_ML.light_limitation, branching on the
+    number of layers within the mixed layer, including the attenuation exp(-kPAR_2 * mld - 5.0)."""
+    i_0 = i_0 / 24
+    chl = pigment_biomass * 6.625 * 12.0 / CtoChl
+
+    ss = np.sqrt(chl)
+
+    kPAR_1 = (0.13096 + 0.030969 * ss + 0.042644 * ss ** 2 - 0.013738 * ss ** 3
+              + 0.0024617 * ss ** 4 - 0.00018059 * ss ** 5)
+    kPAR_2 = (0.041025 + 0.036211 * ss + 0.062297 * ss ** 2 - 0.030098 * ss ** 3
+              + 0.0062597 * ss ** 4 - 0.00051944 * ss ** 5)
+    kPAR_3 = (0.021517 + 0.050150 * ss + 0.058900 * ss ** 2 - 0.040539 * ss ** 3
+              + 0.0087586 * ss ** 4 - 0.00049476 * ss ** 5)
+
+    kPAR = [kPAR_1, kPAR_2, kPAR_3]
+
+    if mld <= 5.0:
+        jnlay = 1
+        zdep = [0., mld]
+        I_1 = i_0 * np.exp(-kPAR_1 * mld)
+        Ibase = [i_0, I_1]
+    elif mld > 5.0 and mld <= 23.0:
+        jnlay = 2
+        zdep = [0., 5.0, mld - 5.0]
+        I_1 = i_0 * np.exp(-kPAR_1 * 5.0)
+        I_2 = I_1 * np.exp(-kPAR_2 * mld - 5.0)
+        Ibase = [i_0, I_1, I_2]
+    else:
+        jnlay = 3
+        zdep = [0., 5.0, 23.0 - 5.0, mld - 23.0]
+        I_1 = i_0 * np.exp(-kPAR_1 * 5.0)
+        I_2 = I_1 * np.exp(-kPAR_2 * 23.0 - 5.0)
+        I_3 = I_2 * np.exp(-kPAR_3 * mld - 23.0)
+        Ibase = [i_0, I_1, I_2, I_3]
+
+    L_Isum = 0
+    for ilay in range(1, jnlay + 1):
+        L_I = smith_function(zdep[ilay], Ibase[ilay - 1], Ibase[ilay], kPAR[ilay - 1], alpha, VpT)
+        L_Isum = L_Isum + L_I * 24 / CtoChl * zdep[ilay]
+    return L_Isum / mld
+
+
+@pytest.fixture(scope='module')
+def light_limitation():
+    """Returns component and undecorated flux function of the light limitation of NPZDSlabOcean_3layer."""
+    model = _calibration_model('NPZDSlabOcean_3layer')
+    model_setup = xso.setup(solver='solve_ivp', model=model, time=np.arange(0, 2),
+                            input_vars=station_input_vars('biotrans', FORCING_PATH))
+    core = run_backend(model, model_setup)[0]
+    return flux_component(core.model.fluxes['Light_lim_light_limitation'])
+
+
+# mixed layer depths with 1, 2 and 3 active layers, including the layer boundaries:
+@pytest.mark.parametrize('mld', [0.5, 3., 5., 5.5, 15., 23., 23.5, 60., 250.])
+@pytest.mark.parametrize('pigment_biomass', [0.01, 0.5, 3.])
+def test_matches_loop_implementation(light_limitation, mld, pigment_biomass):
+    component, func = light_limitation
+    arguments = {'i_0': 150., 'alpha': 0.15, 'VpT': 1.2, 'CtoChl': 75.}
+    value = func(component, mld=mld, pigment_biomass=pigment_biomass, kw=0.04, kc=0.03, **arguments)
+    np.testing.assert_allclose(value, loop_light_limitation(mld=mld, pigment_biomass=pigment_biomass, **arguments),
+                               rtol=1e-12)
@@ -0,0 +1,39 @@
+"""Tests of the positivity-preserving MPRK22 solver."""
+from functools import partial
+
+import numpy as np
+import pytest
+import xso
+
+from phydra.models import NPChemostat
+from phydra.patankar import PatankarIVPSolver
+from phydra.solvers import register_solver
+
+# closed chemostat, without inflow and outflow:
+INPUT_VARS = {
+    'Nutrient': {'value_label': 'N', 'value_init': 1.},
+    'Phytoplankton': {'value_label': 'P', 'value_init': 0.1},
+    'Inflow': {'source': 'N0', 'rate': 0., 'sink': 'N'},
+    'Outflow': {'var_list': ['N', 'P'], 'rate': 0.},
+    'Growth': {'resource': 'N', 'consumer': 'P', 'halfsat': 0.7, 'mu_max': 1},
+    'N0': {'forcing_label': 'N0', 'value': 1.},
+}
+
+
+@pytest.fixture(scope='module')
+def fixed_step_solver():
+    """Registers MPRK22 with fixed steps of five days."""
+    register_solver('solve_ivp_MPRK22_5days', partial(PatankarIVPSolver, step=5.))
+
+
+@pytest.mark.parametrize('solver', ['solve_ivp_MPRK22', 'solve_ivp_MPRK22_5days'])
+def test_closed_chemostat_conserves_mass(fixed_step_solver, solver):
+    model_setup = xso.setup(solver=solver, model=NPChemostat, time=np.arange(0, 100, 5.),
+                            input_vars=INPUT_VARS)
+    model_out = model_setup.xsimlab.run(model=NPChemostat)
+    nutrient, phytoplankton = model_out['Nutrient__value'].values, model_out['Phytoplankton__value'].values
+
+    np.testing.assert_allclose(nutrient + phytoplankton, 1.1, rtol=0, atol=1e-14)
+    assert np.all(nutrient >= 0) and np.all(phytoplankton >= 0)
+    # nutrient is depleted by growth within the run:
+    assert nutrient[-1] < 1e-3
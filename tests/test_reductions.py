@@ -0,0 +1,29 @@
+"""Tests of reductions of runs in windows."""
+import numpy as np
+import pytest
+import xarray as xr
+
+from phydra.reductions import AnnualReduction, LastValues, TimeReduction
+
+TIME = np.arange(0, 730.)
+
+
+def reduced(reduction, window=100):
+    """Returns result of reduction of a variable equal to time, updated in windows."""
+    reduction.initialize(TIME)
+    for first in range(0, TIME.size, window):
+        time = TIME[first:first + window]
+        reduction.update(xr.Dataset({'x': ('time', time)}, coords={'time': time}))
+    return reduction.result({})
+
+
+@pytest.mark.parametrize('reduction', [TimeReduction('x', last=365), AnnualReduction('x', last=365)])
+def test_last_year_has_365_steps(reduction):
+    reduced(reduction)
+    assert reduction.count.sum() == 365
+
+
+def test_last_values_of_last_year():
+    values = reduced(LastValues('x', last=365))['values']
+    assert values.sizes['time'] == 365
+    assert values.values[0] == 365.
@@ -0,0 +1,50 @@
+"""The multi-station slab ocean model reproduces the batch setup of notebook 2 station by station."""
+import os
+
+import numpy as np
+import pytest
+import xso
+
+import phydra.solvers  # registers 'solve_ivp_LSODA_tight'
+from phydra.models import NPZDSlabOcean_MultiStation, NPZDSlabOcean_3layer_MultiStation
+from phydra.models.slabocean.calibration import (STATION_PARAMETERS, multistation_input_vars,
+                                                 station_input_vars, _calibration_model)
+
+NOTEBOOKS = os.path.join(os.path.dirname(__file__), os.pardir, 'notebooks')
+FORCING_PATH = os.path.join(NOTEBOOKS, 'data', 'stations_forcing.csv')
+
+# stations in the order of the batch dimension of notebook 2
+STATIONS = ['biotrans', 'india', 'papa', 'kerfix']
+OUTPUTS = ['Nutrient__var', 'Phytoplankton__var', 'Zooplankton__var', 'Detritus__var']
+
+
+def run(model, input_vars, years=1):
+    model_setup = xso.setup(solver='solve_ivp_LSODA_tight', model=model, time=np.arange(0, 365 * years),
+                            input_vars=input_vars)
+    return model_setup.xsimlab.run(model=model)
+
+
+@pytest.fixture
+def notebook_directory(monkeypatch):
+    """Forcings of the multi-station models are read relative to the working directory, as in notebook 2."""
+    monkeypatch.chdir(NOTEBOOKS)
+
+
+def test_station_parameters(notebook_directory):
+    model_setup = xso.setup(solver='solve_ivp', model=NPZDSlabOcean_MultiStation, time=np.arange(0, 2),
+                            input_vars=multistation_input_vars(STATIONS))
+    for key in STATION_PARAMETERS['biotrans']:
+        np.testing.assert_array_equal(model_setup[key].values, [STATION_PARAMETERS[s][key] for s in STATIONS])
+
+
+@pytest.mark.parametrize('model, single_model', [(NPZDSlabOcean_MultiStation, 'NPZDSlabOcean'),
+                                                 (NPZDSlabOcean_3layer_MultiStation, 'NPZDSlabOcean_3layer')])
+def test_stations_match_single_runs(notebook_directory, model, single_model):
+    multi_out = run(model, multistation_input_vars(STATIONS))
+    assert list(multi_out['Forcings__station_index'].values) == STATIONS
+
+    for i, station in enumerate(STATIONS):
+        single_out = run(_calibration_model(single_model), station_input_vars(station, FORCING_PATH))
+        for var in OUTPUTS:
+            np.testing.assert_allclose(multi_out[var].isel(station=i).values, single_out[var].values,
+                                       rtol=1e-5, atol=1e-6, err_msg=f'{var} at {station}')
@@ -0,0 +1,17 @@
+"""Tests of sweeps over size classes of the size-based model."""
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from phydra.models.sizebased.sweep import run_size_sweep
+
+
+def test_members_with_different_keys():
+    model_out = run_size_sweep([2, 3, {'num_classes': 4, 'KsZ': 2.}], time=np.arange(0, 10), max_workers=2)
+    assert model_out.sizes['run'] == 3
+    assert_array_equal(model_out['num_classes'].values, [2, 3, 4])
+    assert_array_equal(model_out['KsZ'].values, [np.nan, np.nan, 2.])
+
+
+def test_missing_keys_from_shared_kwargs():
+    model_out = run_size_sweep([2, {'num_classes': 3, 'KsZ': 2.}], time=np.arange(0, 10), max_workers=2, KsZ=1.)
+    assert_array_equal(model_out['KsZ'].values, [1., 2.])